@@ -5,8 +5,16 @@ arabic_processor.py - معالج النصوص الطبية العربية
 المطور: عبدالرحمن
 """
 
-from enum import Enum
-from typing import Tuple, List
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from enum import Enum, IntEnum
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from config import MatchConfig, PoolConfig
+from text_matcher import AhoCorasick, FuzzyIndex, PhraseNormalizer
 
 
 # ─────────────────────────────────────────────
@@ -35,6 +43,8 @@ EGYPTIAN_TO_FORMAL = {
     "تعبان":    "مريض",
     "دوخة":     "دوار",
     "حرارة":    "حمى",
+    "سخونية":   "حمى",
+    "سخونة":    "حمى",
     "ضغط":      "ضغط الدم",
     "سكر":      "مرض السكري",
     "دماغي":    "رأسي",
@@ -89,7 +99,112 @@ SYMPTOMS_DB = [
 
 
 # ─────────────────────────────────────────────
-# 4. الكلاس الرئيسي للمعالجة
+# 4. مستويات الخطورة والنتائج المجمعة
+# ─────────────────────────────────────────────
+
+# مرتبة من الأخف للأخطر - الكود = الترتيب
+URGENCY_LEVELS = ["✅ مستقرة", "⚠️ تحتاج متابعة", "⚠️ متوسطة", "🚨 خطيرة جداً"]
+
+
+class Urgency(IntEnum):
+    """كود الخطورة - المقارنة بالأرقام (>=) بدل البحث في النص"""
+    STABLE    = 0
+    FOLLOW_UP = 1
+    MODERATE  = 2
+    CRITICAL  = 3
+
+    @property
+    def label(self) -> str:
+        return URGENCY_LEVELS[self]
+
+    @classmethod
+    def from_label(cls, label: str) -> "Urgency":
+        return cls(URGENCY_LEVELS.index(label))
+
+
+class IntentCode(IntEnum):
+    """كود رقمي لكل نية (نفس أسماء وترتيب IntentType) - للتخزين والنقل"""
+    EMERGENCY       = 0
+    MEASURE_VITALS  = 1
+    NEED_MEDICATION = 2
+    PAIN_COMPLAINT  = 3
+    FEELING_BAD     = 4
+    GENERAL_CHAT    = 5
+    UNKNOWN         = 6
+
+    @property
+    def intent(self) -> IntentType:
+        return IntentType[self.name]
+
+
+INTENT_CODES = {intent: IntentCode[intent.name] for intent in IntentType}
+
+
+def symptom_bit(symptom: str) -> int:
+    """رقم بت العرض = مكانه في SYMPTOMS_DB"""
+    return _SYMPTOM_BITS[symptom]
+
+
+def symptoms_to_mask(symptoms: Iterable[str]) -> int:
+    """قائمة أعراض → bitmask (البت j = SYMPTOMS_DB[j])"""
+    mask = 0
+    for s in symptoms:
+        mask |= 1 << _SYMPTOM_BITS[s]
+    return mask
+
+
+def mask_to_symptoms(mask: int) -> List[str]:
+    """bitmask → قائمة الأعراض بترتيب SYMPTOMS_DB"""
+    return [s for j, s in enumerate(SYMPTOMS_DB) if mask >> j & 1]
+
+
+_SYMPTOM_BITS = {s: j for j, s in enumerate(SYMPTOMS_DB)}
+
+
+@dataclass
+class BatchResult:
+    """
+    نتيجة process_batch على شكل أعمدة (صف لكل نص):
+      intents:  uint8 (n,)          IntentCode
+      symptoms: uint8 (n, ⌈S/8⌉)    bitmask مضغوط (np.packbits) - البت j = symptom_names[j]
+      urgency:  uint8 (n,)          Urgency
+    """
+    normalized:    List[str]
+    intents:       np.ndarray
+    symptoms:      np.ndarray
+    urgency:       np.ndarray
+    symptom_names: List[str]
+
+    def __len__(self) -> int:
+        return len(self.normalized)
+
+    def symptom_matrix(self) -> np.ndarray:
+        """bool (n, S) - عمود لكل عرض"""
+        return np.unpackbits(self.symptoms, axis=1, count=len(self.symptom_names)).astype(bool)
+
+    def row(self, i: int) -> Tuple[str, IntentType, List[str], str]:
+        """الصف i بنفس شكل process()"""
+        bits = np.unpackbits(self.symptoms[i], count=len(self.symptom_names))
+        return (self.normalized[i],
+                IntentCode(self.intents[i]).intent,
+                [self.symptom_names[j] for j in np.flatnonzero(bits)],
+                URGENCY_LEVELS[self.urgency[i]])
+
+    @classmethod
+    def concat(cls, parts: List["BatchResult"]) -> "BatchResult":
+        names = parts[0].symptom_names if parts else []
+        return cls(
+            normalized=[t for p in parts for t in p.normalized],
+            intents=np.concatenate([p.intents for p in parts]) if parts else np.zeros(0, np.uint8),
+            symptoms=np.concatenate([p.symptoms for p in parts]) if parts
+                     else np.zeros((0, (len(names) + 7) // 8), np.uint8),
+            urgency=np.concatenate([p.urgency for p in parts]) if parts else np.zeros(0, np.uint8),
+            symptom_names=names,
+        )
+
+
+# ─────────────────────────────────────────────
+# 5. الكلاس الرئيسي للمعالجة
 # ─────────────────────────────────────────────
 
 class ArabicMedicalProcessor:
@@ -101,44 +216,188 @@ class ArabicMedicalProcessor:
     4. تقييم مستوى الخطورة
     """
 
+    def __init__(self,
+                 dialect_map:     Optional[Dict[str, str]] = None,
+                 intent_keywords: Optional[Dict[IntentType, List[str]]] = None,
+                 symptoms_db:     Optional[List[str]] = None,
+                 fuzzy:           bool = MatchConfig.FUZZY):
+        """
+        القواميس بتتحول لـ automaton مرة واحدة هنا (Aho–Corasick)
+        فتكلفة المعالجة = طول النص، مش حجم القاموس × طول النص
+        fuzzy: الكلمات اللي ما اتطابقتش حرفيًا بتتدور في فهرس trigrams (أخطاء إملاء Whisper)
+               للأعراض بس - الكلمات المفتاحية للنية حرفية ("أسماء" مش "إغماء")
+               بس العرض الخطير (ضيق تنفس) بيخلي النية طوارئ حتى لو جه تقريبي
+        """
+        dialect_map     = EGYPTIAN_TO_FORMAL if dialect_map is None else dialect_map
+        intent_keywords = INTENT_KEYWORDS if intent_keywords is None else intent_keywords
+        self.symptoms_db = list(SYMPTOMS_DB if symptoms_db is None else symptoms_db)
+        self.intents     = list(intent_keywords)
+        # القواميس الخام (dicts بتتعمل pickle) - عمليات process_batch بتبني processor منها
+        self._spec       = (dict(dialect_map), {k: list(v) for k, v in intent_keywords.items()},
+                            self.symptoms_db, fuzzy)
+
+        # الكلمات الفصحى اللي بنعرفها بتدخل القاموس على نفسها:
+        # كده "ضغط الدم" ما بتتلمسش (مش "ضغط الدم الدم") والإملاء بيتوحد ("الحقوني" → "إلحقوني")
+        phrases = dict(dialect_map)
+        for word in [*dialect_map.values(), *(w for ws in intent_keywords.values() for w in ws),
+                     *self.symptoms_db]:
+            phrases.setdefault(word, word)
+        self._dialect = PhraseNormalizer(phrases)
+
+        # automaton واحد للكلمات المفتاحية والأعراض: كل عبارة → (نوايا، أعراض)
+        index: Dict[str, Tuple[Set[int], Set[int]]] = {}
+        for i, intent in enumerate(self.intents):
+            for word in intent_keywords[intent]:
+                index.setdefault(word, (set(), set()))[0].add(i)
+        for j, symptom in enumerate(self.symptoms_db):
+            index.setdefault(symptom, (set(), set()))[1].add(j)
+        self._terms   = AhoCorasick(index)
+        self._targets = list(index.values())
+        self._fuzzy   = FuzzyIndex(self.symptoms_db) if fuzzy else None     # نفس ترقيم الأعراض
+
     def normalize(self, text: str) -> str:
-        """تحويل العامية لفصحى مع مراعاة ترتيب العبارات الطويلة"""
-        normalized = text
-        for dialect, formal in EGYPTIAN_TO_FORMAL.items():
-            normalized = normalized.replace(dialect, formal)
-        return normalized
+        """تحويل العامية لفصحى في مرور واحد على الكلمات - العبارة الأطول بتكسب"""
+        return self._dialect.normalize(text)
+
+    def _scan(self, text: str) -> Tuple[Set[int], Dict[int, float]]:
+        """
+        مرور واحد على النص: أرقام النوايا اللي ظهرت + درجة كل عرض
+        التطابق الحرفي درجته 1.0، والتقريبي بيدور في الكلمات اللي فضلت بس
+        والتقريبي بيضيف أعراض بس - النية بتتغير من _classify لو العرض خطير
+        """
+        matches = list(self._terms.iter_matches(text))
+        intents, symptoms = set(), {}
+        for pid in {pid for _, pid in matches}:
+            i, j = self._targets[pid]
+            intents |= i
+            symptoms.update(dict.fromkeys(j, 1.0))
+        if self._fuzzy is not None:
+            exact = [(start, start + len(self._terms.patterns[pid])) for start, pid in matches]
+            for s, score in self._fuzzy.search(text, exact).items():
+                symptoms.setdefault(s, score)
+        return intents, symptoms
+
+    def _intent_from(self, hits: Set[int]) -> IntentType:
+        # ترتيب INTENT_KEYWORDS هو الأولوية (الطوارئ الأول)
+        return self.intents[min(hits)] if hits else IntentType.GENERAL_CHAT
+
+    def _symptoms_from(self, hits: Dict[int, float]) -> List[str]:
+        return [self.symptoms_db[j] for j in sorted(hits)]
+
+    def _classify(self, hits: Set[int],
+                  symptom_hits: Dict[int, float]) -> Tuple[IntentType, List[str], Urgency]:
+        """النية والأعراض والخطورة - الخطورة الحرجة دايمًا نيتها طوارئ ("ضيق تنفث" زي "ضيق تنفس")"""
+        intent   = self._intent_from(hits)
+        symptoms = self._symptoms_from(symptom_hits)
+        code     = self._urgency_code(intent, symptoms)
+        if code == Urgency.CRITICAL:
+            intent = IntentType.EMERGENCY
+        return intent, symptoms, code
 
     def detect_intent(self, text: str) -> IntentType:
         """كشف النية بناءً على الكلمات المفتاحية - أولوية للطوارئ"""
-        for intent, keywords in INTENT_KEYWORDS.items():
-            if any(word in text for word in keywords):
-                return intent
-        return IntentType.GENERAL_CHAT
+        return self._classify(*self._scan(text))[0]
 
     def extract_symptoms(self, text: str) -> List[str]:
         """استخراج الأعراض من قاعدة البيانات الطبية"""
-        return [s for s in SYMPTOMS_DB if s in text]
+        return self._symptoms_from(self._scan(text)[1])
 
     def get_urgency(self, intent: IntentType, symptoms: List[str]) -> str:
         """تقييم مستوى الخطورة"""
+        return URGENCY_LEVELS[self._urgency_code(intent, symptoms)]
+
+    @staticmethod
+    def _urgency_code(intent: IntentType, symptoms: Sequence[str]) -> Urgency:
         if intent == IntentType.EMERGENCY or "ضيق تنفس" in symptoms:
-            return "🚨 خطيرة جداً"
+            return Urgency.CRITICAL
         if intent == IntentType.PAIN_COMPLAINT or "ألم حاد" in symptoms:
-            return "⚠️ متوسطة"
+            return Urgency.MODERATE
         if symptoms:
-            return "⚠️ تحتاج متابعة"
-        return "✅ مستقرة"
+            return Urgency.FOLLOW_UP
+        return Urgency.STABLE
 
     def process(self, text: str) -> Tuple[str, IntentType, List[str], str]:
         """
         الدالة الرئيسية - تُرجع:
         (النص الموحد، النية، الأعراض، مستوى الخطورة)
         """
+        return self.process_scored(text)[:4]
+
+    def process_scored(self, text: str) -> Tuple[str, IntentType, List[str], str, Dict[str, float]]:
+        """زي process + درجة تطابق كل عرض (1.0 = حرفي)"""
         normalized = self.normalize(text.lower())
-        intent     = self.detect_intent(normalized)
-        symptoms   = self.extract_symptoms(normalized)
-        urgency    = self.get_urgency(intent, symptoms)
-        return normalized, intent, symptoms, urgency
+        intents, symptom_hits = self._scan(normalized)
+        intent, symptoms, code = self._classify(intents, symptom_hits)
+        urgency    = URGENCY_LEVELS[code]
+        scores     = {self.symptoms_db[j]: round(symptom_hits[j], 2) for j in sorted(symptom_hits)}
+        return normalized, intent, symptoms, urgency, scores
+
+    # ── معالجة مجمعة (مراجعة الأرشيف) ──────────
+    def process_batch(self, texts: Iterable[str], workers: int = 0,
+                      chunk_size: int = 2000) -> BatchResult:
+        """
+        نفس process لكل نص بس النتيجة أعمدة (BatchResult)
+          - الـ matchers المبنية مرة واحدة بتتشارك على كل النصوص
+          - النصوص المتكررة بتتحلل مرة واحدة
+          - workers > 0: النصوص بتتقسم chunks على عمليات (PoolConfig.START_METHOD = spawn:
+            الأم ممكن يبقى فيها threads - كل عملية بتبني الـ automaton مرة من القواميس)
+        """
+        texts   = list(texts)
+        slots   = {}
+        inverse = np.fromiter((slots.setdefault(t, len(slots)) for t in texts), np.intp, len(texts))
+        unique  = list(slots)
+
+        if workers <= 0 or len(unique) <= chunk_size:
+            result = self._process_shard(unique)
+        else:
+            chunks = [unique[i:i + chunk_size] for i in range(0, len(unique), chunk_size)]
+            with ProcessPoolExecutor(max_workers=workers,
+                                     mp_context=mp.get_context(PoolConfig.START_METHOD),
+                                     initializer=_init_shard, initargs=self._spec) as pool:
+                result = BatchResult.concat(list(pool.map(_run_shard, chunks)))
+
+        if len(unique) == len(texts):
+            return result
+        return BatchResult(
+            normalized=[result.normalized[k] for k in inverse],
+            intents=result.intents[inverse],
+            symptoms=result.symptoms[inverse],
+            urgency=result.urgency[inverse],
+            symptom_names=result.symptom_names,
+        )
+
+    def _process_shard(self, texts: List[str]) -> BatchResult:
+        n, width = len(texts), (len(self.symptoms_db) + 7) // 8
+        normalized = [""] * n
+        intents    = np.empty(n, np.uint8)
+        urgency    = np.empty(n, np.uint8)
+        bits       = np.zeros((n, len(self.symptoms_db)), bool)
+
+        for row, text in enumerate(texts):
+            norm = self.normalize(text.lower())
+            hits, symptom_hits = self._scan(norm)
+            intent, _, code = self._classify(hits, symptom_hits)
+            normalized[row] = norm
+            intents[row]    = INTENT_CODES[intent]
+            urgency[row]    = code
+            bits[row, list(symptom_hits)] = True
+
+        symptoms = np.packbits(bits, axis=1) if n else np.zeros((0, width), np.uint8)
+        return BatchResult(normalized, intents, symptoms, urgency, list(self.symptoms_db))
+
+
+# processor واحد لكل عملية ابن - بيتبني مرة في الـ initializer مش مع كل chunk
+_SHARD_PROCESSOR: Optional[ArabicMedicalProcessor] = None
+
+
+def _init_shard(dialect_map: Dict[str, str], intent_keywords: Dict[IntentType, List[str]],
+                symptoms_db: List[str], fuzzy: bool):
+    global _SHARD_PROCESSOR
+    _SHARD_PROCESSOR = ArabicMedicalProcessor(dialect_map, intent_keywords, symptoms_db, fuzzy)
+
+
+def _run_shard(texts: List[str]) -> BatchResult:
+    return _SHARD_PROCESSOR._process_shard(texts)
 
 
 # ─────────────────────────────────────────────
@@ -0,0 +1,282 @@
+"""
+asr_backends.py - محركات التعرف على الكلام (ASR)
+=================================================
+واجهة موحدة قدام أكتر من محرك - الاختيار من WhisperConfig.BACKEND:
+  - "openai":          openai-whisper (PyTorch) - المرجع الأصلي
+  - "faster-whisper":  CTranslate2 بـ int8 على الـ CPU - أسرع 3-4 مرات على small
+
+كل المحركات بترجع نفس شكل dict بتاع whisper.transcribe:
+  {"text", "language", "segments": [{"start", "end", "text", "no_speech_prob", "avg_logprob"}]}
+علشان _is_hallucination و _get_confidence يفضلوا زي ما هما
+
+torch / whisper / faster_whisper بيتعملهم import أول ما المحرك يتبني بس (مش مع import الملف)
+- import الـ torch لوحده بياخد ثواني
+"""
+
+import logging
+import threading
+import numpy as np
+from importlib.util import find_spec
+from typing import List, Optional
+
+from config import WhisperConfig
+from tracing import span, time_module
+
+WHISPER_AVAILABLE        = find_spec("whisper") is not None and find_spec("torch") is not None
+FASTER_WHISPER_AVAILABLE = find_spec("faster_whisper") is not None
+
+logger = logging.getLogger("SMAR_MED_VOICE")
+
+
+# ─────────────────────────────────────────────
+# الواجهة
+# ─────────────────────────────────────────────
+class ASRBackend:
+    """كل محرك لازم يطبق الدوال دي على float32 mono بـ 16kHz"""
+
+    name = "base"
+
+    def transcribe(self, audio: np.ndarray) -> dict:
+        """تحويل كامل بإعدادات WhisperConfig"""
+        raise NotImplementedError
+
+    def transcribe_batch(self, audios: List[np.ndarray]) -> List[dict]:
+        """تحويل كذا تسجيل - المحرك اللي يدعم batch حقيقي بيعمل override"""
+        return [self.transcribe(a) for a in audios]
+
+    def decode_short(self, audio: np.ndarray, prompt: Optional[str], max_tokens: int) -> dict:
+        """
+        فك تشفير سريع (greedy، من غير timestamps، عدد tokens محدود)
+        بيرجع {"text", "no_speech_prob"} - مستخدم في KeywordSpotter
+        """
+        raise NotImplementedError
+
+    def load_audio(self, file_path: str) -> np.ndarray:
+        """فك أي صيغة (m4a, mp3, ...) لـ float32 بـ 16kHz"""
+        raise NotImplementedError
+
+
+# ─────────────────────────────────────────────
+# openai-whisper (PyTorch)
+# ─────────────────────────────────────────────
+class OpenAIWhisperBackend(ASRBackend):
+
+    name = "openai"
+
+    def __init__(self, model_size: str = WhisperConfig.MODEL_SIZE, stage: str = "whisper"):
+        if not WHISPER_AVAILABLE:
+            raise ImportError("openai-whisper مش متسطب: pip install openai-whisper")
+        from model_store import load_whisper
+        self.model = load_whisper(model_size)
+        # زمن الـ encoder والـ decoder (كل token) جوه transcribe → whisper.encode / whisper.decode
+        # (stage="kws" للموديل الصغير بتاع KeywordSpotter علشان ما يتخلطوش)
+        time_module(self.model.encoder, f"{stage}.encode")
+        time_module(self.model.decoder, f"{stage}.decode")
+        # الـ kv-cache بتاع whisper hooks على الموديل نفسه: decode من threadين في نفس الوقت
+        # بيبوظوا بعض (warm-up، timeline بـ workers، جلسات Streamlit) → فك تشفير واحد في المرة
+        self._lock = threading.Lock()
+
+    def transcribe(self, audio: np.ndarray) -> dict:
+        with self._lock:
+            return self.model.transcribe(
+                audio.astype(np.float32, copy=False),
+                language=WhisperConfig.LANGUAGE,
+                initial_prompt=WhisperConfig.INITIAL_PROMPT,
+                temperature=WhisperConfig.TEMPERATURE,
+                no_speech_threshold=WhisperConfig.NO_SPEECH_THRESHOLD,
+                logprob_threshold=WhisperConfig.LOGPROB_THRESHOLD,
+                compression_ratio_threshold=WhisperConfig.COMPRESSION_RATIO_THRESHOLD,
+                condition_on_previous_text=WhisperConfig.CONDITION_ON_PREV,
+            )
+
+    def transcribe_batch(self, audios: List[np.ndarray]) -> List[dict]:
+        """
+        التسجيلات اللي أقل من 30 ثانية بتتجمع في mel batch واحد (encoder + decoder مرة واحدة)
+        والـ segments من الـ timestamp tokens زي transcribe
+        الأطول، واللي فشل في فحوص transcribe (logprob واطي / نص بيكرر نفسه / من غير timestamps)
+        بيروح لـ transcribe العادي - فيه الـ temperature fallback
+        """
+        import torch
+        import whisper
+        results = [None] * len(audios)
+        short   = [i for i, a in enumerate(audios) if len(a) <= whisper.audio.N_SAMPLES]
+        for i in set(range(len(audios))) - set(short):
+            results[i] = self.transcribe(audios[i])
+        if not short:
+            return results
+
+        mel = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(audios[i].astype(np.float32, copy=False)),
+                                        self.model.dims.n_mels)
+            for i in short
+        ]).to(self.model.device)
+        options = whisper.DecodingOptions(
+            language=WhisperConfig.LANGUAGE,
+            temperature=WhisperConfig.TEMPERATURE,
+            prompt=WhisperConfig.INITIAL_PROMPT,
+            fp16=self.model.device.type != "cpu",
+        )
+        tokenizer = whisper.tokenizer.get_tokenizer(self.model.is_multilingual,
+                                                    num_languages=self.model.num_languages,
+                                                    language=WhisperConfig.LANGUAGE,
+                                                    task="transcribe")
+        with self._lock:
+            decoded = whisper.decode(self.model, mel, options)
+        for i, res in zip(short, decoded):
+            result = self._to_result(res, len(audios[i]) / whisper.audio.SAMPLE_RATE, tokenizer)
+            results[i] = result if result is not None else self.transcribe(audios[i])
+        return results
+
+    @staticmethod
+    def _to_result(res, duration: float, tokenizer) -> Optional[dict]:
+        """
+        DecodingResult → نفس شكل transcribe، أو None لو transcribe كان هيعمل fallback
+        (أو مفيش timestamps نقطّع بيها) - التسجيل ده بيتعاد لوحده
+        """
+        # نفس قواعد transcribe: الصمت الغير واثق بيتشال من غير fallback
+        if res.no_speech_prob > WhisperConfig.NO_SPEECH_THRESHOLD \
+                and res.avg_logprob < WhisperConfig.LOGPROB_THRESHOLD:
+            return {"text": "", "segments": [], "language": res.language}
+        if res.avg_logprob < WhisperConfig.LOGPROB_THRESHOLD \
+                or res.compression_ratio > WhisperConfig.COMPRESSION_RATIO_THRESHOLD:
+            return None
+
+        # <|0.00|> نص <|2.40|><|2.40|> نص <|5.00|> → segment لكل نص بين timestamps
+        import whisper
+        ts_begin = tokenizer.timestamp_begin
+        segments, start, text = [], None, []
+        for token in res.tokens:
+            if token < ts_begin:
+                text.append(token)
+                continue
+            t = (token - ts_begin) * whisper.audio.HOP_LENGTH * 2 / whisper.audio.SAMPLE_RATE
+            if start is not None and text:
+                segments.append((start, t, text))
+                start, text = None, []
+            else:
+                start = t
+        if start is None and text:
+            return None                         # من غير timestamps خالص
+        if text:
+            segments.append((start, duration, text))
+        return {
+            "text":     res.text,
+            "segments": [{
+                "id":             k,
+                "start":          round(s, 2),
+                "end":            round(min(e, duration), 2),
+                "text":           tokenizer.decode(tokens),
+                "no_speech_prob": res.no_speech_prob,
+                "avg_logprob":    res.avg_logprob,
+            } for k, (s, e, tokens) in enumerate(segments)],
+            "language": res.language,
+        }
+
+    def decode_short(self, audio: np.ndarray, prompt: Optional[str], max_tokens: int) -> dict:
+        import whisper
+        audio   = whisper.pad_or_trim(audio.astype(np.float32, copy=False))
+        mel     = whisper.log_mel_spectrogram(audio, self.model.dims.n_mels).to(self.model.device)
+        options = whisper.DecodingOptions(
+            language=WhisperConfig.LANGUAGE,
+            temperature=0.0,
+            sample_len=max_tokens,
+            without_timestamps=True,
+            prompt=prompt,
+            fp16=False,
+        )
+        with self._lock:
+            res = whisper.decode(self.model, mel, options)
+        return {"text": res.text, "no_speech_prob": res.no_speech_prob}
+
+    def load_audio(self, file_path: str) -> np.ndarray:
+        import whisper
+        return whisper.load_audio(file_path)
+
+
+# ─────────────────────────────────────────────
+# faster-whisper (CTranslate2, int8 على الـ CPU)
+# ─────────────────────────────────────────────
+class FasterWhisperBackend(ASRBackend):
+
+    name = "faster-whisper"
+
+    def __init__(self, model_size: str = WhisperConfig.MODEL_SIZE, stage: str = "whisper"):
+        if not FASTER_WHISPER_AVAILABLE:
+            raise ImportError("faster-whisper مش متسطب: pip install faster-whisper")
+        from faster_whisper import WhisperModel
+        self.stage = stage
+        self.model = WhisperModel(
+            model_size,
+            device="cpu",
+            compute_type=WhisperConfig.COMPUTE_TYPE,
+            cpu_threads=WhisperConfig.CPU_THREADS,
+        )
+
+    def _run(self, audio: np.ndarray, **options) -> dict:
+        # CTranslate2 بيعمل encode و decode مع بعض لكل segment جوه الـ generator:
+        # whisper.features = الـ mel، و whisper.decode هنا = encode + decode
+        with span(f"{self.stage}.features"):
+            segments, info = self.model.transcribe(
+                audio.astype(np.float32, copy=False),
+                language=WhisperConfig.LANGUAGE,
+                temperature=WhisperConfig.TEMPERATURE,
+                beam_size=WhisperConfig.BEAM_SIZE,
+                **options,
+            )
+        with span(f"{self.stage}.decode"):
+            segs = [{
+                "id":             i,
+                "start":          s.start,
+                "end":            s.end,
+                "text":           s.text,
+                "no_speech_prob": s.no_speech_prob,
+                "avg_logprob":    s.avg_logprob,
+            } for i, s in enumerate(segments)]     # الـ generator بيفك التشفير هنا
+        return {
+            "text":     "".join(s["text"] for s in segs),
+            "segments": segs,
+            "language": info.language,
+        }
+
+    def transcribe(self, audio: np.ndarray) -> dict:
+        return self._run(
+            audio,
+            initial_prompt=WhisperConfig.INITIAL_PROMPT,
+            no_speech_threshold=WhisperConfig.NO_SPEECH_THRESHOLD,
+            condition_on_previous_text=WhisperConfig.CONDITION_ON_PREV,
+        )
+
+    def decode_short(self, audio: np.ndarray, prompt: Optional[str], max_tokens: int) -> dict:
+        res  = self._run(
+            audio[:30 * 16000],
+            initial_prompt=prompt,
+            without_timestamps=True,
+            max_new_tokens=max_tokens,
+            condition_on_previous_text=False,
+        )
+        segs = res["segments"]
+        nsp  = max((s["no_speech_prob"] for s in segs), default=1.0)
+        return {"text": res["text"], "no_speech_prob": nsp}
+
+    def load_audio(self, file_path: str) -> np.ndarray:
+        from faster_whisper import decode_audio
+        return decode_audio(file_path, sampling_rate=16000)
+
+
+# ─────────────────────────────────────────────
+# الاختيار من الإعدادات
+# ─────────────────────────────────────────────
+BACKENDS = {
+    OpenAIWhisperBackend.name: OpenAIWhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+}
+
+
+def load_backend(name: str = WhisperConfig.BACKEND,
+                 model_size: str = WhisperConfig.MODEL_SIZE,
+                 stage: str = "whisper") -> ASRBackend:
+    """stage: بادئة أسماء الـ spans (tracing) - whisper.encode / kws.decode ..."""
+    if name not in BACKENDS:
+        raise ValueError(f"محرك ASR غير معروف: '{name}' - المتاح: {list(BACKENDS)}")
+    logger.info(f"تحميل ASR [{name} / {model_size}]...")
+    return BACKENDS[name](model_size, stage=stage)
@@ -0,0 +1,357 @@
+"""
+audio_stream.py - أدوات الصوت المتدفق (Streaming)
+==================================================
+  - RingBuffer: buffer دائري float32 بحجم ثابت (مفيش نمو في الذاكرة)
+  - EnergyVAD: كشف الكلام بالطاقة مع تتبع مستوى الضوضاء
+  - Endpointer: يحدد بداية ونهاية الجملة من chunks متتالية
+  - StreamResampler: resample_poly على chunks من غير تقطيع عند الحدود
+  - FrameRecorder: تسجيل frames بأي sample rate وعدد قنوات → mono 16kHz في RingBuffer
+                   (واختياري: كل جملة تخلص بتطلع لوحدها بالـ Endpointer)
+
+الملف ده numpy و scipy بس - مفيش sounddevice - علشان يشتغل مع الميكروفون
+ومع أي مصدر تاني (WebRTC, WebSocket)
+"""
+
+import threading
+import numpy as np
+from math import gcd
+from scipy.signal import resample_poly
+from typing import Callable, List, Optional, Tuple
+
+from config import AppConfig, AudioConfig
+from preprocess import polyphase_window
+
+
+# ─────────────────────────────────────────────
+# Buffer دائري
+# ─────────────────────────────────────────────
+class RingBuffer:
+    """buffer دائري بسعة ثابتة - الجديد بيكتب فوق الأقدم"""
+
+    def __init__(self, capacity: int, dtype=np.float32):
+        self._buf  = np.zeros(max(1, int(capacity)), dtype=dtype)
+        self._pos  = 0      # مكان الكتابة الجاية
+        self._size = 0
+
+    @property
+    def capacity(self) -> int:
+        return len(self._buf)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def clear(self):
+        self._pos  = 0
+        self._size = 0
+
+    def write(self, samples: np.ndarray):
+        cap = len(self._buf)
+        n   = len(samples)
+        if n >= cap:
+            # الـ chunk أكبر من السعة: الأحدث بس هو اللي يفضل
+            self._buf[:] = samples[-cap:]
+            self._pos  = 0
+            self._size = cap
+            return
+        end = self._pos + n
+        if end <= cap:
+            self._buf[self._pos:end] = samples
+        else:
+            first = cap - self._pos
+            self._buf[self._pos:] = samples[:first]
+            self._buf[:n - first] = samples[first:]
+        self._pos  = end % cap
+        self._size = min(cap, self._size + n)
+
+    def read(self, n: Optional[int] = None) -> np.ndarray:
+        """يرجع آخر n عينة (أو كل المحتوى) بالترتيب الزمني - نسخة جديدة"""
+        n = self._size if n is None else min(int(n), self._size)
+        start = (self._pos - n) % len(self._buf)
+        if start + n <= len(self._buf):
+            return self._buf[start:start + n].copy()
+        return np.concatenate((self._buf[start:], self._buf[:(start + n) % len(self._buf)]))
+
+
+# ─────────────────────────────────────────────
+# كشف الكلام بالطاقة
+# ─────────────────────────────────────────────
+class EnergyVAD:
+    """
+    فريم كلام لو الـ RMS أعلى من max(حد أدنى ثابت، الضوضاء × نسبة)
+    مستوى الضوضاء بيتحدث (EMA) من الفريمات الصامتة بس
+    """
+
+    def __init__(self,
+                 min_rms: float = AudioConfig.VAD_MIN_RMS,
+                 ratio: float = AudioConfig.VAD_NOISE_RATIO,
+                 adapt: float = 0.05):
+        self.min_rms     = min_rms
+        self.ratio       = ratio
+        self.adapt       = adapt
+        self.noise_floor = min_rms / ratio
+
+    def threshold(self) -> float:
+        return max(self.min_rms, self.noise_floor * self.ratio)
+
+    def is_speech(self, frame: np.ndarray) -> bool:
+        rms = float(np.sqrt(np.dot(frame, frame) / max(1, len(frame))))
+        speech = rms > self.threshold()
+        if not speech:
+            self.noise_floor += self.adapt * (rms - self.noise_floor)
+        return speech
+
+
+# ─────────────────────────────────────────────
+# تحديد بداية ونهاية الجملة
+# ─────────────────────────────────────────────
+class Endpointer:
+    """
+    بياخد chunks بأي طول ويقسمها فريمات:
+      انتظار → (فريمات كلام متتالية) → كلام → (صمت طويل أو أقصى مدة) → نهاية
+    الـ pre-roll بيحفظ شوية صوت قبل بداية الكلام علشان أول حرف ما يتقطعش
+    الصوت اللي بعد نهاية الجملة في نفس الـ chunk ما بيضيعش: restart() بترجعه يتبعت تاني
+    """
+
+    WAITING, SPEECH, DONE = range(3)
+
+    def __init__(self, sample_rate: int,
+                 frame_ms: int = AudioConfig.VAD_FRAME_MS,
+                 start_frames: int = AudioConfig.VAD_START_FRAMES,
+                 end_silence: float = AudioConfig.VAD_END_SILENCE,
+                 pre_roll: float = AudioConfig.VAD_PRE_ROLL,
+                 max_duration: float = AudioConfig.MAX_RECORDING_DURATION,
+                 vad: Optional[EnergyVAD] = None):
+        self.sample_rate   = sample_rate
+        self.frame_len     = max(1, int(sample_rate * frame_ms / 1000))
+        self.start_frames  = start_frames
+        self.end_frames    = max(1, int(end_silence * 1000 / frame_ms))
+        self.vad           = vad or EnergyVAD()
+        self._pending      = np.zeros(self.frame_len, dtype=np.float32)
+        self._n_pending    = 0
+        self._pre_roll     = RingBuffer(int(pre_roll * sample_rate) + self.frame_len)
+        self._utterance    = RingBuffer(int(max_duration * sample_rate))
+        self._max_samples  = self._utterance.capacity
+        self.reset()
+
+    def reset(self):
+        self.state         = self.WAITING
+        self.frames_seen   = 0
+        self._speech_run   = 0
+        self._silence_run  = 0
+        self._n_pending    = 0
+        self._tail         = np.zeros(0, dtype=np.float32)
+        self._pre_roll.clear()
+        self._utterance.clear()
+
+    def restart(self) -> np.ndarray:
+        """
+        بعد الـ DONE: reset للجملة الجاية + الصوت اللي ما اتعالجش بعد نهاية الجملة
+        (chunk كبير ممكن يبقى فيه آخر الجملة وأول اللي بعدها) - المتصل بيعمله push
+        """
+        tail = self._tail
+        self.reset()
+        return tail
+
+    @property
+    def in_speech(self) -> bool:
+        return self.state == self.SPEECH
+
+    @property
+    def elapsed(self) -> float:
+        """الوقت اللي اتعالج لحد دلوقتي بالثواني"""
+        return self.frames_seen * self.frame_len / self.sample_rate
+
+    def push(self, chunk: np.ndarray) -> Optional[np.ndarray]:
+        """يرجع الجملة كاملة أول ما تخلص - غير كده None"""
+        chunk = np.asarray(chunk, dtype=np.float32).reshape(-1)
+        i = 0
+        while i < len(chunk) and self.state != self.DONE:
+            take = min(self.frame_len - self._n_pending, len(chunk) - i)
+            self._pending[self._n_pending:self._n_pending + take] = chunk[i:i + take]
+            self._n_pending += take
+            i += take
+            if self._n_pending == self.frame_len:
+                self._n_pending = 0
+                self._on_frame(self._pending)
+        if self.state == self.DONE:
+            self._tail = np.concatenate((self._tail, chunk[i:]))
+            return self._utterance.read()
+        return None
+
+    def stream(self, chunk: np.ndarray) -> Tuple[np.ndarray, bool]:
+        """
+        زي push بس بيرجع صوت الجملة أول بأول:
+        (الصوت الجديد من الجملة - ومعاه الـ pre-roll أول ما الكلام يبدأ، هل الجملة خلصت)
+        """
+        before = len(self._utterance)
+        self.push(chunk)
+        new    = len(self._utterance) - before
+        audio  = self._utterance.read(new) if new > 0 else np.zeros(0, dtype=np.float32)
+        return audio, self.state == self.DONE
+
+    def _on_frame(self, frame: np.ndarray):
+        self.frames_seen += 1
+        speech = self.vad.is_speech(frame)
+
+        if self.state == self.WAITING:
+            self._pre_roll.write(frame)
+            self._speech_run = self._speech_run + 1 if speech else 0
+            if self._speech_run >= self.start_frames:
+                self.state = self.SPEECH
+                self._silence_run = 0
+                self._utterance.write(self._pre_roll.read())
+            return
+
+        self._utterance.write(frame)
+        self._silence_run = 0 if speech else self._silence_run + 1
+        if (self._silence_run >= self.end_frames
+                or len(self._utterance) >= self._max_samples):
+            self.state = self.DONE
+
+
+# ─────────────────────────────────────────────
+# Resample متدفق
+# ─────────────────────────────────────────────
+class StreamResampler:
+    """
+    نفس resample_poly بتاع _resample_to_whisper بس على chunks:
+    كل استدعاء بيحتفظ بسياق قبل وبعد (pad) علشان حواف الفلتر ما تبانش،
+    والناتج المتجمع بيطابق resample الملف كله مرة واحدة
+    الفلتر بيتصمم مرة واحدة (polyphase_window) مش مع كل chunk
+    """
+
+    def __init__(self, from_sr: int, to_sr: int = AudioConfig.SAMPLE_RATE):
+        g          = gcd(int(from_sr), int(to_sr))
+        self.up    = int(to_sr) // g
+        self.down  = int(from_sr) // g
+        # نص طول فلتر resample_poly (10 × max) محسوب بعينات الدخل، مقرّب لمضاعف down
+        half       = -(-10 * max(self.up, self.down) // self.up) + 1
+        self.pad   = -(-half // self.down) * self.down
+        self.reset()
+
+    @property
+    def passthrough(self) -> bool:
+        return self.up == self.down
+
+    def reset(self):
+        self._hist    = np.zeros(self.pad, dtype=np.float32)
+        self._pending = np.zeros(0, dtype=np.float32)
+
+    def process(self, chunk: np.ndarray) -> np.ndarray:
+        chunk = np.asarray(chunk, dtype=np.float32).reshape(-1)
+        if self.passthrough:
+            return chunk.copy()
+        x = np.concatenate((self._pending, chunk))
+        n = (len(x) - self.pad) // self.down * self.down
+        if n <= 0:
+            self._pending = x
+            return np.zeros(0, dtype=np.float32)
+        out = self._run(x[:n + self.pad], n)
+        self._hist    = np.concatenate((self._hist, x[:n]))[-self.pad:]
+        self._pending = x[n:]
+        return out
+
+    def flush(self) -> np.ndarray:
+        """يطلع الباقي في آخر الـ stream (بصفر بعده زي resample_poly)"""
+        if self.passthrough or not len(self._pending):
+            return np.zeros(0, dtype=np.float32)
+        n     = len(self._pending)
+        whole = -(-n // self.down) * self.down
+        x     = np.concatenate((self._pending,
+                                np.zeros(whole - n + self.pad, dtype=np.float32)))
+        out   = self._run(x, whole)[:-(-n * self.up // self.down)]
+        self.reset()
+        return out
+
+    def _run(self, x: np.ndarray, n: int) -> np.ndarray:
+        y     = resample_poly(np.concatenate((self._hist, x)), self.up, self.down,
+                              window=polyphase_window(self.up, self.down))
+        first = self.pad * self.up // self.down
+        return y[first:first + n * self.up // self.down].astype(np.float32, copy=False)
+
+
+# ─────────────────────────────────────────────
+# تسجيل frames (WebRTC)
+# ─────────────────────────────────────────────
+class FrameRecorder:
+    """
+    frames جاية من thread تاني (WebRTC) بالـ sample rate والقنوات بتاعتها:
+    بتتحول mono 16kHz أول ما توصل وتتكتب في RingBuffer بحجم ثابت
+    تاب مفتوح ومنسي ما بيكبرش في الذاكرة - آخر max_seconds بس هي اللي بتفضل
+    on_utterance: بتتنادى (من نفس thread الـ push) بصوت كل جملة أول ما المريض يسكت
+    - لازم تكون سريعة (تبعت الجملة لـ worker مثلاً) علشان الـ frames ما تتأخرش
+    """
+
+    def __init__(self, max_seconds: float = AppConfig.RECORD_MAX_SECONDS,
+                 sample_rate: int = AudioConfig.SAMPLE_RATE,
+                 on_utterance: Optional[Callable[[np.ndarray], None]] = None):
+        self.sample_rate  = sample_rate
+        self.on_utterance = on_utterance
+        self.endpointer   = Endpointer(sample_rate) if on_utterance else None
+        self._buf         = RingBuffer(int(max_seconds * sample_rate))
+        self._lock        = threading.Lock()
+        self._resampler   = None
+        self._source_sr   = None
+
+    @property
+    def duration(self) -> float:
+        return len(self._buf) / self.sample_rate
+
+    def __len__(self) -> int:
+        return len(self._buf)
+
+    def clear(self):
+        with self._lock:
+            self._buf.clear()
+            self._resampler = None
+            self._source_sr = None
+            if self.endpointer is not None:
+                self.endpointer.reset()
+
+    def push(self, pcm: np.ndarray, sample_rate: int, channels: int = 1, planar: bool = False):
+        """
+        pcm زي av.AudioFrame.to_ndarray(): planar = (قنوات، عينات)،
+        packed = (1، عينات × قنوات) متداخلة - int بيتحول float في [-1, 1)
+        """
+        pcm = np.asarray(pcm)
+        if np.issubdtype(pcm.dtype, np.integer):
+            scale = 1.0 / (np.iinfo(pcm.dtype).max + 1.0)
+            pcm   = pcm.astype(np.float32) * np.float32(scale)
+        else:
+            pcm = pcm.astype(np.float32, copy=False)
+        frames = pcm.reshape(channels, -1) if planar else pcm.reshape(-1, channels).T
+        mono   = frames[0] if channels == 1 else frames.mean(axis=0, dtype=np.float32)
+
+        done = []
+        with self._lock:
+            if sample_rate != self._source_sr:
+                # أول frame أو الـ sample rate اتغير في النص: الباقي من القديم يتكتب الأول
+                if self._resampler is not None:
+                    done += self._write(self._resampler.flush())
+                self._resampler = StreamResampler(sample_rate, self.sample_rate)
+                self._source_sr = sample_rate
+            done += self._write(self._resampler.process(mono))
+        for utterance in done:
+            self.on_utterance(utterance)
+
+    def _write(self, chunk: np.ndarray) -> List[np.ndarray]:
+        """الجمل اللي خلصت في الـ chunk ده (ممكن أكتر من واحدة)"""
+        self._buf.write(chunk)
+        if self.endpointer is None:
+            return []
+        done = []
+        while len(chunk):
+            utterance = self.endpointer.push(chunk)
+            if utterance is None:
+                break
+            done.append(utterance)
+            chunk = self.endpointer.restart()
+        return done
+
+    def audio(self) -> np.ndarray:
+        """
+        نسخة من التسجيل لحد دلوقتي (float32 mono) - التسجيل بيكمل عادي
+        آخر كام عينة لسه في سياق الـ resampler (أقل من ms) وبتطلع مع الـ frame الجاية
+        """
+        with self._lock:
+            return self._buf.read()
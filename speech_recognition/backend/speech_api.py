@@ -1,43 +1,549 @@
-import streamlit as st
-import tempfile
-import sys
+"""
+speech_api.py - خدمة HTTP غير متزامنة للتحويل
+=============================================
+موديل واحد متحمل مرة واحدة طول عمر الخدمة، وقدامه طابور محدود:
+الروبوتات في العنبر تبعت صوت في نفس الوقت من غير ما تعطل واجهة Streamlit.
+الطابور عادل بين الجلسات (header X-Session-ID): round-robin - جلسة رفعت 20 ملف
+ما تقفلش على جلسة تانية بعت ملف واحد. واجهات Streamlit بتكلم الخدمة على
+Unix socket (service_client.py) فالـ rerun عمره ما يستنى الموديل.
+
+Endpoints:
+  POST /v1/transcribe
+       - multipart/form-data (حقل "audio": wav, m4a, mp3 ...)
+       - أو PCM خام في الـ body: ?sample_rate=48000&format=pcm16|float32
+       الرد الافتراضي: 202 + {"job_id", "status_url"} وبعدين poll
+       ?mode=wait   → 200 + النتيجة لما تخلص
+       ?mode=stream → NDJSON: الحالة/الترتيب في الطابور لحد النتيجة
+       الطابور مليان → 503 + Retry-After
+  GET  /v1/jobs/{job_id}     → status, position, eta (ثواني), progress (0..1)
+  GET  /v1/health
+  GET  /v1/metrics           → histograms لكل مرحلة (tracing) بصيغة Prometheus، أو ?format=json
+  WS   /v1/stream?sample_rate=48000&format=pcm16|float32
+       الروبوت بيبعت PCM حي (binary frames) بأي sample rate، والسيرفر بيرجع JSON:
+       {"type": "speech_start"} / {"type": "partial", "result"} / {"type": "final", "result"}
+       رسالة نصية {"type": "end"} بتقفل آخر جملة
+       frame مش سليم → {"type": "error", "error"} والاتصال بيتقفل بـ 1003
+       تجربة محلية: python backend/stream_client.py
+
+تشغيل:
+    python backend/speech_api.py [--host 0.0.0.0] [--port 8080]
+    python backend/speech_api.py --unix [/tmp/smar_med_speech.sock]   # خدمة محلية لواجهات Streamlit
+"""
+
+import argparse
+import asyncio
+import io
+import itertools
+import json
+import logging
 import os
+import sys
+import tempfile
+import time
+import math
+import socket
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Optional
+
+import numpy as np
+from aiohttp import WSCloseCode, web
+
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from speech_handler import SpeechHandler
-
-# تهيئة النظام
-st.set_page_config(page_title="SMAR-MED Speech", layout="centered")
-st.title("🤖 SMAR-MED Speech Recognition")
-
-speech_handler = SpeechHandler()
-
-# رفع الملف الصوتي
-uploaded_file = st.file_uploader("ارفع الملف الصوتي (.wav, .m4a)", type=["wav", "m4a"])
-
-if uploaded_file is not None:
-    # حفظ مؤقت
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-        tmp.write(uploaded_file.read())
-        audio_path = tmp.name
-
-    st.audio(audio_path, format='audio/wav')
-    
-    # تحويل الصوت إلى نص والتحليل
-    with st.spinner("جارٍ تحويل الصوت وتحليل النص..."):
-        result = speech_handler.recognizer.model.transcribe(audio_path, language="ar")
-        text = result['text']
-        
-        normalized = speech_handler.processor.normalize(text)
-        intent = speech_handler.processor.detect_intent(normalized)
-        symptoms = speech_handler.processor.extract_symptoms(normalized)
-        urgency = speech_handler.processor.calculate_urgency(intent, symptoms)
-
-    st.success("✅ تم التحويل والتحليل!")
-    st.write("### النص المستخرج:")
-    st.write(text)
-    
-    st.write("### التحليل الشامل:")
-    st.write(f"النص بعد المعالجة: {normalized}")
-    st.write(f"النية (Intent): {intent.value}")
-    st.write(f"الأعراض (Symptoms): {symptoms}")
-    st.write(f"درجة الاستعجال: {urgency}")
+from config import ServiceConfig
+from audio_stream import StreamResampler, Endpointer
+from tracing import REGISTRY
+
+logger = logging.getLogger("SMAR_MED_VOICE")
+
+
+# ─────────────────────────────────────────────
+# الطلبات
+# ─────────────────────────────────────────────
+@dataclass
+class Job:
+    id:        str
+    kind:      str                  # "array" أو "file"
+    payload:   object               # np.ndarray بـ 16kHz أو مسار / BytesIO
+    suffix:    str = ".wav"
+    status:    str = "queued"       # queued → running → done / failed
+    result:    object = None            # SpeechResult (مضغوط) - بيتحول لـ dict وقت الرد بس
+    error:     Optional[str] = None
+    created:   float = field(default_factory=time.time)
+    finished:  Optional[float] = None
+    done:      asyncio.Event = field(default_factory=asyncio.Event)
+    seq:       int = 0
+    session:   str = "-"            # X-Session-ID - أساس العدل في الطابور
+    started:   Optional[float] = None
+
+    def to_dict(self, position: Optional[int] = None, eta: Optional[float] = None,
+                progress: Optional[float] = None) -> dict:
+        d = {"job_id": self.id, "status": self.status}
+        if position is not None:
+            d["position"] = position
+        if eta is not None:
+            d["eta"] = round(eta, 1)
+        if progress is not None:
+            d["progress"] = round(progress, 2)
+        if self.status == "done":
+            d["result"] = self.result.to_dict() if self.result is not None else None
+        if self.error:
+            d["error"] = self.error
+        return d
+
+
+class FairQueue:
+    """
+    طابور محدود بالعدد الكلي بس بيطلّع round-robin بين الجلسات:
+    كل جلسة ليها deque، والدور بيلف عليهم بالترتيب (جلسة جديدة بتدخل آخر الدور)
+    نفس واجهة asyncio.Queue اللي الخدمة محتاجاها (put_nowait / get / qsize / maxsize)
+    """
+
+    def __init__(self, maxsize: int = 0):
+        self.maxsize   = maxsize
+        self._sessions = OrderedDict()      # session → deque[Job]
+        self._size     = 0
+        self._items    = asyncio.Semaphore(0)
+
+    def qsize(self) -> int:
+        return self._size
+
+    @property
+    def sessions(self) -> int:
+        """عدد الجلسات اللي ليها طلبات منتظرة"""
+        return len(self._sessions)
+
+    def full(self) -> bool:
+        return 0 < self.maxsize <= self._size
+
+    def put_nowait(self, job: "Job"):
+        if self.full():
+            raise asyncio.QueueFull
+        self._sessions.setdefault(job.session, deque()).append(job)
+        self._size += 1
+        self._items.release()
+
+    async def get(self) -> "Job":
+        await self._items.acquire()
+        session, jobs = next(iter(self._sessions.items()))
+        job = jobs.popleft()
+        if jobs:
+            self._sessions.move_to_end(session)
+        else:
+            del self._sessions[session]
+        self._size -= 1
+        return job
+
+    def position(self, job: "Job") -> Optional[int]:
+        """
+        عدد الطلبات اللي هتطلع قبله (0 = الجاي) بنفس ترتيب الـ round-robin:
+        الطلب رقم i في جلسته بيستنى i طلب من كل جلسة بعده في الدور و i+1 من كل جلسة قبله
+        """
+        jobs = self._sessions.get(job.session)
+        if not jobs or job not in jobs:
+            return None
+        i      = jobs.index(job)
+        ahead  = 0
+        before = True
+        for session, other in self._sessions.items():
+            if session == job.session:
+                before = False
+                ahead += i
+            else:
+                ahead += min(len(other), i + 1 if before else i)
+        return ahead
+
+
+class SpeechService:
+    """طابور عادل محدود + workers بتنادي نفس SpeechHandler في thread pool"""
+
+    ETA_ALPHA = 0.2                     # EMA لمدة الطلب - أساس الـ ETA
+
+    def __init__(self, handler=None,
+                 queue_size: int = ServiceConfig.QUEUE_SIZE,
+                 workers: int = ServiceConfig.WORKERS):
+        self.handler   = handler
+        self.queue     = FairQueue(maxsize=queue_size)
+        self.jobs      = {}
+        self.n_workers = workers
+        self.executor  = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="asr")
+        self.avg_time  = ServiceConfig.ETA_INITIAL
+        self.load_error: Optional[str] = None   # الموديل فشل يتحمل - الطلبات بترجع 503 على طول
+        self._tasks    = []
+        self._seq      = itertools.count()
+
+    async def start(self, app: web.Application):
+        self._tasks = [asyncio.create_task(self._janitor())]
+        if self.handler is None:
+            # الموديل بيتحمل مرة واحدة لطول عمر الخدمة - في الخلفية:
+            # السيرفر بيرد على طول (/v1/health → ready=false) والطلبات بتستنى في الطابور
+            self._tasks.append(asyncio.create_task(self._load()))
+        else:
+            self._start_workers()
+
+    async def _load(self):
+        from speech_handler import SpeechHandler
+        loop = asyncio.get_running_loop()
+        try:
+            # headless: من غير ميكروفون/سماعة/TTS/KWS - الخدمة تحويل بس
+            self.handler = await loop.run_in_executor(self.executor, partial(SpeechHandler, headless=True))
+        except Exception as e:
+            logger.exception("تحميل SpeechHandler فشل")
+            self.load_error = f"تحميل الموديل فشل: {e}"
+            # مفيش workers هتشيلها - اللي مستني (mode=wait / poll) ياخد الخطأ
+            while self.queue.qsize():
+                job = await self.queue.get()
+                job.status, job.error, job.payload = "failed", self.load_error, None
+                job.finished = time.time()
+                job.done.set()
+            return
+        self._start_workers()
+
+    def check_ready(self):
+        """503 لو الموديل فشل يتحمل (لسه بيتحمل = الطلب بيستنى في الطابور عادي)"""
+        if self.load_error is not None:
+            raise web.HTTPServiceUnavailable(reason=self.load_error)
+
+    def _start_workers(self):
+        self._tasks += [asyncio.create_task(self._worker()) for _ in range(self.n_workers)]
+
+    async def stop(self, app: web.Application):
+        for t in self._tasks:
+            t.cancel()
+        self.executor.shutdown(wait=False)
+
+    def submit(self, job: Job):
+        """يرفع asyncio.QueueFull لو الطابور مليان"""
+        job.seq = next(self._seq)
+        self.queue.put_nowait(job)
+        self.jobs[job.id] = job
+
+    def position(self, job: Job) -> Optional[int]:
+        """ترتيب الطلب في الطابور (0 = الجاي)"""
+        if job.status != "queued":
+            return None
+        return self.queue.position(job)
+
+    def describe(self, job: Job) -> dict:
+        """حالة الطلب + الترتيب + الوقت المتوقع للنتيجة (من متوسط مدة الطلبات)"""
+        if job.status == "running":
+            elapsed = time.time() - job.started
+            return job.to_dict(eta=max(0.0, self.avg_time - elapsed),
+                               progress=min(0.95, elapsed / self.avg_time))
+        position = self.position(job)
+        if position is None:
+            return job.to_dict()
+        # الطلبات اللي قبله بتتوزع على الـ workers + الطلب نفسه
+        rounds = math.ceil((position + 1) / self.n_workers)
+        return job.to_dict(position, eta=rounds * self.avg_time, progress=0.0)
+
+    # ── التنفيذ ────────────────────────────────
+    def _run(self, job: Job):
+        if job.kind == "array":
+            data = self.handler.transcribe_array(job.payload)
+        elif isinstance(job.payload, io.BytesIO):
+            data = self.handler.transcribe_file(job.payload)
+        else:
+            # صيغ مضغوطة محتاجة ffmpeg → ملف مؤقت
+            tmp_path = None
+            try:
+                with tempfile.NamedTemporaryFile(suffix=job.suffix, delete=False) as tmp:
+                    tmp.write(job.payload)
+                    tmp_path = tmp.name
+                data = self.handler.transcribe_file(tmp_path)
+            finally:
+                if tmp_path and os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        return data
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            job.status  = "running"
+            job.started = time.time()
+            REGISTRY.observe("service.queue", int((job.started - job.created) * 1e9))
+            try:
+                job.result = await loop.run_in_executor(self.executor, self._run, job)
+                job.status = "done"
+                self.avg_time += self.ETA_ALPHA * (time.time() - job.started - self.avg_time)
+                if job.result is None:
+                    job.error = "no_speech"
+            except Exception as e:
+                logger.error(f"API Job {job.id} فشل: {e}")
+                job.status, job.error = "failed", str(e)
+            finally:
+                job.payload  = None
+                job.finished = time.time()
+                job.done.set()
+
+    async def _janitor(self):
+        """مسح النتايج القديمة علشان الذاكرة ما تكبرش"""
+        while True:
+            await asyncio.sleep(60)
+            cutoff = time.time() - ServiceConfig.JOB_TTL
+            for job_id in [j.id for j in self.jobs.values() if j.finished and j.finished < cutoff]:
+                self.jobs.pop(job_id, None)
+
+
+# ─────────────────────────────────────────────
+# قراءة الصوت من الطلب
+# ─────────────────────────────────────────────
+PCM_FORMATS = {"pcm16": 2, "float32": 4}     # bytes لكل عينة
+MAX_SAMPLE_RATE = 192000
+
+
+def _pcm_to_float(body: bytes, fmt: str) -> np.ndarray:
+    if fmt in PCM_FORMATS and len(body) % PCM_FORMATS[fmt]:
+        raise web.HTTPBadRequest(reason=f"طول الـ body ({len(body)}) مش مضاعف "
+                                        f"{PCM_FORMATS[fmt]} bytes ({fmt})")
+    if fmt == "pcm16":
+        return np.frombuffer(body, dtype="<i2").astype(np.float32) / 32768.0
+    if fmt == "float32":
+        return np.frombuffer(body, dtype="<f4").astype(np.float32)
+    raise web.HTTPBadRequest(reason=f"format غير مدعوم: {fmt}")
+
+
+def _stream_params(request: web.Request):
+    try:
+        sample_rate = int(request.query.get("sample_rate", 16000))
+    except ValueError:
+        raise web.HTTPBadRequest(reason="sample_rate لازم يكون رقم")
+    if not 0 < sample_rate <= MAX_SAMPLE_RATE:
+        raise web.HTTPBadRequest(reason=f"sample_rate لازم يكون بين 1 و {MAX_SAMPLE_RATE}")
+    fmt = request.query.get("format", "pcm16")
+    if fmt not in PCM_FORMATS:
+        raise web.HTTPBadRequest(reason=f"format غير مدعوم: {fmt}")
+    return sample_rate, fmt
+
+
+def _decode_pcm(body: bytes, sample_rate: int, fmt: str) -> np.ndarray:
+    audio = _pcm_to_float(body, fmt)
+    if sample_rate != 16000:
+        resampler = StreamResampler(sample_rate)
+        audio = np.concatenate((resampler.process(audio), resampler.flush()))
+    return audio
+
+
+async def _job_from_request(request: web.Request) -> Job:
+    job = await _read_job(request)
+    job.session = request.headers.get("X-Session-ID") or request.remote or "-"
+    return job
+
+
+async def _read_job(request: web.Request) -> Job:
+    job_id = uuid.uuid4().hex
+    if request.content_type.startswith("multipart/"):
+        reader = await request.multipart()
+        part   = await reader.next()
+        while part is not None and part.name != "audio":
+            part = await reader.next()
+        if part is None:
+            raise web.HTTPBadRequest(reason="الحقل 'audio' مش موجود")
+        data   = await part.read()
+        suffix = os.path.splitext(part.filename or "")[-1].lower() or ".wav"
+        if suffix == ".wav":
+            return Job(job_id, "file", io.BytesIO(data))
+        return Job(job_id, "file", data, suffix=suffix)
+
+    sample_rate, fmt = _stream_params(request)
+    body = await request.read()
+    if not body:
+        raise web.HTTPBadRequest(reason="body فاضي")
+    # resample لحد MAX_UPLOAD_MB من الصوت - برا الـ event loop
+    audio = await asyncio.get_running_loop().run_in_executor(None, _decode_pcm, body, sample_rate, fmt)
+    return Job(job_id, "array", audio)
+
+
+# ─────────────────────────────────────────────
+# Routes
+# ─────────────────────────────────────────────
+routes = web.RouteTableDef()
+
+
+@routes.post("/v1/transcribe")
+async def transcribe(request: web.Request) -> web.StreamResponse:
+    service: SpeechService = request.app["service"]
+    service.check_ready()
+    job = await _job_from_request(request)
+    try:
+        service.submit(job)
+    except asyncio.QueueFull:
+        raise web.HTTPServiceUnavailable(
+            reason="الطابور مليان",
+            headers={"Retry-After": "1"},
+        )
+
+    mode = request.query.get("mode", "poll")
+    if mode == "wait":
+        await job.done.wait()
+        return web.json_response(job.to_dict(), status=200 if job.status == "done" else 500)
+
+    if mode == "stream":
+        resp = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await resp.prepare(request)
+        while True:
+            await resp.write((json.dumps(service.describe(job), ensure_ascii=False) + "\n").encode())
+            if job.done.is_set():
+                break
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout=0.5)
+            except asyncio.TimeoutError:
+                pass
+        await resp.write_eof()
+        return resp
+
+    return web.json_response(
+        {"job_id": job.id, "status_url": f"/v1/jobs/{job.id}"},
+        status=202,
+        headers={"Location": f"/v1/jobs/{job.id}"},
+    )
+
+
+@routes.get("/v1/jobs/{job_id}")
+async def job_status(request: web.Request) -> web.Response:
+    service: SpeechService = request.app["service"]
+    job = service.jobs.get(request.match_info["job_id"])
+    if job is None:
+        raise web.HTTPNotFound(reason="job غير موجود")
+    return web.json_response(service.describe(job))
+
+
+@routes.get("/v1/stream")
+async def stream(request: web.Request) -> web.WebSocketResponse:
+    """
+    PCM حي → resample أول بأول → endpointing → تحويل جزئي
+    كل جملة بتخلص بترجع final والجلسة بتكمل للجملة اللي بعدها
+    """
+    service: SpeechService = request.app["service"]
+    sample_rate, fmt = _stream_params(request)
+    service.check_ready()
+    if service.handler is None:
+        raise web.HTTPServiceUnavailable(reason="الموديل لسه بيتحمل", headers={"Retry-After": "5"})
+    ws = web.WebSocketResponse(heartbeat=30)
+    await ws.prepare(request)
+
+    loop       = asyncio.get_running_loop()
+    resampler  = StreamResampler(sample_rate)
+    endpointer = Endpointer(16000)
+    session    = None
+
+    async def send(kind: str, data=None):
+        msg = {"type": kind}
+        if kind in ("partial", "final"):
+            msg["result"] = data.to_dict() if data else None
+        elif kind == "error":
+            msg["error"] = data
+        await ws.send_str(json.dumps(msg, ensure_ascii=False))
+
+    async def push(audio: np.ndarray, last: bool = False):
+        nonlocal session
+        speech, ended = endpointer.stream(audio)
+        if len(speech):
+            if session is None:
+                session = service.handler.open_stream()
+                await send("speech_start")
+            partial = await loop.run_in_executor(service.executor, session.feed, speech)
+            if partial is not None:
+                await send("partial", partial)
+        if session is not None and (ended or last):
+            final = await loop.run_in_executor(service.executor, session.finish)
+            await send("final", final)
+            session = None
+            # الـ chunk ممكن يكون فيه أول الجملة اللي بعدها
+            tail = endpointer.restart()
+            if len(tail):
+                await push(tail, last)
+
+    async for msg in ws:
+        if msg.type == web.WSMsgType.BINARY:
+            try:
+                audio = _pcm_to_float(msg.data, fmt)
+            except web.HTTPBadRequest as e:
+                # frame مقطوع (طول مش مضاعف حجم العينة) - الـ stream بايظ من هنا
+                await send("error", e.reason)
+                await ws.close(code=WSCloseCode.UNSUPPORTED_DATA)
+                break
+            await push(resampler.process(audio))
+        elif msg.type == web.WSMsgType.TEXT:
+            try:
+                kind = json.loads(msg.data).get("type")
+            except (ValueError, AttributeError):
+                kind = None
+            if kind == "end":
+                await push(resampler.flush(), last=True)
+                break
+        elif msg.type == web.WSMsgType.ERROR:
+            logger.warning(f"WebSocket: {ws.exception()}")
+            break
+
+    await ws.close()
+    return ws
+
+
+@routes.get("/v1/health")
+async def health(request: web.Request) -> web.Response:
+    service: SpeechService = request.app["service"]
+    cache   = getattr(service.handler, "cache", None)
+    startup = getattr(service.handler, "startup", None)
+    return web.json_response({
+        "ready":    service.handler is not None,
+        "error":    service.load_error,
+        "queued":   service.queue.qsize(),
+        "capacity": service.queue.maxsize,
+        "sessions": service.queue.sessions,
+        "avg_time": round(service.avg_time, 2),
+        "cache":    cache.stats() if cache is not None else None,
+        "startup":  startup.as_dict() if startup is not None else None,
+    })
+
+
+@routes.get("/v1/metrics")
+async def metrics(request: web.Request) -> web.Response:
+    """p50/p95 لكل مرحلة من أول ما الخدمة قامت"""
+    if request.query.get("format") == "json":
+        return web.json_response(REGISTRY.as_dict())
+    return web.Response(body=REGISTRY.prometheus().encode(),
+                        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+
+def _remove_stale_socket(path: str):
+    """socket فاضل من خدمة وقعت - لو في خدمة شغالة عليه نقف"""
+    if not os.path.exists(path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.remove(path)
+        return
+    finally:
+        probe.close()
+    raise SystemExit(f"في خدمة شغالة بالفعل على {path}")
+
+
+def create_app(handler=None) -> web.Application:
+    app = web.Application(client_max_size=ServiceConfig.MAX_UPLOAD_MB * 1024 * 1024)
+    service = SpeechService(handler)
+    app["service"] = service
+    app.add_routes(routes)
+    app.on_startup.append(service.start)
+    app.on_cleanup.append(service.stop)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SMAR-MED Speech API")
+    parser.add_argument("--host", default=ServiceConfig.HOST)
+    parser.add_argument("--port", type=int, default=ServiceConfig.PORT)
+    parser.add_argument("--unix", nargs="?", const=ServiceConfig.SOCKET, default=None,
+                        help="Unix socket بدل TCP (واجهات Streamlit على نفس الجهاز)")
+    args = parser.parse_args()
+    if args.unix:
+        _remove_stale_socket(args.unix)
+        web.run_app(create_app(), path=args.unix)
+    else:
+        web.run_app(create_app(), host=args.host, port=args.port)
@@ -1,15 +1,25 @@
 import streamlit as st
 import tempfile
+import shutil
 import sys
 import os
+import logging
 import numpy as np
-import soundfile as sf
 from streamlit_webrtc import webrtc_streamer, AudioProcessorBase, WebRtcMode
 import av
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from speech_handler import SpeechHandler
+from speech_handler import SpeechHandler, SpeechResult
+from arabic_processor import Urgency
+from config import AudioConfig, LongAudioConfig
+from audio_stream import FrameRecorder
+import long_audio
+from service_client import SpeechServiceClient, ServiceBusy
+
+logger = logging.getLogger("SMAR_MED_VOICE")
 
 # ─────────────────────────────────────────────
 # 1. إعداد الصفحة والـ CSS
@@ -245,8 +255,34 @@ st.markdown("""
 def load_speech_handler():
     return SpeechHandler()
 
-with st.spinner("⏳ جارٍ تحميل النماذج..."):
-    speech_handler = load_speech_handler()
+
+@st.cache_resource(show_spinner=False)
+def live_analysis_worker() -> ThreadPoolExecutor:
+    """
+    من غير خدمة: التحليل المباشر لكل الجلسات على worker واحد قدام الموديل المحلي المشترك
+    (whisper بيفك تشفير واحد في المرة - thread لكل جلسة كانوا بيستنوا بعض على الـ lock)
+    """
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="live-analysis")
+
+
+def connect_service():
+    """
+    لو خدمة التحويل المحلية شغالة (speech_api.py --unix) كل جلسة بتاخد عميل بهوية
+    خاصة بيها في الطابور العادل - الواجهة ما بتحملش موديل ولا بتستنى التحويل
+    الحالة بتتسأل مع كل rerun (طلب محلي): الخدمة اللي قامت أو خلصت تحميل بعد فتح الصفحة بتتاخد
+    """
+    if "speech_service" not in st.session_state:
+        st.session_state["speech_service"] = SpeechServiceClient()
+    client = st.session_state["speech_service"]
+    return client if client.available() else None
+
+
+speech_service = connect_service()
+if speech_service is not None:
+    speech_handler = speech_service     # نفس transcribe_file / transcribe_array / transcribe_timeline
+else:
+    with st.spinner("⏳ جارٍ تحميل النماذج..."):
+        speech_handler = load_speech_handler()
 
 
 # ─────────────────────────────────────────────
@@ -260,62 +296,162 @@ def run_analysis(audio_path: str, section_key: str):
     """
     cache_key = f"result_{section_key}"
 
-    # تجنب إعادة التحليل عند كل re-run
-    if cache_key not in st.session_state:
-        with st.spinner("🧠 جارٍ التحليل..."):
-            raw = speech_handler.recognizer.model.transcribe(
-                audio_path, language="ar"
-            )
-            text      = raw.get("text", "").strip()
-            normalized = speech_handler.processor.normalize(text)
-            intent    = speech_handler.processor.detect_intent(normalized)
-            symptoms  = speech_handler.processor.extract_symptoms(normalized)
-            urgency   = speech_handler.processor.calculate_urgency(intent, symptoms)
-
-        st.session_state[cache_key] = {
-            "text": text,
-            "normalized": normalized,
-            "intent": intent.value,
-            "symptoms": symptoms,
-            "urgency": urgency,
-        }
-
-    r = st.session_state[cache_key]
-    _render_results(r)
-
-
-def _get_urgency_class(urgency: str) -> str:
-    if "طارئ" in urgency:  return "emergency"
-    if "عالي" in urgency:  return "high"
-    if "متوسط" in urgency: return "medium"
-    return "normal"
-
-
-def _render_results(r: dict):
+    # التسجيلات الطويلة (جولة العنبر) بتتحول على أجزاء وتتعرض timeline
+    length = long_audio.duration(audio_path) or 0.0
+    if length > LongAudioConfig.MIN_DURATION:
+        _run_timeline(audio_path, cache_key, length)
+        return
+
+    if speech_service is not None:
+        _run_job(lambda: speech_service.submit_file(audio_path), section_key)
+        return
+
+    # نفس محتوى الصوت (حتى لو اسم الملف مختلف) بيرجع فورًا من TranscriptCache
+    with st.spinner("🧠 جارٍ التحليل..."):
+        result = speech_handler.transcribe_file(audio_path)
+    _show_result(result, cache_key)
+
+
+def run_array_analysis(audio: np.ndarray, section_key: str):
+    """زي run_analysis بس لصوت float32 mono بـ 16kHz في الذاكرة (من غير ملف مؤقت)"""
+    if speech_service is not None:
+        _run_job(lambda: speech_service.submit_array(audio), section_key)
+        return
+
+    with st.spinner("🧠 جارٍ التحليل..."):
+        result = speech_handler.transcribe_array(audio)
+    _show_result(result, f"result_{section_key}")
+
+
+def _run_job(submit, section_key: str):
+    """
+    طلب للخدمة: الـ job_id بيتحفظ في session_state قبل الانتظار، فلو حصل rerun
+    في النص resume_job بيكمل نفس الطلب بدل ما يتبعت تاني
+    """
+    st.session_state.pop(f"result_{section_key}", None)
+    try:
+        st.session_state[f"job_{section_key}"] = submit()
+    except ServiceBusy as e:
+        st.warning(f"⏳ {e}")
+        return
+    resume_job(section_key)
+
+
+def resume_job(section_key: str):
+    """يستنى طلب الخدمة المفتوح للقسم ده مع الترتيب في الطابور والوقت المتوقع"""
+    job_key  = f"job_{section_key}"
+    progress = st.progress(0.0, text="⏳ في الطابور...")
+
+    def _show(status: dict):
+        eta = status.get("eta", 0)
+        if status["status"] == "queued":
+            text = f"⏳ في الطابور — قبلك {status.get('position', 0)} — حوالي {eta:.0f} ث"
+        else:
+            text = f"🧠 جارٍ التحليل — باقي حوالي {eta:.0f} ث"
+        progress.progress(status.get("progress", 0.0), text=text)
+
+    try:
+        result = speech_service.wait(st.session_state[job_key], on_progress=_show)
+    except LookupError:
+        result = None       # الطلب انتهت صلاحيته على الخدمة
+    except Exception as e:
+        st.session_state.pop(job_key, None)
+        progress.empty()
+        st.error(f"❌ خطأ في خدمة التحويل: {e}")
+        return
+    st.session_state.pop(job_key, None)
+    progress.empty()
+    _show_result(result, f"result_{section_key}")
+
+
+def _show_result(result, cache_key: str):
+    if result is None:
+        st.session_state.pop(cache_key, None)
+        st.warning("⚠️ لم يتم التعرف على كلام واضح في التسجيل.")
+        return
+
+    st.session_state[cache_key] = result
+    _render_results(result)
+
+
+def _run_timeline(audio_path: str, cache_key: str, length: float):
+    """تحويل تسجيل طويل جزء بجزء - التقدم بيظهر أول بأول والذاكرة ثابتة"""
+    progress = st.progress(0.0, text="🧠 جارٍ تحليل التسجيل الطويل...")
+    segments = []
+    for seg in speech_handler.transcribe_timeline(audio_path):
+        segments.append(seg)
+        progress.progress(min(1.0, seg.end / length),
+                          text=f"🧠 {_clock(seg.end)} / {_clock(length)}")
+    progress.empty()
+
+    if not segments:
+        st.session_state.pop(cache_key, None)
+        st.warning("⚠️ لم يتم التعرف على كلام واضح في التسجيل.")
+        return
+
+    st.session_state[cache_key] = segments
+    _render_timeline(segments)
+
+
+def _render_saved(value):
+    """النتيجة المحفوظة ممكن تكون نتيجة واحدة أو timeline"""
+    if isinstance(value, list):
+        _render_timeline(value)
+    else:
+        _render_results(value)
+
+
+def _render_live(placeholder, results):
+    """آخر LIVE_MAX جمل اتحللت من التسجيل المباشر - الأحدث فوق (جملة فشلت = رسالة خطأ مكانها)"""
+    with placeholder.container():
+        if results:
+            st.markdown('<div class="section-title">🗣️ تحليل مباشر</div>', unsafe_allow_html=True)
+        for r in reversed(results):
+            if isinstance(r, Exception):
+                st.error(f"❌ تعذر تحليل جملة: {r}")
+            else:
+                _render_results(r)
+
+
+def _clock(seconds: float) -> str:
+    m, s = divmod(int(seconds), 60)
+    return f"{m:02d}:{s:02d}"
+
+
+URGENCY_CLASS = {
+    Urgency.CRITICAL:  "emergency",
+    Urgency.MODERATE:  "high",
+    Urgency.FOLLOW_UP: "medium",
+    Urgency.STABLE:    "normal",
+}
+
+
+def _render_results(r: SpeechResult):
     """عرض نتائج التحليل بشكل موحد."""
 
-    urgency_class = _get_urgency_class(r["urgency"])
+    urgency_class = URGENCY_CLASS[r.urgency_code]
+    symptoms      = r.detected_symptoms
 
     # النص المستخرج
-    st.markdown(f'<div class="transcribed-text">❝ {r["text"]} ❞</div>', unsafe_allow_html=True)
+    st.markdown(f'<div class="transcribed-text">❝ {r.original_text} ❞</div>', unsafe_allow_html=True)
 
     # بطاقة التفاصيل
     symptoms_html = (
         '<div class="symptom-tags">' +
-        "".join(f'<span class="symptom-tag">{s}</span>' for s in r["symptoms"]) +
+        "".join(f'<span class="symptom-tag">{s}</span>' for s in symptoms) +
         "</div>"
-        if r["symptoms"] else '<span style="color:#64748b;font-size:0.85rem;">لا توجد أعراض واضحة</span>'
+        if symptoms else '<span style="color:#64748b;font-size:0.85rem;">لا توجد أعراض واضحة</span>'
     )
 
     st.markdown(f"""
     <div class="result-card">
         <div class="result-row">
             <span class="result-label">النية المكتشفة</span>
-            <span class="result-value" style="color:#7dd3fc; font-weight:600;">{r["intent"]}</span>
+            <span class="result-value" style="color:#7dd3fc; font-weight:600;">{r.detected_intent.value}</span>
         </div>
         <div class="result-row">
             <span class="result-label">النص بعد المعالجة</span>
-            <span class="result-value">{r["normalized"]}</span>
+            <span class="result-value">{r.normalized_text}</span>
         </div>
         <div class="result-row">
             <span class="result-label">الأعراض المكتشفة</span>
@@ -324,7 +460,7 @@ def _render_results(r: dict):
         <div class="result-row">
             <span class="result-label">درجة الاستعجال</span>
             <span class="result-value">
-                <span class="badge badge-{urgency_class}">{r["urgency"]}</span>
+                <span class="badge badge-{urgency_class}">{r.urgency_level}</span>
             </span>
         </div>
     </div>
@@ -338,6 +474,62 @@ def _render_results(r: dict):
         </div>
         """, unsafe_allow_html=True)
 
+    # زمن كل مرحلة في الطلب ده (tracing)
+    if r.stages:
+        with st.expander(f"⏱️ زمن المعالجة — {r.processing_time:.2f} ث"):
+            st.dataframe([{"المرحلة": name, "ms": ms} for name, ms in r.stages],
+                         use_container_width=True, hide_index=True)
+
+
+def _render_timeline(segments):
+    """ملخص التسجيل الطويل (أعلى استعجال + كل الأعراض) وجدول بالوقت"""
+    worst    = max(segments, key=lambda s: s.result.urgency_code).result
+    symptoms = list(dict.fromkeys(x for s in segments for x in s.result.detected_symptoms))
+    symptoms_html = (
+        '<div class="symptom-tags">' +
+        "".join(f'<span class="symptom-tag">{s}</span>' for s in symptoms) +
+        "</div>"
+        if symptoms else '<span style="color:#64748b;font-size:0.85rem;">لا توجد أعراض واضحة</span>'
+    )
+
+    st.markdown(f"""
+    <div class="result-card">
+        <div class="result-row">
+            <span class="result-label">المدة</span>
+            <span class="result-value">{_clock(segments[-1].end)} — {len(segments)} مقطع</span>
+        </div>
+        <div class="result-row">
+            <span class="result-label">كل الأعراض المكتشفة</span>
+            <span class="result-value">{symptoms_html}</span>
+        </div>
+        <div class="result-row">
+            <span class="result-label">أعلى درجة استعجال</span>
+            <span class="result-value">
+                <span class="badge badge-{URGENCY_CLASS[worst.urgency_code]}">{worst.urgency_level}</span>
+            </span>
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+
+    st.dataframe(
+        [{
+            "الوقت":     f"{_clock(s.start)} – {_clock(s.end)}",
+            "النص":      s.result.original_text,
+            "النية":     s.result.detected_intent.value,
+            "الأعراض":   "، ".join(s.result.detected_symptoms),
+            "الاستعجال": s.result.urgency_level,
+        } for s in segments],
+        use_container_width=True,
+        hide_index=True,
+    )
+
+    if URGENCY_CLASS[worst.urgency_code] == "emergency":
+        st.markdown("""
+        <div class="alert-emergency">
+            🚨 &nbsp; <strong>تنبيه طارئ!</strong> — يُنصح باستدعاء الطاقم الطبي فوراً.
+        </div>
+        """, unsafe_allow_html=True)
+
 
 # ─────────────────────────────────────────────
 # 4. واجهة المستخدم
@@ -375,11 +567,12 @@ with col_upload:
         # إذا تغير الملف، امسح النتيجة القديمة
         if st.session_state.get("last_uploaded") != uploaded_file.name:
             st.session_state.pop("result_upload", None)
+            st.session_state.pop("job_upload", None)
             st.session_state["last_uploaded"] = uploaded_file.name
 
         suffix = os.path.splitext(uploaded_file.name)[-1] or ".wav"
         with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
-            tmp.write(uploaded_file.read())
+            shutil.copyfileobj(uploaded_file, tmp)
             audio_path = tmp.name
 
         st.audio(audio_path)
@@ -388,9 +581,13 @@ with col_upload:
         if st.button("🔍 تحليل الملف", key="btn_upload"):
             run_analysis(audio_path, "upload")
 
+        # طلب مبعوت للخدمة قبل الـ rerun
+        elif "job_upload" in st.session_state:
+            resume_job("upload")
+
         # عرض النتيجة المحفوظة (بعد الضغط)
         elif "result_upload" in st.session_state:
-            _render_results(st.session_state["result_upload"])
+            _render_saved(st.session_state["result_upload"])
 
     else:
         st.markdown("""
@@ -411,14 +608,51 @@ with col_record:
     st.markdown('<div class="section-title">🎙️ تسجيل صوتي مباشر</div>', unsafe_allow_html=True)
 
     class AudioRecorder(AudioProcessorBase):
+        """
+        recv بيتنادى من thread الـ WebRTC: الـ frame بيتحول mono 16kHz على طول
+        ويتكتب في buffer دائري (آخر RECORD_MAX_SECONDS بس)
+        كل جملة تخلص (VAD) بتروح لـ worker في الخلفية - التحليل بيحصل والمريض لسه بيتكلم
+        """
         def __init__(self):
-            self.frames = []
+            self.recorder = FrameRecorder(on_utterance=self._on_utterance)
+            # مع الخدمة: worker للجلسة دي والعدل في طابور الخدمة - غير كده worker واحد مشترك
+            self.own      = speech_service is not None
+            self.worker   = ThreadPoolExecutor(max_workers=1, thread_name_prefix="live-analysis") \
+                            if self.own else live_analysis_worker()
+            self.pending  = deque()     # futures بترتيب الكلام
 
         def recv(self, frame: av.AudioFrame) -> av.AudioFrame:
-            pcm = frame.to_ndarray()
-            self.frames.append(pcm)
+            self.recorder.push(frame.to_ndarray(), frame.sample_rate,
+                               len(frame.layout.channels), frame.format.is_planar)
             return frame
 
+        def _on_utterance(self, audio: np.ndarray):
+            self.pending.append(self.worker.submit(speech_handler.transcribe_array, audio))
+
+        def results(self) -> list:
+            """
+            الجمل اللي اتحللت لحد دلوقتي بالترتيب - SpeechResult، أو الـ Exception لو التحليل فشل
+            (بتتعرض خطأ في مكان الجملة بدل ما تختفي). مفيش كلام واضح = مفيش حاجة
+            """
+            done = []
+            while self.pending and self.pending[0].done():
+                future = self.pending.popleft()
+                if future.cancelled():          # on_ended
+                    continue
+                error  = future.exception()
+                if error is not None:
+                    logger.error(f"تحليل جملة من التسجيل المباشر فشل: {error!r}")
+                    done.append(error)
+                elif future.result() is not None:
+                    done.append(future.result())
+            return done
+
+        def on_ended(self):
+            for future in self.pending:
+                future.cancel()
+            if self.own:
+                self.worker.shutdown(wait=False)
+
     webrtc_ctx = webrtc_streamer(
         key="speech-recorder",
         mode=WebRtcMode.SENDONLY,
@@ -427,32 +661,41 @@ with col_record:
         rtc_configuration={"iceServers": [{"urls": ["stun:stun.l.google.com:19302"]}]},
     )
 
+    live_placeholder = None
     if webrtc_ctx.audio_processor:
         st.markdown("<br>", unsafe_allow_html=True)
 
         if st.button("⏹️ إيقاف وتحليل التسجيل", key="btn_record"):
-            recorder: AudioRecorder = webrtc_ctx.audio_processor
+            recorder: FrameRecorder = webrtc_ctx.audio_processor.recorder
 
-            if not recorder.frames:
+            if not len(recorder):
                 st.warning("⚠️ لم يُسجَّل أي صوت بعد.")
             else:
                 try:
-                    audio_data = np.concatenate(recorder.frames, axis=1)
-                    tmp_file = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
-                    sf.write(tmp_file.name, audio_data.T, 48000)
-
-                    st.audio(tmp_file.name, format="audio/wav")
+                    audio_data = recorder.audio()
+                    recorder.clear()
+                    st.audio(audio_data, sample_rate=AudioConfig.SAMPLE_RATE)
 
                     # مسح نتيجة قديمة لكل تسجيل جديد
                     st.session_state.pop("result_record", None)
-                    run_analysis(tmp_file.name, "record")
+                    run_array_analysis(audio_data, "record")
 
                 except Exception as e:
                     st.error(f"❌ خطأ في معالجة الصوت: {e}")
 
+        elif "job_record" in st.session_state:
+            resume_job("record")
+
         # عرض النتيجة المحفوظة
         elif "result_record" in st.session_state:
-            _render_results(st.session_state["result_record"])
+            _render_saved(st.session_state["result_record"])
+
+        # النتايج المباشرة - جملة جملة أول ما تتحلل
+        if st.session_state.get("live_owner") != id(webrtc_ctx.audio_processor):
+            st.session_state["live_owner"]   = id(webrtc_ctx.audio_processor)
+            st.session_state["live_results"] = []
+        live_placeholder = st.empty()
+        _render_live(live_placeholder, st.session_state["live_results"])
 
     else:
         st.markdown("""
@@ -478,4 +721,19 @@ st.markdown("""
 ">
     SMAR-MED Speech Module &nbsp;·&nbsp; Powered by OpenAI Whisper &nbsp;·&nbsp; v1.0
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+# ─────────────────────────────────────────────
+# 6. التحليل المباشر
+# ─────────────────────────────────────────────
+# آخر السكريبت علشان الصفحة كلها تترسم الأول - اللوب بتاعت streamlit-webrtc
+# بتفضل شغالة طول ما التسجيل شغال وبتعرض الجمل اللي الـ worker خلصها
+LIVE_MAX = 10
+
+while live_placeholder is not None and webrtc_ctx.state.playing and webrtc_ctx.audio_processor:
+    fresh = webrtc_ctx.audio_processor.results()
+    if fresh:
+        live = (st.session_state["live_results"] + fresh)[-LIVE_MAX:]
+        st.session_state["live_results"] = live
+        _render_live(live_placeholder, live)
+    time.sleep(0.2)
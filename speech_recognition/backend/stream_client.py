@@ -0,0 +1,61 @@
+"""
+stream_client.py - تجربة WebSocket /v1/stream محلياً
+=====================================================
+بيعيد تشغيل ملف WAV كأنه روبوت بيبعت صوت حي (chunks بـ 20ms) ويطبع
+النتايج الجزئية والنهائية أول ما توصل.
+
+تشغيل (بعد python backend/speech_api.py):
+    python backend/stream_client.py [ملف.wav] [--url ws://localhost:8080/v1/stream] [--fast]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+
+import aiohttp
+import numpy as np
+import scipy.io.wavfile as wav
+
+DEFAULT_WAV = os.path.join(os.path.dirname(__file__), "New_Recording_3.wav")
+
+
+async def replay(path: str, url: str, realtime: bool):
+    sr, data = wav.read(path)
+    if data.ndim > 1:
+        data = data.mean(axis=1)
+    if data.dtype != np.int16:
+        data = np.clip(data.astype(np.float32) / max(1.0, float(np.abs(data).max())), -1, 1)
+        data = (data * 32767).astype(np.int16)
+    chunk = sr // 50
+
+    async with aiohttp.ClientSession() as session:
+        async with session.ws_connect(f"{url}?sample_rate={sr}&format=pcm16") as ws:
+
+            async def receive():
+                async for msg in ws:
+                    if msg.type != aiohttp.WSMsgType.TEXT:
+                        break
+                    event = json.loads(msg.data)
+                    result = event.get("result") or {}
+                    print(f"[{event['type']:12s}] {result.get('original_text', '')} "
+                          f"{result.get('intent', '')}")
+
+            reader = asyncio.create_task(receive())
+            for i in range(0, len(data), chunk):
+                await ws.send_bytes(data[i:i + chunk].astype("<i2").tobytes())
+                if realtime:
+                    await asyncio.sleep(chunk / sr)
+            # ثانية صمت علشان الـ endpointer يقفل الجملة، وبعدين end
+            await ws.send_bytes(np.zeros(sr, dtype="<i2").tobytes())
+            await ws.send_str(json.dumps({"type": "end"}))
+            await reader
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("wav", nargs="?", default=DEFAULT_WAV)
+    parser.add_argument("--url", default="ws://localhost:8080/v1/stream")
+    parser.add_argument("--fast", action="store_true", help="من غير انتظار real-time")
+    args = parser.parse_args()
+    asyncio.run(replay(args.wav, args.url, realtime=not args.fast))
@@ -0,0 +1,95 @@
+"""
+batching.py - تجميع طلبات التحويل في batch واحد
+================================================
+لما كذا أوضة تبعت صوت في نفس الوقت، بدل ما كل طلب يعمل decode لوحده:
+  - أول طلب بيفتح نافذة MAX_WAIT_MS
+  - كل اللي بيوصل جواها (لحد MAX_BATCH) بيتجمع
+  - المحرك بيشغل الـ encoder والـ decoder على الـ batch كله مرة واحدة
+  - كل طالب بياخد نتيجته من الـ Future بتاعه
+  - الـ batch بيتحول في thread تاني: زمن مراحله (tracing) بيتضاف لـ trace كل طالب
+"""
+
+import logging
+import queue
+import threading
+import time
+import numpy as np
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+
+import tracing
+from config import BatchConfig
+
+logger = logging.getLogger("SMAR_MED_VOICE")
+
+
+class BatchScheduler:
+
+    def __init__(self, backend,
+                 max_batch: int = BatchConfig.MAX_BATCH,
+                 max_wait_ms: float = BatchConfig.MAX_WAIT_MS):
+        self.backend   = backend
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait  = max_wait_ms / 1000.0
+        self._queue    = queue.Queue()
+        self._closed   = False
+        self._thread   = threading.Thread(target=self._loop, name="asr-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, audio: np.ndarray) -> Future:
+        if self._closed:
+            raise RuntimeError("BatchScheduler مقفول")
+        fut = Future()
+        self._queue.put((audio, fut, tracing.current()))
+        return fut
+
+    def transcribe(self, audio: np.ndarray) -> dict:
+        """نفس واجهة ASRBackend.transcribe - بس بيستنى دوره في الـ batch"""
+        return self.submit(audio).result()
+
+    def close(self):
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    # ── داخلي ──────────────────────────────────
+    def _collect(self, first) -> List[Tuple[np.ndarray, Future, Optional[tracing.Trace]]]:
+        batch    = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)   # نقفل بعد الـ batch ده
+                break
+            batch.append(item)
+        return batch
+
+    def _loop(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch  = [item for item in self._collect(first) if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            audios = [audio for audio, _, _ in batch]
+            try:
+                with tracing.activate(tracing.Trace()) as shared:
+                    results = self.backend.transcribe_batch(audios)
+            except Exception as e:
+                logger.error(f"Batch ASR Error: {e}")
+                for _, fut, _ in batch:
+                    fut.set_exception(e)
+                continue
+            if len(batch) > 1:
+                logger.info(f"Batch ASR: {len(batch)} طلبات مع بعض")
+            for (_, fut, trace), res in zip(batch, results):
+                if trace is not None:
+                    trace.merge(shared)     # كل طالب استنى الـ batch كله
+                fut.set_result(res)
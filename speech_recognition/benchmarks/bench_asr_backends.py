@@ -0,0 +1,53 @@
+"""
+bench_asr_backends.py - مقارنة سرعة محركات الـ ASR (Real-Time Factor)
+=====================================================================
+RTF = وقت التحويل / طول الصوت (أقل = أسرع)
+
+تشغيل:
+    python benchmarks/bench_asr_backends.py [ملف.wav] [--model small] [--runs 3]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from asr_backends import BACKENDS, load_backend
+from config import WhisperConfig
+
+DEFAULT_WAV = os.path.join(os.path.dirname(__file__), "..", "backend", "New_Recording_3.wav")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("wav", nargs="?", default=DEFAULT_WAV)
+    parser.add_argument("--model", default=WhisperConfig.MODEL_SIZE)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    audio    = None
+    duration = 0.0
+    for name in BACKENDS:
+        try:
+            backend = load_backend(name, args.model)
+        except ImportError as e:
+            print(f"{name:16s} ⏭️  {e}")
+            continue
+        if audio is None:
+            audio    = backend.load_audio(args.wav)
+            duration = len(audio) / 16000
+
+        backend.transcribe(audio[:16000])           # warm-up
+        times = []
+        for _ in range(args.runs):
+            t0 = time.perf_counter()
+            res = backend.transcribe(audio)
+            times.append(time.perf_counter() - t0)
+        best = min(times)
+        print(f"{name:16s} {best:6.2f}s  RTF={best / duration:.3f}  | {res['text'].strip()[:60]}")
+
+
+if __name__ == "__main__":
+    main()
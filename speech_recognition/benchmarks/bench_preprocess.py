@@ -0,0 +1,114 @@
+"""
+bench_preprocess.py - تجهيز الصوت: الـ pipeline القديم مقابل AudioPreprocessor
+==============================================================================
+لكل sample rate جهاز: الزمن لكل ثانية صوت + أقصى ذاكرة اتحجزت فوق الـ input (tracemalloc)
+كنسبة من حجم التسجيل نفسه (≈ عدد النسخ اللي كانت عايشة في نفس الوقت)
++ الـ streaming: StreamResampler على chunks بطول 30ms (الفلتر متصمم مرة مقابل كل chunk)
+
+تشغيل:
+    python benchmarks/bench_preprocess.py [--seconds 7] [--runs 20]
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from math import gcd
+
+import numpy as np
+from scipy.signal import resample_poly
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from audio_stream import StreamResampler
+from preprocess import AudioPreprocessor
+
+WHISPER_SR = 16000
+
+
+def _legacy(raw: np.ndarray, sr: int) -> np.ndarray:
+    """نفس خطوات _process_audio + _check_level قبل التعديل"""
+    float(np.sqrt(np.mean(raw ** 2)))
+    audio = raw.flatten().astype(np.float32)
+    if sr != WHISPER_SR:
+        g     = gcd(sr, WHISPER_SR)
+        audio = resample_poly(audio, WHISPER_SR // g, sr // g).astype(np.float32)
+    audio = np.append(audio[0], audio[1:] - 0.97 * audio[:-1])
+    return (audio / np.max(np.abs(audio)) * 0.95).astype(np.float32)
+
+
+def _new(proc: AudioPreprocessor):
+    from preprocess import rms
+
+    def run(raw: np.ndarray, sr: int) -> np.ndarray:
+        rms(raw)
+        return proc.process(raw, inplace=True)
+    return run
+
+
+def _legacy_stream(x: np.ndarray, up: int, down: int, chunk: int):
+    """StreamResampler قبل التعديل: resample_poly بيصمم الفلتر مع كل chunk"""
+    r = StreamResampler(down * 100, up * 100)
+    r._run = lambda buf, n: resample_poly(np.concatenate((r._hist, buf)), up, down)[
+        r.pad * up // down:r.pad * up // down + n * up // down].astype(np.float32)
+    for i in range(0, len(x), chunk):
+        r.process(x[i:i + chunk])
+
+
+def _stream(x: np.ndarray, up: int, down: int, chunk: int):
+    r = StreamResampler(down * 100, up * 100)
+    for i in range(0, len(x), chunk):
+        r.process(x[i:i + chunk])
+
+
+def _measure(fn, make_input, runs: int):
+    """(ms لكل تشغيل، أقصى ذاكرة اتحجزت بالـ bytes) - الـ input مش محسوب"""
+    fn(make_input())                                     # الفلتر المتخزن وغيره
+    t = 0.0
+    for _ in range(runs):
+        x  = make_input()
+        t0 = time.perf_counter()
+        fn(x)
+        t += time.perf_counter() - t0
+    x = make_input()
+    tracemalloc.start()
+    fn(x)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return t / runs * 1e3, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=7.0)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    rng  = np.random.default_rng(0)
+
+    print("تسجيل كامل (_process_audio)")
+    print(f"{'SR':>6s} {'legacy ms/s':>12s} {'new ms/s':>9s} "
+          f"{'legacy MB':>10s} {'new MB':>7s} {'legacy ×input':>14s} {'new ×input':>11s}")
+    for sr in (16000, 44100, 48000):
+        n    = int(sr * args.seconds)
+        make = lambda: (rng.standard_normal((n, 1)) * 0.1).astype(np.float32)
+        size = n * 4
+        old_t, old_b = _measure(lambda raw: _legacy(raw, sr), make, args.runs)
+        new_t, new_b = _measure(lambda raw, f=_new(AudioPreprocessor(sr)): f(raw, sr), make, args.runs)
+        print(f"{sr:6d} {old_t / args.seconds:12.2f} {new_t / args.seconds:9.2f} "
+              f"{old_b / 2**20:10.2f} {new_b / 2**20:7.2f} {old_b / size:14.2f} {new_b / size:11.2f}")
+
+    print("\nstreaming (StreamResampler، chunks بطول 30ms)")
+    print(f"{'SR':>6s} {'legacy ms/s':>12s} {'cached ms/s':>12s} {'speedup':>8s}")
+    for sr in (44100, 48000):
+        g     = gcd(sr, WHISPER_SR)
+        up, down, chunk = WHISPER_SR // g, sr // g, int(sr * 0.03)
+        n     = int(sr * args.seconds)
+        make  = lambda: (rng.standard_normal(n) * 0.1).astype(np.float32)
+        old_t, _ = _measure(lambda x: _legacy_stream(x, up, down, chunk), make, max(1, args.runs // 4))
+        new_t, _ = _measure(lambda x: _stream(x, up, down, chunk), make, max(1, args.runs // 4))
+        print(f"{sr:6d} {old_t / args.seconds:12.2f} {new_t / args.seconds:12.2f} {old_t / new_t:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+bench_process_batch.py - مراجعة أرشيف النصوص: process لكل نص مقابل process_batch
+================================================================================
+نصوص صناعية من القاموس (بتكرار زي الأرشيف الحقيقي)
+
+تشغيل:
+    python benchmarks/bench_process_batch.py [--n 20000] [--workers 4]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from arabic_processor import ArabicMedicalProcessor, EGYPTIAN_TO_FORMAL, SYMPTOMS_DB
+
+FILLER = ["أنا", "في", "من", "و", "جدا", "النهارده", "صدري", "بطني", "يا دكتور"]
+
+
+def _archive(n: int, rng: random.Random):
+    vocab = list(EGYPTIAN_TO_FORMAL) + SYMPTOMS_DB + FILLER
+    unique = [" ".join(rng.choice(vocab) for _ in range(rng.randint(2, 10))) for _ in range(n // 4)]
+    return [rng.choice(unique) for _ in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    texts     = _archive(args.n, random.Random(0))
+    processor = ArabicMedicalProcessor()
+
+    t0 = time.perf_counter()
+    rows = [processor.process(t) for t in texts]
+    loop = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    batch = processor.process_batch(texts)
+    single = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    sharded = processor.process_batch(texts, workers=args.workers)
+    pooled = time.perf_counter() - t0
+
+    assert all(batch.row(i) == rows[i] for i in range(len(texts)))
+    assert (sharded.symptoms == batch.symptoms).all()
+    print(f"{len(texts)} نص")
+    print(f"process لكل نص:             {loop:6.2f}s")
+    print(f"process_batch:              {single:6.2f}s  ({loop / single:.1f}x)")
+    print(f"process_batch ({args.workers} workers):  {pooled:6.2f}s  ({loop / pooled:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+bench_text_matcher.py - سرعة ArabicMedicalProcessor مع كبر القواميس
+====================================================================
+بيقارن الطريقة القديمة (str.replace / in لكل كلمة) بالـ automaton
+على قواميس صناعية من 50 لحد 5000 عبارة - نفس النص في كل مرة
++ زمن البحث التقريبي عن كلمة فيها خطأ إملائي في فهرس الـ trigrams
+
+تشغيل:
+    python benchmarks/bench_text_matcher.py [--runs 200]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from arabic_processor import (ArabicMedicalProcessor, EGYPTIAN_TO_FORMAL,
+                              INTENT_KEYWORDS, SYMPTOMS_DB, IntentType)
+from text_matcher import FuzzyIndex
+
+LETTERS = "ابتثجحخدذرزسشصضطظعغفقكلمنهوي"
+TYPO    = "غسيان"
+TEXT    = "أنا عندي وجع في صدري من امبارح ومش قادر أتنفس ومحتاج دواء السكر دلوقتي"
+
+
+def _word(rng: random.Random) -> str:
+    return "".join(rng.choice(LETTERS) for _ in range(rng.randint(3, 7)))
+
+
+def _dictionaries(size: int, rng: random.Random):
+    """القواميس الحقيقية + عبارات عشوائية لحد الحجم المطلوب"""
+    dialect  = dict(EGYPTIAN_TO_FORMAL)
+    keywords = {k: list(v) for k, v in INTENT_KEYWORDS.items()}
+    symptoms = list(SYMPTOMS_DB)
+    intents  = list(keywords)
+    while len(dialect) < size:
+        dialect[_word(rng) + " " + _word(rng)] = _word(rng)
+    while len(symptoms) < size:
+        symptoms.append(_word(rng))
+        keywords[rng.choice(intents)].append(_word(rng))
+    return dialect, keywords, symptoms
+
+
+def _legacy(text, dialect, keywords, symptoms):
+    """نفس منطق النسخة القديمة من process"""
+    for d, f in dialect.items():
+        text = text.replace(d, f)
+    intent = next((i for i, words in keywords.items() if any(w in text for w in words)),
+                  IntentType.GENERAL_CHAT)
+    return text, intent, [s for s in symptoms if s in text]
+
+
+def _time(fn, runs: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - t0) / runs * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'size':>6s} {'legacy µs':>10s} {'automaton µs':>13s} {'speedup':>8s} "
+          f"{'build ms':>9s} {'fuzzy lookup µs':>16s}")
+    for size in (50, 200, 1000, 5000):
+        dialect, keywords, symptoms = _dictionaries(size, rng)
+        t0 = time.perf_counter()
+        proc = ArabicMedicalProcessor(dialect, keywords, symptoms, fuzzy=False)
+        build = (time.perf_counter() - t0) * 1e3
+
+        old = _time(lambda: _legacy(TEXT, dialect, keywords, symptoms), args.runs)
+        new = _time(lambda: proc.process(TEXT), args.runs)
+        fuzzy = FuzzyIndex(symptoms)
+        look  = _time(lambda: fuzzy.lookup(TYPO), args.runs)
+        print(f"{size:6d} {old:10.1f} {new:13.1f} {old / new:7.1f}x {build:9.1f} {look:16.1f}")
+
+
+if __name__ == "__main__":
+    main()
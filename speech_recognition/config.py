@@ -4,12 +4,29 @@ config.py - الإعدادات المركزية لنظام SMAR-MED
 جميع الإعدادات في مكان واحد - لا تكرار في الملفات الأخرى
 """
 
+import os
+
+# الكاش والأوزان المتحولة في مكان ثابت مش في الـ CWD: streamlit و speech_api والاختبارات
+# بيتشغلوا من أماكن مختلفة وكانوا بيعملوا كاش لكل واحد - وبرة شجرة الكود (الأوزان ~1GB)
+# (SMAR_MED_DATA_DIR لمكان تاني)
+DATA_DIR = os.environ.get("SMAR_MED_DATA_DIR", os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser(os.path.join("~", ".cache")), "smar_med"))
+
 class WhisperConfig:
     """إعدادات نموذج Whisper للتعرف على الكلام"""
     MODEL_SIZE          = "small"       # خيارات: tiny, base, small, medium, large
+    BACKEND             = "openai"      # "openai" (PyTorch) أو "faster-whisper" (CTranslate2)
+    COMPUTE_TYPE        = "int8"        # faster-whisper بس: int8, int8_float32, float32
+    CPU_THREADS         = 0             # faster-whisper بس: 0 = تلقائي
+    BEAM_SIZE           = 1             # faster-whisper بس: 1 = greedy زي openai مع temperature=0
+    MMAP_WEIGHTS        = True          # openai بس: الأوزان بتتحول مرة لملف fp32 وتتحمل mmap
+    WEIGHTS_DIR         = os.path.join(DATA_DIR, "whisper_weights")  # مكان الملفات المتحولة
+    WARMUP              = True          # تحويل صوت صامت في الخلفية بعد التحميل (أول طلب ما يبقاش بطيء)
     LANGUAGE            = "ar"
     TEMPERATURE         = 0.0          # 0.0 = أقل هلوسة، أكثر دقة
     NO_SPEECH_THRESHOLD = 0.6          # تجاهل النتيجة إذا كان الصمت > 60%
+    LOGPROB_THRESHOLD   = -1.0         # أقل من كده = النتيجة مش واثقة (fallback / صمت)
+    COMPRESSION_RATIO_THRESHOLD = 2.4  # أعلى من كده = النص بيكرر نفسه (هلوسة)
     CONDITION_ON_PREV   = False        # منع الهلوسة التكرارية
     INITIAL_PROMPT      = (
         "المريض يتحدث باللهجة المصرية أو العربية الفصحى عن أعراض طبية. "
@@ -24,11 +41,105 @@ class AudioConfig:
     CHANNELS            = 1            # mono
     DTYPE               = 'float32'
 
+    # ── التسجيل المتدفق مع كشف الكلام (VAD) ──
+    CAPTURE_MODE        = "vad"        # "vad" = يقف لما المريض يسكت، "fixed" = مدة ثابتة
+    MAX_RECORDING_DURATION = 15        # أقصى طول للجملة (ثواني)
+    START_TIMEOUT       = 7            # لو مفيش كلام خلال المدة دي نرجع None
+    VAD_FRAME_MS        = 30           # طول الفريم (ms)
+    VAD_MIN_RMS         = 0.005        # أقل RMS يعتبر كلام
+    VAD_NOISE_RATIO     = 3.0          # الكلام لازم يعدي الضوضاء بالنسبة دي
+    VAD_START_FRAMES    = 3            # فريمات كلام متتالية لبداية الجملة
+    VAD_END_SILENCE     = 0.7          # صمت بعد الكلام لإنهاء الجملة (ثواني)
+    VAD_PRE_ROLL        = 0.3          # صوت محفوظ قبل بداية الكلام (ثواني)
+
+
+class BatchConfig:
+    """تجميع طلبات التحويل المتزامنة (سيرفر مشترك)"""
+    ENABLED             = False        # على الجهاز اللي جنب السرير مفيش طلبات متزامنة
+    MAX_BATCH           = 8            # أقصى عدد تسجيلات في batch
+    MAX_WAIT_MS         = 50           # أقصى تأخير إضافي لأي طلب (ms)
+
+
+class PoolConfig:
+    """مجموعة عمليات للتحويل (سيرفر متعدد الأسرّة)"""
+    WORKERS             = 0            # 0 = عملية واحدة (من غير pool)
+    THREADS_PER_WORKER  = 2            # threads لكل worker (torch.set_num_threads)
+    HEALTH_INTERVAL     = 2.0          # فحص الـ workers كل (ثواني)
+    TASK_TIMEOUT        = 120          # worker معلق أكتر من كده بيتقتل (ثواني)
+    MAX_RETRIES         = 1            # إعادة الطلب لو الـ worker وقع
+    START_METHOD        = "spawn"      # مش fork: الأم فيها threads و torch - الابن ممكن يعلق على lock موروث
+
+
+class CacheConfig:
+    """كاش نتايج Whisper على الديسك - مفتاحه hash الصوت + إعدادات الموديل"""
+    ENABLED             = True
+    PATH                = os.path.join(DATA_DIR, "transcript_cache.sqlite3")
+    MAX_MB              = 200          # أقصى حجم - الأقدم استخدامًا بيتمسح الأول (LRU)
+
+
+class KWSConfig:
+    """كشف كلمات الطوارئ السريع قبل Whisper الكامل"""
+    ENABLED             = True
+    MODEL_SIZE          = "tiny"       # موديل صغير وسريع - الهدف الكلمة مش النص كله
+    MAX_TOKENS          = 24           # فك تشفير قصير (greedy)
+    NO_SPEECH_THRESHOLD = 0.5
+    PROMPT              = "إلحقوني، بموت، جلطة، مش قادر أتنفس، إغماء."
+
+
+class StreamingConfig:
+    """إعدادات التحويل الجزئي أثناء الكلام"""
+    STEP                = 1.0          # إعادة التحويل كل ثانية (ثواني)
+    WINDOW              = 10.0         # أقصى طول للنافذة قبل تثبيت الجزء المتفق عليه (ثواني)
+
+
+class LongAudioConfig:
+    """التسجيلات الطويلة (جولة العنبر): تحويل على أجزاء بذاكرة ثابتة"""
+    MIN_DURATION        = 60.0         # أطول من كده → timeline بدل نتيجة واحدة (ثواني)
+    WINDOW              = 30.0         # أقصى طول للجزء - نافذة Whisper (ثواني)
+    CUT_SEARCH          = 5.0          # القطع عند أهدى فريم في آخر المدة دي من الجزء (ثواني)
+    WORKERS             = 0            # 0 = الأجزاء ورا بعض، غير كده thread pool (openai: decode واحد في المرة)
+
+
+class DuplexConfig:
+    """تسجيل وتشغيل في نفس الوقت (barge-in) - الروبوت بيسمع وهو بيتكلم"""
+    ENABLED             = True         # لو الجهاز مش بيدعم stream مزدوج بيرجع للتسجيل العادي
+    ECHO_TAIL_MS        = 250          # أقصى تأخير بين الصوت الخارج ورجوعه للميكروفون (ms)
+    ECHO_MARGIN         = 2.0          # كلام المريض لازم يعدي الصدى المتوقع بالنسبة دي
+    BARGE_IN_FRAMES     = 5            # فريمات كلام متتالية أثناء التشغيل علشان نقطع الـ TTS
+    BARGE_IN_LISTEN     = True         # كلام المريض اللي قاطع الرد بيتسجل ويتحول على طول
+    HISTORY             = 2.0          # صوت محفوظ قبل ما حد يبدأ يسمع (ثواني)
+
+
+class ServiceConfig:
+    """خدمة HTTP للتحويل (backend/speech_api.py)"""
+    HOST                = "0.0.0.0"
+    PORT                = 8080
+    QUEUE_SIZE          = 32           # أقصى طلبات منتظرة - بعدها 503 (backpressure)
+    WORKERS             = 1            # طلبات بتتحول في نفس الوقت على نفس الموديل
+    JOB_TTL             = 600          # مدة الاحتفاظ بنتيجة الطلب (ثواني)
+    MAX_UPLOAD_MB       = 50
+    SOCKET              = "/tmp/smar_med_speech.sock"  # خدمة محلية لواجهات Streamlit (--unix)
+    ETA_INITIAL         = 3.0          # مدة الطلب المتوقعة قبل أول قياس (ثواني)
+
+
+class MatchConfig:
+    """مطابقة الأعراض والكلمات المفتاحية مع أخطاء الإملاء بتاعة Whisper"""
+    FUZZY               = True         # False = تطابق حرفي بس
+    MAX_EDIT_DISTANCE   = 2            # أقصى عدد تعديلات (حذف/إضافة/تبديل حرف)
+    CHARS_PER_EDIT      = 6            # تعديل واحد لكل 6 حروف (وتعديل واحد على الأقل من MIN_LENGTH)
+    MIN_LENGTH          = 4            # أقصر من كده حرفي بس (حمى، كحة، "دوا" مش "دوار")
+    MIN_SCORE           = 0.75         # أقل درجة تشابه تتحسب تطابق (كلمة 4 حروف بتعديل واحد = 0.75)
+    EXCLUDE             = ("أسماء", "صراع", "دواء")   # كلمات عادية على بعد حرف من كلمة طبية - حرفي بس
+
 
 class TTSConfig:
     """إعدادات تحويل النص لكلام"""
     LANGUAGE            = "ar"
     SLOW                = False
+    ENGINES             = ("gtts", "pyttsx3")   # بالترتيب - لو الأول فشل (مفيش نت) التاني offline
+    CACHE_DIR           = os.path.join(DATA_DIR, "tts_cache")  # الجمل المتولدة بتتحفظ هنا وتتعاد من غير شبكة
+    CACHE_MAX_MB        = 50           # الأقدم بيتمسح الأول
+    OFFLINE_RATE        = 150          # pyttsx3: كلمة في الدقيقة (SLOW = 70% منها)
 
 
 class LogConfig:
@@ -42,4 +153,5 @@ class AppConfig:
     """إعدادات تطبيق Streamlit"""
     PAGE_TITLE          = "SMAR-MED Speech"
     PAGE_ICON           = "🩺"
-    LAYOUT              = "centered"
\ No newline at end of file
+    LAYOUT              = "centered"
+    RECORD_MAX_SECONDS  = 120          # تسجيل WebRTC: buffer دائري - بعد المدة دي الأقدم بيتمسح
\ No newline at end of file
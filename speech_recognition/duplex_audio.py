@@ -0,0 +1,257 @@
+"""
+duplex_audio.py - تسجيل وتشغيل في نفس الوقت (barge-in)
+======================================================
+قبل كده الميكروفون كان أطرش طول ما الـ TTS شغال، والتسجيل والتشغيل ورا بعض
+  - DuplexAudio: stream واحد (sd.Stream) للدخل والخرج - الـ callback بيكتب
+                 الـ TTS للسماعة ويقرا الميكروفون في نفس اللحظة
+  - EchoSuppressor: الصوت الخارج معروف، فالفريم اللي طاقته في حدود الصدى
+                 المتوقع منه بيتصفر - واللي أعلى منه يبقى كلام المريض
+  - المريض لو اتكلم أثناء الرد: التشغيل بيقف فورًا وصوته متحفظ في الـ history
+    علشان التحويل (on_barge_in) يبدأ من أول كلمة
+  - الـ callback (thread الصوت بتاع PortAudio) بيكتب السماعة ويكبت الصدى بس:
+    الفريم النضيف بيروح طابور واحد، والـ history والـ listeners والـ log وon_barge_in
+    على thread تاني (duplex-audio) - مفيش lock ولا I/O ولا كود برا في الـ callback
+  - DuplexOutput: مخرج لـ PlaybackWorker فوق المحرك ده
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import sounddevice as sd
+    SOUNDDEVICE_AVAILABLE = True
+except (ImportError, OSError):          # OSError: مكتبة PortAudio مش موجودة
+    SOUNDDEVICE_AVAILABLE = False
+
+from audio_stream import RingBuffer
+from config import AudioConfig, DuplexConfig
+
+logger = logging.getLogger("SMAR_MED_VOICE")
+
+
+def _rms(x: np.ndarray) -> float:
+    return float(np.sqrt(np.dot(x, x) / max(1, len(x))))
+
+
+# ─────────────────────────────────────────────
+# كبت الصدى
+# ─────────────────────────────────────────────
+class EchoSuppressor:
+    """
+    الصدى المتوقع = أعلى RMS للصوت الخارج في آخر tail فريم × معامل الاقتران
+    (السماعة → الميكروفون). المعامل بيتعلم (EMA) من الفريمات اللي فيها صدى بس
+      - الميكروفون ≤ margin × الصدى المتوقع: صدى → الفريم بيتصفر
+      - أعلى من كده وأعلى من min_rms: كلام المريض فوق الصدى (double talk)
+    """
+
+    def __init__(self, tail_frames: int,
+                 margin: float = DuplexConfig.ECHO_MARGIN,
+                 min_rms: float = AudioConfig.VAD_MIN_RMS,
+                 adapt: float = 0.05,
+                 coupling: float = 1.0):
+        self.margin   = margin
+        self.min_rms  = min_rms
+        self.adapt    = adapt
+        self.coupling = coupling
+        self._ref     = deque(maxlen=max(1, tail_frames))
+
+    def process(self, mic: np.ndarray, ref: np.ndarray) -> Tuple[np.ndarray, bool]:
+        """(الفريم بعد الكبت، هل فيه كلام من المريض فوق الصدى)"""
+        self._ref.append(_rms(ref))
+        ref_rms = max(self._ref)
+        mic_rms = _rms(mic)
+        if ref_rms <= 1e-6:
+            return mic, mic_rms > self.min_rms
+        echo = ref_rms * self.coupling
+        if mic_rms > max(self.min_rms, self.margin * echo):
+            return mic, True
+        self.coupling += self.adapt * (min(mic_rms / ref_rms, 4.0) - self.coupling)
+        return np.zeros_like(mic), False
+
+
+# ─────────────────────────────────────────────
+# المحرك
+# ─────────────────────────────────────────────
+class DuplexAudio:
+
+    def __init__(self, sample_rate: int,
+                 frame_ms: int = AudioConfig.VAD_FRAME_MS,
+                 barge_in_frames: int = DuplexConfig.BARGE_IN_FRAMES,
+                 history: float = DuplexConfig.HISTORY,
+                 on_barge_in: Optional[Callable[[], None]] = None):
+        self.sample_rate     = sample_rate
+        self.frame_len       = max(1, int(sample_rate * frame_ms / 1000))
+        self.barge_in_frames = barge_in_frames
+        self.on_barge_in     = on_barge_in
+        self.suppressor      = EchoSuppressor(-(-DuplexConfig.ECHO_TAIL_MS // frame_ms))
+        self.barge_ins       = 0
+        self.interrupted     = False
+        self.stream          = None
+        self._lock           = threading.Lock()      # الـ history والـ listeners (برا الـ callback)
+        # [pcm, مكان التشغيل] - begin بيحط list جديدة فالـ callback ما يحتاجش lock
+        self._play: Optional[list] = None
+        self._run            = 0
+        self._frames         = queue.SimpleQueue()   # callback → worker: (فريم نضيف، مقاطعة)
+        self._worker: Optional[threading.Thread] = None
+        self._history        = RingBuffer(int(history * sample_rate))
+        self._listeners: List[queue.Queue] = []
+
+    # ── الجهاز ─────────────────────────────────
+    def start(self):
+        if not SOUNDDEVICE_AVAILABLE:
+            raise RuntimeError("sounddevice مش متاحة")
+        self.stream = sd.Stream(samplerate=self.sample_rate,
+                                channels=1,
+                                dtype='float32',
+                                blocksize=self.frame_len,
+                                latency='low',
+                                callback=self._callback)
+        self._worker = threading.Thread(target=self._pump_loop, name="duplex-audio", daemon=True)
+        self._worker.start()
+        self.stream.start()
+        logger.info(f"Duplex audio شغال على {self.sample_rate}Hz | latency: {self.stream.latency}")
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        if self._worker is not None:
+            self._frames.put(None)
+            self._worker.join(timeout=1.0)
+            self._worker = None
+
+    # ── التشغيل ────────────────────────────────
+    @property
+    def playing(self) -> bool:
+        return self._play is not None
+
+    def begin(self, pcm: np.ndarray):
+        """يبدأ تشغيل PCM (float32 mono بنفس sample_rate) - بيرجع على طول"""
+        self.interrupted = False
+        self._play       = [np.asarray(pcm, dtype=np.float32).reshape(-1), 0]
+
+    def stop(self):
+        self._play = None
+
+    # ── الاستماع ───────────────────────────────
+    @property
+    def listening(self) -> bool:
+        """في حد بيسمع دلوقتي (تسجيل شغال بياخد الفريمات)"""
+        with self._lock:
+            return bool(self._listeners)
+
+    @contextmanager
+    def listen(self) -> Iterator[queue.Queue]:
+        """
+        queue بفريمات الميكروفون بعد كبت الصدى - أولها الـ history
+        (الكلام اللي بدأ قبل ما حد يسمع ما يضيعش). بعد القفل الـ history بيتمسح
+        """
+        blocks = queue.Queue()
+        with self._lock:
+            if len(self._history):
+                blocks.put(self._history.read())
+            self._listeners.append(blocks)
+        try:
+            yield blocks
+        finally:
+            with self._lock:
+                self._listeners.remove(blocks)
+                self._history.clear()
+
+    # ── الـ callback (thread الصوت) ────────────
+    def _callback(self, indata, outdata, frames, time_info, status):
+        self._process(indata[:, 0], outdata[:, 0], status)
+
+    def _process(self, mic: np.ndarray, out: np.ndarray, status=None):
+        """فريم واحد: يكتب الـ TTS في out ويفلتر mic ويكشف مقاطعة المريض"""
+        play    = self._play
+        playing = play is not None
+        if playing:
+            pcm, pos = play
+            chunk    = pcm[pos:pos + len(out)]
+            out[:len(chunk)] = chunk
+            out[len(chunk):] = 0.0
+            play[1] = pos + len(out)
+            if play[1] >= len(pcm) and self._play is play:
+                self._play = None
+        else:
+            out[:] = 0.0
+
+        clean, near_end = self.suppressor.process(np.asarray(mic, dtype=np.float32), out)
+        self._run = self._run + 1 if (playing and near_end) else 0
+        barged    = self._run >= self.barge_in_frames and self._play is play and playing
+        if barged:
+            self._play       = None
+            self.interrupted = True
+            self.barge_ins  += 1
+            self._run        = 0
+        # الـ buffer بتاع PortAudio بيتعاد استخدامه - نسخة واحدة هنا وبس
+        self._frames.put((np.array(clean, dtype=np.float32), barged, status))
+
+    # ── برا thread الصوت ───────────────────────
+    def _pump_loop(self):
+        while self._pump():
+            pass
+
+    def _pump(self, block: bool = True) -> bool:
+        """فريم من طابور الـ callback → history + listeners + المقاطعة - False لما المحرك يتقفل"""
+        try:
+            item = self._frames.get(block=block)
+        except queue.Empty:
+            return True
+        if item is None:
+            return False
+        clean, barged, status = item
+        if status:
+            logger.warning(f"Duplex stream: {status}")
+        with self._lock:
+            self._history.write(clean)
+            for blocks in self._listeners:
+                blocks.put(clean.copy())
+        if barged:
+            logger.info("المريض قاطع الرد - التشغيل وقف")
+            if self.on_barge_in:
+                self.on_barge_in()
+        return True
+
+
+# ─────────────────────────────────────────────
+# مخرج لـ PlaybackWorker
+# ─────────────────────────────────────────────
+class DuplexOutput:
+    """
+    decode(data, suffix, path) → PCM بـ sample rate المحرك
+    كل ملف بيتفك مرة واحدة ويفضل في الذاكرة (LRU)
+    """
+
+    def __init__(self, engine: DuplexAudio, decode: Callable[[bytes, str, str], np.ndarray],
+                 entries: int = 64):
+        self.engine  = engine
+        self.decode  = decode
+        self.entries = entries
+        self._pcm: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+    def _load(self, data: bytes, suffix: str, path: str) -> np.ndarray:
+        pcm = self._pcm.pop(path, None)
+        if pcm is None:
+            pcm = self.decode(data, suffix, path)
+        self._pcm[path] = pcm
+        while len(self._pcm) > self.entries:
+            self._pcm.popitem(last=False)
+        return pcm
+
+    def play(self, data: bytes, suffix: str, path: str, should_stop: Callable[[], bool]) -> bool:
+        self.engine.begin(self._load(data, suffix, path))
+        while self.engine.playing:
+            if should_stop():
+                self.engine.stop()
+                return False
+            time.sleep(0.01)
+        return not self.engine.interrupted
@@ -0,0 +1,42 @@
+"""
+keyword_spotter.py - كشف كلمات الطوارئ قبل التحويل الكامل
+==========================================================
+  - بيشتغل على نفس الـ buffer (16kHz) اللي _process_audio بيطلعه
+  - Whisper tiny (بنفس محرك WhisperConfig.BACKEND) + greedy قصير من غير timestamps
+    = جزء صغير من وقت small
+  - النتيجة بتتطابق مع كلمات IntentType.EMERGENCY بعد التطبيع
+  - أي hit بيفتح مسار الطوارئ فوراً والتحويل الكامل بيكمل في الخلفية
+"""
+
+import logging
+import numpy as np
+from typing import Optional
+
+from config import KWSConfig
+from asr_backends import load_backend
+from arabic_processor import ArabicMedicalProcessor, IntentType, INTENT_KEYWORDS
+
+logger = logging.getLogger("SMAR_MED_VOICE")
+
+
+class KeywordSpotter:
+
+    def __init__(self, processor: Optional[ArabicMedicalProcessor] = None,
+                 model_size: str = KWSConfig.MODEL_SIZE):
+        logger.info(f"تحميل KWS [{model_size}]...")
+        self.backend   = load_backend(model_size=model_size, stage="kws")
+        self.processor = processor or ArabicMedicalProcessor()
+        self.keywords  = INTENT_KEYWORDS[IntentType.EMERGENCY]
+
+    def spot(self, audio: np.ndarray) -> Optional[str]:
+        """يرجع كلمة الطوارئ اللي اتلقت - أو None"""
+        res = self.backend.decode_short(audio, KWSConfig.PROMPT, KWSConfig.MAX_TOKENS)
+
+        if res["no_speech_prob"] > KWSConfig.NO_SPEECH_THRESHOLD:
+            return None
+        text = self.processor.normalize(res["text"].strip().lower())
+        for word in self.keywords:
+            if word in text:
+                logger.warning(f"KWS: كلمة طوارئ '{word}' في '{res['text'].strip()}'")
+                return word
+        return None
@@ -0,0 +1,154 @@
+"""
+long_audio.py - قراءة التسجيلات الطويلة على أجزاء بذاكرة ثابتة
+==============================================================
+تسجيل 30 دقيقة كان بيتحمل كله في الذاكرة ويتحول في مرور Whisper واحد
+  - read_blocks(): الملف بيتقري block ورا block (soundfile، أو ffmpeg pipe للـ m4a وغيره)
+                   ويتحول float32 mono بـ 16kHz بـ StreamResampler
+  - iter_windows(): أجزاء ≤ WINDOW ثانية في buffer ثابت الحجم - القطع عند أهدى
+                   فريم قرب آخر الجزء علشان الكلمة ما تتقسمش
+الذاكرة = buffer جزء واحد + block واحد مهما كان طول الملف
+"""
+
+import logging
+import subprocess
+import threading
+from typing import BinaryIO, Iterable, Iterator, Optional, Tuple, Union
+
+import numpy as np
+
+try:
+    import soundfile as sf
+    SOUNDFILE_AVAILABLE = True
+except (ImportError, OSError):          # OSError: libsndfile مش موجودة
+    SOUNDFILE_AVAILABLE = False
+
+from audio_stream import StreamResampler
+from config import AudioConfig, LongAudioConfig
+
+logger = logging.getLogger("SMAR_MED_VOICE")
+
+Source = Union[str, BinaryIO]
+
+
+# ─────────────────────────────────────────────
+# القراءة
+# ─────────────────────────────────────────────
+def duration(source: Source) -> Optional[float]:
+    """مدة الملف من الـ header من غير ما يتفك - None لو الصيغة مش معروفة لـ soundfile"""
+    if not SOUNDFILE_AVAILABLE:
+        return None
+    pos = source.tell() if hasattr(source, "tell") else None
+    try:
+        return sf.info(source).duration
+    except Exception:
+        return None
+    finally:
+        if pos is not None:
+            source.seek(pos)
+
+
+def read_blocks(source: Source, sr: int = AudioConfig.SAMPLE_RATE,
+                block_seconds: float = 1.0) -> Iterator[np.ndarray]:
+    """float32 mono بـ sr - block ورا block من غير ما الملف كله يتحمل"""
+    if SOUNDFILE_AVAILABLE:
+        pos = source.tell() if hasattr(source, "tell") else None
+        try:
+            f = sf.SoundFile(source)
+        except Exception:
+            f = None
+            if pos is not None:
+                source.seek(pos)
+        if f is not None:
+            with f:
+                yield from _soundfile_blocks(f, sr, block_seconds)
+            return
+    yield from _ffmpeg_blocks(source, sr, block_seconds)
+
+
+def _soundfile_blocks(f, sr: int, block_seconds: float) -> Iterator[np.ndarray]:
+    resampler = StreamResampler(f.samplerate, sr)
+    frames    = max(1, int(f.samplerate * block_seconds))
+    out       = np.empty((frames, f.channels), dtype=np.float32)
+    for block in f.blocks(dtype="float32", always_2d=True, out=out):
+        mono = block[:, 0] if f.channels == 1 else block.mean(axis=1)
+        yield resampler.process(mono)
+    tail = resampler.flush()
+    if len(tail):
+        yield tail
+
+
+def _ffmpeg_blocks(source: Source, sr: int, block_seconds: float) -> Iterator[np.ndarray]:
+    """نفس أمر whisper.load_audio بس الناتج بيتقري من الـ pipe أول بأول"""
+    from_file = isinstance(source, str)
+    cmd = ["ffmpeg", "-loglevel", "error", "-i", source if from_file else "pipe:0",
+           "-f", "s16le", "-ac", "1", "-ar", str(sr), "pipe:1"]
+    try:
+        proc = subprocess.Popen(cmd, stdin=None if from_file else subprocess.PIPE,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except FileNotFoundError:
+        raise RuntimeError("الصيغة محتاجة ffmpeg ومش موجود")
+
+    if not from_file:
+        def _feed():
+            try:
+                while chunk := source.read(1 << 16):
+                    proc.stdin.write(chunk)
+            except (BrokenPipeError, ValueError):
+                pass
+            finally:
+                proc.stdin.close()
+        threading.Thread(target=_feed, daemon=True).start()
+
+    size = max(2, int(sr * block_seconds) * 2)
+    try:
+        while data := proc.stdout.read(size):
+            yield np.frombuffer(data[:len(data) // 2 * 2], dtype="<i2").astype(np.float32) / 32768.0
+    finally:
+        proc.stdout.close()
+        if proc.wait() != 0:
+            logger.warning(f"ffmpeg: {proc.stderr.read().decode(errors='ignore').strip()}")
+        proc.stderr.close()
+
+
+# ─────────────────────────────────────────────
+# التقسيم
+# ─────────────────────────────────────────────
+def _quietest_cut(tail: np.ndarray, frame: int) -> int:
+    """مكان القطع جوه tail: نص أهدى فريم"""
+    n = len(tail) // frame
+    if n == 0:
+        return len(tail)
+    frames = tail[:n * frame].reshape(n, frame)
+    return int(np.argmin(np.einsum("ij,ij->i", frames, frames))) * frame + frame // 2
+
+
+def iter_windows(blocks: Iterable[np.ndarray], sr: int = AudioConfig.SAMPLE_RATE,
+                 window: float = LongAudioConfig.WINDOW,
+                 search: float = LongAudioConfig.CUT_SEARCH,
+                 frame_ms: int = AudioConfig.VAD_FRAME_MS) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    (أول عينة في الملف، الجزء) - كل جزء نسخة مستقلة (ممكن تروح thread تاني)
+    الجزء بيتقطع عند أهدى فريم في آخر search ثانية منه، والباقي بيبدأ الجزء اللي بعده
+    """
+    cap    = int(window * sr)
+    look   = min(cap, int(search * sr))
+    frame  = max(1, int(sr * frame_ms / 1000))
+    buf    = np.empty(cap, dtype=np.float32)
+    fill   = 0
+    offset = 0
+    for block in blocks:
+        i = 0
+        while i < len(block):
+            take = min(cap - fill, len(block) - i)
+            buf[fill:fill + take] = block[i:i + take]
+            fill += take
+            i    += take
+            if fill < cap:
+                continue
+            cut = cap - look + _quietest_cut(buf[cap - look:], frame)
+            yield offset, buf[:cut].copy()
+            offset += cut
+            fill    = cap - cut
+            buf[:fill] = buf[cut:cap]
+    if fill:
+        yield offset, buf[:fill].copy()
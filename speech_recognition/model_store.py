@@ -0,0 +1,96 @@
+"""
+model_store.py - تحميل Whisper من ملف أوزان متحول مسبقًا (mmap)
+================================================================
+whisper.load_model بيقرا checkpoint الـ fp16 كله في الذاكرة وبعدين بينسخه
+لموديل fp32 اتبنى بأوزان عشوائية - يعني قراية + نسختين + init على الفاضي
+  - convert(): مرة واحدة - الأوزان بتتحفظ fp32 بالظبط زي ما الموديل محتاجها
+  - load_mmap(): torch.load(mmap=True) + load_state_dict(assign=True)
+                 الموديل بيتبني على meta (من غير init) والأوزان بتشاور على الملف نفسه
+                 → الصفحات بتتقري أول ما تتلمس، وأي process تاني بيفتح نفس الملف
+                   بياخدها من الـ page cache ببلاش
+"""
+
+import logging
+import os
+
+from config import WhisperConfig
+
+logger = logging.getLogger("SMAR_MED_VOICE")
+
+FORMAT_VERSION = 1
+
+
+def mmap_path(model_size: str, weights_dir: str = WhisperConfig.WEIGHTS_DIR) -> str:
+    return os.path.join(weights_dir, f"whisper-{model_size}.fp32.v{FORMAT_VERSION}.pt")
+
+
+def convert(model, out_path: str) -> str:
+    """
+    يحفظ موديل Whisper محمّل بالشكل اللي load_mmap بتقراه
+    الـ buffers اللي مش في الـ state_dict (mask، alignment_heads) بتتحفظ كمان
+    علشان ما نحتاجش نبني الموديل بجد وقت التحميل
+    """
+    import torch
+
+    persistent = model.state_dict()
+    buffers    = {name: (buf.to_dense() if buf.is_sparse else buf).contiguous()
+                  for name, buf in model.named_buffers() if name not in persistent}
+    checkpoint = {
+        "version":          FORMAT_VERSION,
+        "dims":             vars(model.dims),
+        "model_state_dict": {k: v.float().contiguous() for k, v in persistent.items()},
+        "buffers":          buffers,
+        "sparse":           [name for name, buf in model.named_buffers() if buf.is_sparse],
+    }
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    tmp = out_path + ".tmp"
+    torch.save(checkpoint, tmp)
+    os.replace(tmp, out_path)                  # ملف نص مكتوب عمره ما يتقري
+    logger.info(f"الأوزان اتحولت: {out_path} ({os.path.getsize(out_path) / 2**20:.0f} MB)")
+    return out_path
+
+
+def load_mmap(path: str):
+    """Whisper على الـ CPU بأوزان متوصلة بالملف (zero-copy)"""
+    import torch
+    from whisper.model import AudioEncoder, ModelDimensions, TextDecoder, Whisper
+
+    checkpoint = torch.load(path, mmap=True, weights_only=True, map_location="cpu")
+    dims       = ModelDimensions(**checkpoint["dims"])
+    # نفس Whisper.__init__ بس على meta - الأصلي بيعمل to_sparse ومش بيشتغل على meta
+    # (alignment_heads بيرجع من الـ buffers المتحفظة تحت)
+    model = Whisper.__new__(Whisper)
+    torch.nn.Module.__init__(model)
+    model.dims = dims
+    with torch.device("meta"):
+        model.encoder = AudioEncoder(dims.n_mels, dims.n_audio_ctx, dims.n_audio_state,
+                                     dims.n_audio_head, dims.n_audio_layer)
+        model.decoder = TextDecoder(dims.n_vocab, dims.n_text_ctx, dims.n_text_state,
+                                    dims.n_text_head, dims.n_text_layer)
+    model.load_state_dict(checkpoint["model_state_dict"], assign=True)
+    for name, buf in checkpoint["buffers"].items():
+        module, _, leaf = name.rpartition(".")
+        if name in checkpoint["sparse"]:
+            buf = buf.to_sparse()
+        model.get_submodule(module).register_buffer(leaf, buf, persistent=False)
+    return model.eval()
+
+
+def load_whisper(model_size: str = WhisperConfig.MODEL_SIZE,
+                 weights_dir: str = WhisperConfig.WEIGHTS_DIR):
+    """
+    نقطة الدخول لـ OpenAIWhisperBackend:
+    أول مرة بيحمل عادي ويحوّل، بعد كده بيحمل mmap على طول
+    (على GPU أو لو MMAP_WEIGHTS مقفول: whisper.load_model زي الأول)
+    """
+    import torch
+    import whisper
+
+    if not WhisperConfig.MMAP_WEIGHTS or torch.cuda.is_available():
+        return whisper.load_model(model_size)
+
+    path = mmap_path(model_size, weights_dir)
+    if not os.path.exists(path):
+        logger.info(f"أول تشغيل لـ [{model_size}] - تحويل الأوزان لـ {path}...")
+        convert(whisper.load_model(model_size, device="cpu"), path)
+    return load_mmap(path)
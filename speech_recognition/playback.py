@@ -0,0 +1,237 @@
+"""
+playback.py - worker واحد للتشغيل الصوتي بطابور أولويات
+=======================================================
+بدل thread جديد مع كل speak() (وكلهم بيتخانقوا على pygame.mixer.music):
+  - thread واحد بس هو اللي بيملك جهاز الصوت
+  - الجمل بتتشغل من buffer في الذاكرة (BytesIO) - مش من ملف مع كل مرة
+  - طابور أولويات: رسالة طوارئ بتقطع اللي شغال وبتلغي الأقل منها في الطابور
+  - كل طلب ليه PlaybackHandle: cancel() / wait() / status / latency
+  - stats(): زمن الانتظار لحد أول صوت (p50 / p95) وعدد الملغي والمقطوع
+pygame بيتعمله import و mixer.init() جوه الـ worker - مش وقت تشغيل النظام
+"""
+
+import io
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from enum import IntEnum
+from importlib.util import find_spec
+from typing import Callable, List, Optional, Sequence
+
+from tracing import span
+
+PYGAME_AVAILABLE    = find_spec("pygame") is not None
+PLAYSOUND_AVAILABLE = find_spec("playsound") is not None
+
+logger = logging.getLogger("SMAR_MED_VOICE")
+
+
+class Priority(IntEnum):
+    """الأقل رقمًا يتشغل الأول"""
+    EMERGENCY = 0
+    ALERT     = 1
+    NORMAL    = 2
+
+
+# ─────────────────────────────────────────────
+# مخرج الصوت
+# ─────────────────────────────────────────────
+class PygameOutput:
+    """pygame.mixer.music من buffer في الذاكرة - بيقف فورًا لما should_stop ترجع True"""
+
+    def __init__(self):
+        import pygame
+        pygame.mixer.init()
+        self.pygame = pygame
+
+    def play(self, data: bytes, suffix: str, path: str, should_stop: Callable[[], bool]) -> bool:
+        pygame = self.pygame
+        pygame.mixer.music.load(io.BytesIO(data), suffix.lstrip("."))
+        pygame.mixer.music.play()
+        try:
+            while pygame.mixer.music.get_busy():
+                if should_stop():
+                    pygame.mixer.music.stop()
+                    return False
+                time.sleep(0.02)
+            return True
+        finally:
+            pygame.mixer.music.unload()
+
+
+class PlaysoundOutput:
+    """playsound محتاج مسار ومش بيتقطع - الإلغاء بيأثر بين الأجزاء بس"""
+
+    def play(self, data: bytes, suffix: str, path: str, should_stop: Callable[[], bool]) -> bool:
+        from playsound import playsound
+        playsound(path)
+        return not should_stop()
+
+
+def default_output():
+    if PYGAME_AVAILABLE:
+        return PygameOutput()
+    if PLAYSOUND_AVAILABLE:
+        return PlaysoundOutput()
+    return None
+
+
+# ─────────────────────────────────────────────
+# الطلب
+# ─────────────────────────────────────────────
+class PlaybackHandle:
+
+    def __init__(self, parts: Sequence[str], priority: Priority):
+        self.parts     = list(parts)
+        self.priority  = Priority(priority)
+        self.status    = "queued"          # queued → playing → done / cancelled / failed
+        self.submitted = time.monotonic()
+        self.started:  Optional[float] = None
+        self.finished: Optional[float] = None
+        self.preempted = False             # اتلغى علشان طوارئ - متعدد في "preempted" مش "cancelled"
+        self._cancel   = threading.Event()
+        self._done     = threading.Event()
+
+    def cancel(self):
+        """إلغاء قبل التشغيل أو قطع أثناءه"""
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    @property
+    def latency(self) -> Optional[float]:
+        """من الطلب لحد أول صوت (ثواني)"""
+        return None if self.started is None else self.started - self.submitted
+
+    def _finish(self, status: str):
+        self.status   = status
+        self.finished = time.monotonic()
+        self._done.set()
+
+
+# ─────────────────────────────────────────────
+# الـ worker
+# ─────────────────────────────────────────────
+class PlaybackWorker:
+
+    BUFFER_ENTRIES = 64                    # ملفات متحملة في الذاكرة (LRU)
+
+    def __init__(self, synth, output=None):
+        self.synth    = synth
+        self.output   = output             # None = الافتراضي، بيتجهز جوه الـ worker
+        self._queue   = queue.PriorityQueue()
+        self._seq     = itertools.count()
+        self._lock    = threading.Lock()
+        self._pending: List[PlaybackHandle] = []
+        self._current: Optional[PlaybackHandle] = None
+        self._buffers: "OrderedDict[str, bytes]" = OrderedDict()
+        self._latency = deque(maxlen=200)
+        self._counts  = {"played": 0, "cancelled": 0, "preempted": 0, "failed": 0}
+        self._thread  = threading.Thread(target=self._loop, name="tts-playback", daemon=True)
+        self._thread.start()
+
+    # ── الواجهة ────────────────────────────────
+    def play(self, parts: Sequence[str], priority: Priority = Priority.NORMAL) -> PlaybackHandle:
+        handle = PlaybackHandle(parts, priority)
+        with self._lock:
+            if handle.priority == Priority.EMERGENCY:
+                self._preempt(handle.priority)
+            self._pending.append(handle)
+        self._queue.put((handle.priority, next(self._seq), handle))
+        return handle
+
+    def stop_all(self):
+        """إلغاء كل اللي في الطابور واللي شغال"""
+        with self._lock:
+            for h in [*self._pending, self._current]:
+                if h is not None:
+                    h.cancel()
+
+    def stats(self) -> dict:
+        lat = sorted(self._latency)
+        pct = lambda q: round(lat[min(len(lat) - 1, int(q * len(lat)))] * 1000, 1) if lat else None
+        with self._lock:
+            return {**self._counts,
+                    "queued":          len(self._pending),
+                    "latency_p50_ms":  pct(0.50),
+                    "latency_p95_ms":  pct(0.95),
+                    "latency_max_ms":  round(lat[-1] * 1000, 1) if lat else None}
+
+    # ── داخلي ──────────────────────────────────
+    def _preempt(self, priority: Priority):
+        """الطوارئ: قطع الشغال ولغي كل اللي أقل منها (لازم يتنادى والـ lock ماسك)"""
+        for h in [*self._pending, self._current]:
+            if h is not None and h.priority > priority and not h.cancelled:
+                h.preempted = True
+                h.cancel()
+                self._counts["preempted"] += 1
+
+    def _load(self, path: str) -> bytes:
+        data = self._buffers.pop(path, None)
+        if data is None:
+            with open(path, "rb") as f:
+                data = f.read()
+        self._buffers[path] = data
+        while len(self._buffers) > self.BUFFER_ENTRIES:
+            self._buffers.popitem(last=False)
+        return data
+
+    def _loop(self):
+        if self.output is None:
+            try:
+                self.output = default_output()
+            except Exception as e:
+                logger.error(f"Audio output init failed: {e}")
+            if self.output is None:
+                logger.warning("مفيش مخرج صوت (pygame / playsound) - الردود مش هتتسمع")
+        while True:
+            _, _, handle = self._queue.get()
+            with self._lock:
+                self._pending.remove(handle)
+                if handle.cancelled:
+                    self._count("cancelled", handle)
+                    handle._finish("cancelled")
+                    continue
+                self._current = handle
+            try:
+                status = self._play(handle)
+            except Exception as e:
+                logger.error(f"Playback Error: {e}")
+                status = "failed"
+            with self._lock:
+                self._current = None
+                self._count("played" if status == "done" else status, handle)
+            handle._finish(status)
+
+    def _count(self, bucket: str, handle: PlaybackHandle):
+        """كل طلب في خانة واحدة - اللي اتقطع علشان طوارئ اتعد خلاص في _preempt"""
+        if bucket in self._counts and not (bucket == "cancelled" and handle.preempted):
+            self._counts[bucket] += 1
+
+    def _play(self, handle: PlaybackHandle) -> str:
+        handle.status = "playing"
+        for part in handle.parts:
+            if handle.cancelled:
+                return "cancelled"
+            with span("tts.synthesize"):
+                path = self.synth.render(part)
+            if path is None or self.output is None:
+                continue
+            data = self._load(path)
+            if handle.started is None:
+                handle.started = time.monotonic()
+                self._latency.append(handle.latency)
+            with span("playback"):
+                played = self.output.play(data, os.path.splitext(path)[1], path, lambda: handle.cancelled)
+            if not played:
+                return "cancelled"
+        return "done" if handle.started is not None else "failed"
@@ -0,0 +1,116 @@
+"""
+preprocess.py - تجهيز الصوت لـ Whisper من غير نسخ على الفاضي
+=============================================================
+الـ pipeline القديم كان بيعمل array جديدة في كل خطوة:
+flatten().astype → resample_poly → astype → np.append (pre-emphasis) → القسمة (normalize)
+ومع التسجيل المتدفق ده بيتكرر كذا مرة في الثانية
+  - polyphase_window: فلتر resample_poly (firwin بـ kaiser) بيتصمم مرة واحدة لكل (up, down)
+                      - resample_poly من غيره بيعيد تصميمه مع كل chunk
+  - AudioPreprocessor: array واحدة بس بتتعمل (ناتج الـ resample) وكل اللي بعده في نفس المكان:
+                      pre-emphasis + أعلى قيمة على blocks صغيرة (الـ block بيفضل في الكاش)
+                      وبعدين ضرب واحد للـ normalize
+"""
+
+import threading
+from functools import lru_cache
+from math import gcd
+
+import numpy as np
+from scipy.signal import firwin, resample_poly
+
+from config import AudioConfig
+from tracing import span
+
+
+@lru_cache(maxsize=None)
+def polyphase_window(up: int, down: int, dtype=np.float32) -> np.ndarray:
+    """نفس الفلتر اللي resample_poly بيصممه لوحده (window=('kaiser', 5.0)) - للقراية بس"""
+    max_rate = max(up, down)
+    h = firwin(2 * 10 * max_rate + 1, 1.0 / max_rate, window=("kaiser", 5.0)).astype(dtype)
+    h.flags.writeable = False
+    return h
+
+
+def resample(audio: np.ndarray, from_sr: int, to_sr: int = AudioConfig.SAMPLE_RATE) -> np.ndarray:
+    """resample_poly بالفلتر المتخزن - نفس الناتج بالظبط"""
+    g = gcd(int(from_sr), int(to_sr))
+    up, down = int(to_sr) // g, int(from_sr) // g
+    if up == down:
+        return audio
+    return resample_poly(audio, up, down, window=polyphase_window(up, down, audio.dtype.type))
+
+
+def rms(audio: np.ndarray) -> float:
+    """RMS من غير array مربعات (dot بيجمع في مكانه)"""
+    audio = audio.reshape(-1)
+    return float(np.sqrt(np.dot(audio, audio) / max(1, len(audio))))
+
+
+class AudioPreprocessor:
+    """
+    flatten → resample → pre-emphasis → normalize لجهاز sample rate ثابت
+    الـ scratch بحجم block ثابت بيتعمل مرة واحدة؛ الـ lock علشان أكتر من thread
+    """
+
+    BLOCK = 16384                      # عينات - block الـ pre-emphasis + peak
+
+    def __init__(self, from_sr: int, to_sr: int = AudioConfig.SAMPLE_RATE,
+                 coef: float = 0.97, target_peak: float = 0.95):
+        g                = gcd(int(from_sr), int(to_sr))
+        self.up          = int(to_sr) // g
+        self.down        = int(from_sr) // g
+        self.coef        = np.float32(coef)
+        self.target_peak = target_peak
+        self._scratch    = np.empty(self.BLOCK, dtype=np.float32)
+        self._lock       = threading.Lock()
+
+    def process(self, raw: np.ndarray, inplace: bool = False) -> np.ndarray:
+        """
+        الناتج float32 mono بـ to_sr
+        inplace=True: لو مفيش resample، raw نفسه بيتعدل (لو float32 و contiguous) بدل نسخة
+        """
+        x = np.asarray(raw).reshape(-1)
+        if self.up != self.down:
+            with span("resample"):
+                x = resample_poly(x.astype(np.float32, copy=False), self.up, self.down,
+                                  window=polyphase_window(self.up, self.down))
+        elif x.dtype != np.float32 or not inplace or not x.flags.writeable:
+            x = x.astype(np.float32)            # النسخة الوحيدة
+        with span("preprocess"):
+            with self._lock:
+                _, peak = self._emphasize(x, float(x[0]) if len(x) else 0.0)
+            if peak > 0:
+                x *= np.float32(self.target_peak / peak)
+        return x
+
+    def pre_emphasis(self, x: np.ndarray, prev: float) -> float:
+        """
+        pre-emphasis في المكان لـ chunk من stream - prev = آخر عينة (قبل التعديل) من الـ chunk اللي فات
+        بيرجع آخر عينة أصلية من الـ chunk ده علشان الجاي
+        """
+        with self._lock:
+            last, _ = self._emphasize(x, prev, first=True)
+        return last
+
+    def _emphasize(self, x: np.ndarray, prev: float, first: bool = False):
+        """
+        y[i] = x[i] - coef·x[i-1] في المكان + أعلى |y| في نفس المرور
+        first=False: أول عينة بتفضل زي ما هي (زي np.append(audio[0], ...))
+        """
+        n = len(x)
+        if n == 0:
+            return prev, 0.0
+        coef, s = self.coef, self._scratch
+        start   = 0 if first else 1
+        peak    = 0.0 if first else abs(float(x[0]))
+        while start < n:
+            blk  = x[start:start + self.BLOCK]
+            m    = len(blk)
+            last = float(blk[-1])
+            np.multiply(blk[:-1], coef, out=s[1:m])
+            s[0] = coef * np.float32(prev)
+            np.subtract(blk, s[:m], out=blk)
+            peak  = max(peak, float(blk.max()), -float(blk.min()))
+            prev  = last
+            start += m
+        return prev, peak
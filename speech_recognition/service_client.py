@@ -0,0 +1,194 @@
+"""
+service_client.py - عميل خدمة التحويل المحلية
+=============================================
+واجهات Streamlit بتبعت الصوت لخدمة واحدة (backend/speech_api.py --unix) بدل ما كل
+عملية تحمل Whisper وتحوّل في thread السكريبت:
+  - الموديل متحمل مرة واحدة للجهاز كله، والطابور عادل بين الجلسات (X-Session-ID)
+  - submit_*() بترجع job_id على طول، و status() بيرجع الترتيب والـ ETA والتقدم
+    → الواجهة بتعمل poll وتقدر تكمل نفس الطلب بعد rerun من غير ما تبعته تاني
+  - transcribe_file / transcribe_array نفس توقيع SpeechHandler (بتستنى النتيجة)
+
+HTTP على Unix socket بالمكتبة القياسية بس (http.client) - مفيش aiohttp في الواجهة
+"""
+
+import http.client
+import json
+import os
+import socket
+import time
+import uuid
+from collections import deque
+from typing import BinaryIO, Callable, Iterator, Optional, Tuple, Union
+
+import numpy as np
+
+from config import AudioConfig, LongAudioConfig, ServiceConfig
+from long_audio import iter_windows, read_blocks
+from speech_result import SpeechResult, TimelineSegment
+
+
+class ServiceBusy(RuntimeError):
+    """الطابور مليان (503) - retry_after ثواني"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"خدمة التحويل مشغولة - حاول بعد {retry_after:g} ثانية")
+        self.retry_after = retry_after
+
+
+class _UnixConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+# ─────────────────────────────────────────────
+# العميل
+# ─────────────────────────────────────────────
+class SpeechServiceClient:
+    """
+    session: هوية الجلسة في الطابور العادل - واحدة لكل مستخدم Streamlit
+    poll:    كل قد إيه wait() بتسأل عن الحالة (ثواني)
+    """
+
+    def __init__(self, socket_path: str = ServiceConfig.SOCKET,
+                 session: Optional[str] = None,
+                 timeout: float = 10.0, poll: float = 0.25):
+        self.socket_path = socket_path
+        self.session     = session or uuid.uuid4().hex
+        self.timeout     = timeout
+        self.poll        = poll
+
+    # ── الحالة ─────────────────────────────────
+    def health(self) -> Optional[dict]:
+        """None لو الخدمة مش شغالة"""
+        if not os.path.exists(self.socket_path):
+            return None
+        try:
+            return self._request("GET", "/v1/health")[1]
+        except OSError:
+            return None
+
+    def available(self) -> bool:
+        """الخدمة شغالة والموديل متحمل - لسه بيحمل أو التحميل فشل (health["error"]) = لأ"""
+        health = self.health()
+        return bool(health and health.get("ready"))
+
+    def status(self, job_id: str) -> dict:
+        """{"status", "position", "eta", "progress", "result"} - LookupError لو الطلب انتهت صلاحيته"""
+        code, body = self._request("GET", f"/v1/jobs/{job_id}")
+        if code == 404:
+            raise LookupError(job_id)
+        return body
+
+    # ── الإرسال ────────────────────────────────
+    def submit_file(self, source: Union[str, BinaryIO], filename: Optional[str] = None) -> str:
+        """ملف (مسار أو file-like زي UploadedFile) → job_id من غير انتظار"""
+        if isinstance(source, str):
+            with open(source, "rb") as f:
+                data = f.read()
+            filename = filename or os.path.basename(source)
+        else:
+            data     = source.read()
+            filename = filename or getattr(source, "name", None) or "audio.wav"
+
+        boundary = uuid.uuid4().hex
+        body = b"".join((
+            f"--{boundary}\r\n".encode(),
+            f'Content-Disposition: form-data; name="audio"; filename="{os.path.basename(filename)}"\r\n'.encode(),
+            b"Content-Type: application/octet-stream\r\n\r\n",
+            data,
+            f"\r\n--{boundary}--\r\n".encode(),
+        ))
+        return self._submit("/v1/transcribe", body, f"multipart/form-data; boundary={boundary}")
+
+    def submit_array(self, audio: np.ndarray) -> str:
+        """float32 mono بـ 16kHz → job_id"""
+        body = np.ascontiguousarray(audio, dtype="<f4").tobytes()
+        return self._submit(f"/v1/transcribe?sample_rate={AudioConfig.SAMPLE_RATE}&format=float32",
+                            body, "application/octet-stream")
+
+    def _submit(self, path: str, body: bytes, content_type: str) -> str:
+        code, reply = self._request("POST", path, body, {"Content-Type": content_type})
+        if code == 503:
+            raise ServiceBusy(float(reply.get("retry_after", 1)))
+        if code != 202:
+            raise RuntimeError(f"خدمة التحويل رجعت {code}: {reply}")
+        return reply["job_id"]
+
+    # ── الانتظار ───────────────────────────────
+    def wait(self, job_id: str, on_progress: Optional[Callable[[dict], None]] = None):
+        """يستنى الطلب ويرجع SpeechResult (أو None لو مفيش كلام) - on_progress مع كل poll"""
+        while True:
+            status = self.status(job_id)
+            if status["status"] in ("done", "failed"):
+                return self.result(status)
+            if on_progress:
+                on_progress(status)
+            time.sleep(self.poll)
+
+    @staticmethod
+    def result(status: dict):
+        """حالة طلب خلص → SpeechResult أو None - RuntimeError لو فشل"""
+        if status["status"] == "failed":
+            raise RuntimeError(status.get("error") or "التحويل فشل")
+        if not status.get("result"):
+            return None
+        return SpeechResult.from_dict(status["result"])
+
+    def transcribe_file(self, source: Union[str, BinaryIO],
+                        on_progress: Optional[Callable[[dict], None]] = None):
+        return self.wait(self.submit_file(source), on_progress)
+
+    def transcribe_array(self, audio: np.ndarray,
+                         on_progress: Optional[Callable[[dict], None]] = None):
+        return self.wait(self.submit_array(audio), on_progress)
+
+    def transcribe_timeline(self, source: Union[str, BinaryIO],
+                            ahead: int = 2) -> Iterator:
+        """
+        زي SpeechHandler.transcribe_timeline بس كل جزء (≤ WINDOW) بيروح طلب للخدمة:
+        التقطيع هنا والتحويل هناك - timeline على مستوى الجزء مش الـ segment
+        ahead: أقصى أجزاء مبعوتة ومستنية (الطابور عادل فمش بنقفل على حد)
+        """
+        pending: deque = deque()
+
+        def _collect(item: Tuple[float, float, str]):
+            start, end, job_id = item
+            data = self.wait(job_id)
+            return TimelineSegment(round(start, 2), round(end, 2), data) if data else None
+
+        for offset, chunk in iter_windows(read_blocks(source, AudioConfig.SAMPLE_RATE),
+                                          window=LongAudioConfig.WINDOW):
+            start = offset / AudioConfig.SAMPLE_RATE
+            pending.append((start, start + len(chunk) / AudioConfig.SAMPLE_RATE,
+                            self.submit_array(chunk)))
+            if len(pending) > ahead:
+                seg = _collect(pending.popleft())
+                if seg:
+                    yield seg
+        while pending:
+            seg = _collect(pending.popleft())
+            if seg:
+                yield seg
+
+    # ── HTTP ───────────────────────────────────
+    def _request(self, method: str, path: str, body: Optional[bytes] = None,
+                 headers: Optional[dict] = None) -> Tuple[int, dict]:
+        conn = _UnixConnection(self.socket_path, self.timeout)
+        try:
+            conn.request(method, path, body, {"X-Session-ID": self.session, **(headers or {})})
+            resp = conn.getresponse()
+            raw  = resp.read()
+            if resp.status == 503:
+                return 503, {"retry_after": resp.getheader("Retry-After", "1")}
+            try:
+                return resp.status, json.loads(raw) if raw else {}
+            except ValueError:
+                return resp.status, {"error": raw.decode(errors="ignore")}
+        finally:
+            conn.close()
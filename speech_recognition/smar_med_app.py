@@ -3,22 +3,23 @@ smar_med_app.py (V3.0)
 ======================
 تحديثات:
   - يستخدم handler.transcribe_file() بدل إعادة كتابة منطق Whisper
+  - التسجيل المباشر بيروح لـ handler.listen_streaming() ويعرض النص أثناء الكلام
   - يعرض confidence الحقيقي
   - رسالة واضحة عند رصد الهلوسة
   - استيراد من config.py المركزي
+  - لو خدمة التحويل المحلية شغالة (speech_api.py --unix) العملية دي ما بتحملش Whisper:
+    الميكروفون والرد الصوتي هنا، والتحويل في الخدمة (service_client) بره thread السكريبت
 """
 
 import streamlit as st
 import streamlit.components.v1 as components
-import sounddevice as sd
-import numpy as np
 import tempfile
 import os
-from scipy.io.wavfile import write
 
 from speech_handler import SpeechHandler, SpeechResult
-from config import AudioConfig, AppConfig
-from arabic_processor import IntentType
+from service_client import SpeechServiceClient
+from config import AppConfig
+from arabic_processor import IntentType, Urgency
 
 # ─────────────────────────────────────────────
 # 1. إعداد الصفحة
@@ -110,12 +111,18 @@ def audio_visualizer(state: str = "idle"):
 # 3. عرض النتائج
 # ─────────────────────────────────────────────
 
-def display_result(data: SpeechResult):
+def display_result(data: SpeechResult, speak: bool = True):
     """عرض نتائج SpeechResult في بطاقة موحدة"""
     urgency      = data.urgency_level
-    u_class      = "emergency" if "🚨" in urgency else "high" if "⚠️" in urgency else "normal"
-    symptoms_html = "".join(f'<span class="symptom-tag">{s}</span>' for s in data.detected_symptoms) \
-                    if data.detected_symptoms else '<span style="color:#475569">لا توجد أعراض مكتشفة</span>'
+    u_class      = "emergency" if data.urgency_code == Urgency.CRITICAL \
+                   else "high" if data.urgency_code > Urgency.STABLE else "normal"
+    # العرض اللي اتطابق تقريبيًا (خطأ إملاء) بيظهر بدرجته
+    scores        = data.symptom_scores
+    symptoms_html = "".join(
+        f'<span class="symptom-tag">{s}</span>' if score >= 1.0
+        else f'<span class="symptom-tag">{s} ~{score:.0%}</span>'
+        for s, score in scores.items()) \
+                    if scores else '<span style="color:#475569">لا توجد أعراض مكتشفة</span>'
 
     # شريط confidence
     conf_pct    = int(data.confidence * 100)
@@ -155,8 +162,9 @@ def display_result(data: SpeechResult):
     </div>
     """, unsafe_allow_html=True)
 
-    handler.generate_smart_response(data.detected_intent, data.detected_symptoms)
-    st.toast("🔊 تم إرسال الرد الصوتي")
+    if speak:
+        handler.generate_smart_response(data.detected_intent, data.detected_symptoms)
+        st.toast("🔊 تم إرسال الرد الصوتي")
 
 
 # ─────────────────────────────────────────────
@@ -164,10 +172,28 @@ def display_result(data: SpeechResult):
 # ─────────────────────────────────────────────
 
 @st.cache_resource
-def init_handler():
-    return SpeechHandler()
+def init_handler(use_service: bool):
+    # الميكروفون والسماعة واحدة للجهاز - عميل واحد للعملية، والموديل في الخدمة لو شغالة
+    # المفتاح حالة الخدمة (بتتسأل مع كل rerun): لو قامت بعدين الـ rerun الجاي بياخد handler بيها
+    return SpeechHandler(service=SpeechServiceClient() if use_service else None)
 
-handler = init_handler()
+handler = init_handler(SpeechServiceClient().available())
+
+# الملفات المرفوعة: عميل لكل جلسة (هويتها في الطابور العادل)
+if "speech_service" not in st.session_state:
+    st.session_state["speech_service"] = SpeechServiceClient()
+service = st.session_state["speech_service"] if handler.service is not None else None
+
+
+def transcribe_upload(path: str):
+    if service is None:
+        return handler.transcribe_file(path)
+    progress = st.progress(0.0, text="⏳ في الطابور...")
+    try:
+        return service.transcribe_file(path, on_progress=lambda s: progress.progress(
+            s.get("progress", 0.0), text=f"⏳ {s['status']} — حوالي {s.get('eta', 0):.0f} ث"))
+    finally:
+        progress.empty()
 
 
 # ─────────────────────────────────────────────
@@ -189,38 +215,36 @@ with tab1:
         with vis_ph:
             audio_visualizer("recording")
 
-        audio_data = sd.rec(
-            int(AudioConfig.RECORDING_DURATION * AudioConfig.SAMPLE_RATE),
-            samplerate=AudioConfig.SAMPLE_RATE,
-            channels=AudioConfig.CHANNELS,
-            dtype=AudioConfig.DTYPE,
-        )
-        sd.wait()
-
-        # معالجة
+        live_ph   = st.empty()
+        data      = None
+        emergency = False
+
+        # نتايج جزئية أثناء الكلام - الطوارئ بتتنبه قبل ما المريض يخلص
+        for res in handler.listen_streaming():
+            if not res.is_partial:
+                data = res
+                break
+            live_ph.markdown(
+                f'<div class="result-card" style="color:#94a3b8;font-style:italic;">⏳ {res.original_text}</div>',
+                unsafe_allow_html=True,
+            )
+            if res.detected_intent == IntentType.EMERGENCY and not emergency:
+                emergency = True
+                st.error("🚨 تم رصد حالة طارئة أثناء الكلام — جارٍ استدعاء الطبيب")
+                handler.generate_smart_response(res.detected_intent, res.detected_symptoms)
+
+        live_ph.empty()
         with vis_ph:
             audio_visualizer("processing")
 
-        tmp_path = None
-        try:
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-                tmp_path = tmp.name
-            write(tmp_path, AudioConfig.SAMPLE_RATE,
-                  (audio_data * 32767).astype(np.int16))
-
-            data = handler.transcribe_file(tmp_path)
-
-            if data:
-                display_result(data)
-                with vis_ph:
-                    audio_visualizer("done")
-            else:
-                st.warning("⚠️ لم يتم التعرف على صوت واضح. تأكد من القرب من الميكروفون والتحدث بوضوح.")
-                with vis_ph:
-                    audio_visualizer("idle")
-        finally:
-            if tmp_path and os.path.exists(tmp_path):
-                os.unlink(tmp_path)
+        if data:
+            display_result(data, speak=not emergency)
+            with vis_ph:
+                audio_visualizer("done")
+        else:
+            st.warning("⚠️ لم يتم التعرف على صوت واضح. تأكد من القرب من الميكروفون والتحدث بوضوح.")
+            with vis_ph:
+                audio_visualizer("idle")
 
 # ── تبويب رفع الملف ───────────────────────────
 with tab2:
@@ -234,7 +258,7 @@ with tab2:
                     tmp.write(uploaded.getvalue())
                     tmp_path = tmp.name
 
-                data = handler.transcribe_file(tmp_path)
+                data = transcribe_upload(tmp_path)
 
                 if data:
                     display_result(data)
@@ -7,35 +7,48 @@ speech_handler.py (V3.2 - Mac Fix)
   - Pre-emphasis لتحسين أصوات العربية (ع، ح، خ، ش)
   - فحص مستوى الصوت قبل Whisper
   - كل حمايات anti-hallucination من V3.0 محتفظ بيها
+  - Barge-in: الميكروفون شغال أثناء الرد الصوتي (duplex_audio)
 """
 
-import whisper
-import sounddevice as sd
+import contextvars
+import io
 import numpy as np
 import scipy.io.wavfile as wav
-from scipy.signal import resample_poly
-from math import gcd
-import tempfile
-import os
 import time
 import logging
+import queue
 import threading
-from dataclasses import dataclass
-from typing import Optional, List
-from gtts import gTTS
-
-from config import WhisperConfig, AudioConfig, TTSConfig, LogConfig
-from arabic_processor import ArabicMedicalProcessor, IntentType
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from typing import Optional, List, Iterable, Iterator, Callable, Union, BinaryIO
+
+from config import (WhisperConfig, AudioConfig, LogConfig, KWSConfig, BatchConfig, PoolConfig,
+                    CacheConfig, DuplexConfig, LongAudioConfig)
+from arabic_processor import ArabicMedicalProcessor, IntentType, SYMPTOMS_DB
+from speech_result import SpeechResult, TimelineSegment
+from audio_stream import Endpointer, StreamResampler
+from streaming_decoder import StreamingTranscriber
+from keyword_spotter import KeywordSpotter
+from asr_backends import load_backend
+from batching import BatchScheduler
+from worker_pool import ASRWorkerPool
+from transcript_cache import TranscriptCache
+from tts_engines import SpeechSynthesizer
+from playback import PlaybackWorker, PlaybackHandle, Priority
+from duplex_audio import DuplexAudio, DuplexOutput
+from startup import StartupReport
+from preprocess import AudioPreprocessor, resample, rms
+from long_audio import iter_windows, read_blocks
+import tracing
+from tracing import span
 
 try:
-    import pygame
-    PYGAME_AVAILABLE = True
-except ImportError:
-    try:
-        from playsound import playsound
-        PYGAME_AVAILABLE = False
-    except ImportError:
-        PYGAME_AVAILABLE = False
+    import sounddevice as sd
+    SOUNDDEVICE_AVAILABLE = True
+except (ImportError, OSError):          # OSError: مكتبة PortAudio مش موجودة (سيرفر من غير صوت)
+    SOUNDDEVICE_AVAILABLE = False
 
 logging.basicConfig(
     level=getattr(logging, LogConfig.LEVEL),
@@ -47,41 +60,17 @@ logging.basicConfig(
 )
 logger = logging.getLogger("SMAR_MED_VOICE")
 
+EMERGENCY_RESPONSE = "لا تقلق، أنا أستدعي الطبيب الآن. حاول التنفس ببطء."
 
-# ─────────────────────────────────────────────
-# نتيجة المعالجة
-# ─────────────────────────────────────────────
-@dataclass
-class SpeechResult:
-    original_text:     str
-    normalized_text:   str
-    detected_intent:   IntentType
-    detected_symptoms: List[str]
-    confidence:        float
-    urgency_level:     str
-    processing_time:   float
-
-
-# ─────────────────────────────────────────────
-# مشغل الصوت
-# ─────────────────────────────────────────────
-class AudioPlayer:
-    def __init__(self):
-        if PYGAME_AVAILABLE:
-            pygame.mixer.init()
-
-    def play(self, file_path: str):
-        try:
-            if PYGAME_AVAILABLE:
-                pygame.mixer.music.load(file_path)
-                pygame.mixer.music.play()
-                while pygame.mixer.music.get_busy():
-                    time.sleep(0.05)
-                pygame.mixer.music.unload()
-            else:
-                playsound(file_path)
-        except Exception as e:
-            logger.error(f"خطأ في الصوت: {e}")
+# ردود generate_smart_response - بتتولد صوت مرة واحدة أول ما النظام يقوم
+RESPONSES = {
+    "emergency":  EMERGENCY_RESPONSE,
+    "symptoms":   "سلامتك. سجلت أنك تشعر بـ",     # + الأعراض كأجزاء منفصلة
+    "medication": "فهمت. سأخبر الممرضة المسؤولة.",
+    "vitals":     "سأقوم بقياس مؤشراتك الحيوية الآن.",
+    "general":    "فهمت ما تقوله. كيف يمكنني مساعدتك؟",
+}
+SYMPTOM_JOINER = "و"
 
 
 # ─────────────────────────────────────────────
@@ -91,18 +80,77 @@ class SpeechHandler:
 
     WHISPER_SR = 16000  # Whisper دايماً محتاج 16kHz
 
-    def __init__(self):
+    def __init__(self, headless: bool = False, service=None):
+        """
+        headless: تحويل بس (speech_api) - الـ ASR والكاش والمعالج والـ pool/batcher
+        من غير ميكروفون ولا سماعة ولا duplex ولا TTS ولا KWS (سيرفر ممكن ما يبقاش فيه صوت)
+        service:  SpeechServiceClient - العكس: الميكروفون والرد الصوتي هنا والتحويل في الخدمة
+                  (مفيش Whisper ولا KWS ولا كاش في العملية دي، والنتايج الجزئية مش متاحة)
+        """
         logger.info("تهيئة SMAR-MED V3.2 (Mac Fix)...")
-        self.processor  = ArabicMedicalProcessor()
-        self.player     = AudioPlayer()
-        self.native_sr  = self._get_native_sr()
-        logger.info(f"تحميل Whisper [{WhisperConfig.MODEL_SIZE}]...")
-        self.model = whisper.load_model(WhisperConfig.MODEL_SIZE)
+        self.headless = headless
+        self.service  = service
+        # كلام المريض اللي قاطع الرد: بيتحول على thread لوحده ونتيجته بتروح هنا
+        self.on_interrupt: Optional[Callable[[SpeechResult], None]] = None
+        self._interrupt = threading.Lock()
+        self.startup  = StartupReport("SpeechHandler")
+        stage         = self.startup.stage
+        with stage("processor"):
+            self.processor  = ArabicMedicalProcessor()
+        with stage("audio_device"):
+            self.native_sr  = self.WHISPER_SR if headless else self._get_native_sr()
+            self.preprocessor = AudioPreprocessor(self.native_sr, self.WHISPER_SR)
+        self.asr, self.batcher, self.pool, self.cache = None, None, None, None
+        if service is None:
+            with stage("asr"):
+                self.asr     = load_backend(WhisperConfig.BACKEND, WhisperConfig.MODEL_SIZE)
+            with stage("workers"):
+                self.batcher = BatchScheduler(self.asr) if BatchConfig.ENABLED else None
+                # الـ workers بيحملوا الموديل لنفسهم (spawn) - الأم حولت الأوزان mmap خلاص
+                self.pool    = ASRWorkerPool(partial(load_backend, WhisperConfig.BACKEND,
+                                                     WhisperConfig.MODEL_SIZE)) \
+                               if PoolConfig.WORKERS > 0 else None
+            with stage("cache"):
+                self.cache   = TranscriptCache() if CacheConfig.ENABLED else None
+        self.tts, self.duplex, self.player, self.spotter = None, None, None, None
+        if not headless:
+            with stage("tts"):
+                self.tts    = SpeechSynthesizer()
+                self.tts.prerender([*RESPONSES.values(), SYMPTOM_JOINER, *SYMPTOMS_DB])
+                self.duplex = self._open_duplex() if DuplexConfig.ENABLED else None
+                self.player = PlaybackWorker(self.tts, DuplexOutput(self.duplex, self._decode_tts)
+                                             if self.duplex else None)
+            with stage("kws"):
+                self.spotter = KeywordSpotter(self.processor) \
+                               if KWSConfig.ENABLED and service is None else None
+        self.on_emergency: Optional[Callable[[str], None]] = None
+        self._background  = ThreadPoolExecutor(max_workers=1, thread_name_prefix="whisper")
+        # أول تحويل بيبقى بطيء (kernels، mel filters، الصفحات المعمولها mmap) - نعمله على صمت
+        # في الخلفية، وأي تحويل حقيقي (_transcribe_audio من أي thread) بيستنى الباقي منه بس
+        # - الاتنين على نفس الموديل وما ينفعش يفكوا تشفير في نفس الوقت
+        self.warmup       = self._background.submit(self._warm_up) \
+                            if WhisperConfig.WARMUP and self.asr is not None else None
+        self.startup.done()
+        logger.info(self.startup.format())
         logger.info(f"النظام جاهز | SR الجهاز: {self.native_sr}Hz")
 
+    def _warm_up(self):
+        silence = np.zeros(self.WHISPER_SR, dtype=np.float32)
+        try:
+            with self.startup.stage("warmup"), tracing.muted():
+                self._decode(silence)
+                if self.spotter is not None:
+                    self.spotter.backend.decode_short(silence, KWSConfig.PROMPT, KWSConfig.MAX_TOKENS)
+            logger.info(f"Warm-up خلص في {self.startup.stages['warmup']:.2f}s")
+        except Exception as e:
+            logger.warning(f"Warm-up فشل: {e}")
+
     # ── اكتشاف SR الحقيقي ──────────────────────
     def _get_native_sr(self) -> int:
         """يرجع الـ sample rate الحقيقي للميكروفون - مش نعمل override عليه"""
+        if not SOUNDDEVICE_AVAILABLE:
+            logger.warning("sounddevice مش متاحة (PortAudio) - التسجيل من الميكروفون مش هيشتغل")
+            return 44100
         try:
             idx  = sd.default.device[0]
             info = sd.query_devices(idx)
@@ -113,6 +161,50 @@ class SpeechHandler:
             logger.warning("مش قادر يكتشف SR الجهاز - هيستخدم 44100Hz")
             return 44100
 
+    # ── الصوت المزدوج (barge-in) ───────────────
+    def _open_duplex(self) -> Optional[DuplexAudio]:
+        try:
+            duplex = DuplexAudio(self.native_sr, on_barge_in=self._on_barge_in)
+            duplex.start()
+            return duplex
+        except Exception as e:
+            logger.warning(f"Duplex audio مش متاح ({e}) - التسجيل والتشغيل هيبقوا ورا بعض")
+            return None
+
+    def _on_barge_in(self):
+        """
+        المريض بيتكلم فوق الرد (على thread الـ duplex مش thread الصوت):
+        الجمل اللي مستنية في الطابور ملهاش لازمة، وكلامه بيتسجل ويتحول من أول كلمة
+        (listen بيبدأ بالـ history). لو في تسجيل شغال بالفعل الفريمات رايحاله
+        """
+        self.player.stop_all()
+        if not DuplexConfig.BARGE_IN_LISTEN or self.duplex.listening:
+            return
+        if not self._interrupt.acquire(blocking=False):
+            return                              # مقاطعة قبلها لسه بتتحول
+        threading.Thread(target=self._transcribe_interruption, name="barge-in", daemon=True).start()
+
+    def _transcribe_interruption(self):
+        try:
+            data = self.listen_and_process()
+        except Exception as e:
+            logger.error(f"تحويل المقاطعة فشل: {e}")
+            return
+        finally:
+            self._interrupt.release()
+        if data is not None and self.on_interrupt:
+            self.on_interrupt(data)
+
+    def _decode_tts(self, data: bytes, suffix: str, path: str) -> np.ndarray:
+        """ملف TTS → PCM بـ SR الجهاز (علشان يتشغل في نفس stream الميكروفون)"""
+        if suffix == ".wav":
+            audio = self._load_file(io.BytesIO(data))
+        elif self.asr is not None:
+            audio = self.asr.load_audio(path)
+        else:
+            audio = np.concatenate([np.zeros(0, np.float32), *read_blocks(path, self.WHISPER_SR)])
+        return resample(audio, self.WHISPER_SR, self.native_sr)
+
     # ── Resample صح بعد التسجيل ────────────────
     def _resample_to_whisper(self, audio: np.ndarray, from_sr: int) -> np.ndarray:
         """
@@ -121,39 +213,21 @@ class SpeechHandler:
         """
         if from_sr == self.WHISPER_SR:
             return audio
-
-        g   = gcd(from_sr, self.WHISPER_SR)
-        up  = self.WHISPER_SR // g
-        down = from_sr // g
-        resampled = resample_poly(audio, up, down)
+        with span("resample"):
+            resampled = resample(audio.astype(np.float32, copy=False), from_sr, self.WHISPER_SR)
         logger.info(f"Resample: {from_sr}Hz → {self.WHISPER_SR}Hz "
                     f"({len(audio)} → {len(resampled)} samples)")
-        return resampled.astype(np.float32)
-
-    # ── Pre-emphasis ────────────────────────────
-    def _pre_emphasis(self, audio: np.ndarray, coef: float = 0.97) -> np.ndarray:
-        """
-        يعزز الترددات العالية - بيحسن أصوات (ع، ح، خ، ش، س)
-        معيار صوتيات الكلام العربي
-        """
-        return np.append(audio[0], audio[1:] - coef * audio[:-1])
-
-    # ── Normalize ───────────────────────────────
-    def _normalize(self, audio: np.ndarray) -> np.ndarray:
-        """يمنع الـ clipping ويضمن مستوى صوت ثابت"""
-        max_val = np.max(np.abs(audio))
-        if max_val > 0:
-            return (audio / max_val * 0.95).astype(np.float32)
-        return audio
+        return resampled
 
     # ── فحص مستوى الصوت ─────────────────────────
     def _check_level(self, audio: np.ndarray) -> bool:
-        rms = float(np.sqrt(np.mean(audio ** 2)))
-        logger.info(f"مستوى الصوت RMS: {rms:.5f}")
-        if rms < 0.001:
+        with span("level_check"):
+            level = rms(audio)
+        logger.info(f"مستوى الصوت RMS: {level:.5f}")
+        if level < 0.001:
             logger.warning("الميكروفون صامت تقريباً - تأكد من الإعدادات")
             return False
-        if rms < 0.005:
+        if level < 0.005:
             logger.warning("الصوت ضعيف - قرّب من الميكروفون")
         return True
 
@@ -161,24 +235,48 @@ class SpeechHandler:
     def _process_audio(self, raw: np.ndarray) -> np.ndarray:
         """
         Pipeline:
-        flatten → resample → pre-emphasis → normalize
+        flatten → resample → pre-emphasis (يعزز ع، ح، خ، ش، س) → normalize (يمنع الـ clipping)
+        raw بتاع التسجيل مش بيتستخدم تاني، فلو مفيش resample بيتعدل في مكانه
         """
-        audio = raw.flatten().astype(np.float32)
-        audio = self._resample_to_whisper(audio, self.native_sr)
-        audio = self._pre_emphasis(audio)
-        audio = self._normalize(audio)
-        return audio
+        return self.preprocessor.process(raw, inplace=True)
+
+    # ── تحميل ملف كـ buffer بـ 16kHz ────────────
+    def _load_file(self, file_path: Union[str, BinaryIO]) -> np.ndarray:
+        """
+        يقرا الملف ويرجعه float32 mono بـ 16kHz
+        WAV بيتقري مباشرة من غير ffmpeg (مسار أو file-like في الذاكرة)
+        باقي الصيغ (m4a, mp3) بيفكها محرك الـ ASR
+        """
+        if isinstance(file_path, str) and not file_path.lower().endswith(".wav"):
+            with span("decode"):
+                return self.asr.load_audio(file_path)
+
+        with span("wav_io"):
+            sr, data = wav.read(file_path)
+            if data.dtype == np.uint8:
+                audio = (data.astype(np.float32) - 128.0) / 128.0
+            elif np.issubdtype(data.dtype, np.integer):
+                audio = data.astype(np.float32) / (np.iinfo(data.dtype).max + 1.0)
+            else:
+                audio = data.astype(np.float32)
+            if audio.ndim > 1:
+                audio = audio.mean(axis=1)
+        return self._resample_to_whisper(audio, sr)
 
     # ── Whisper transcription ───────────────────
-    def _transcribe_path(self, file_path: str) -> dict:
-        return self.model.transcribe(
-            file_path,
-            language=WhisperConfig.LANGUAGE,
-            initial_prompt=WhisperConfig.INITIAL_PROMPT,
-            temperature=WhisperConfig.TEMPERATURE,
-            no_speech_threshold=WhisperConfig.NO_SPEECH_THRESHOLD,
-            condition_on_previous_text=WhisperConfig.CONDITION_ON_PREV,
-        )
+    def _transcribe_audio(self, audio: np.ndarray) -> dict:
+        """المحرك بياخد الـ array مباشرة - من غير ملف مؤقت ولا ffmpeg"""
+        if self.warmup is not None:
+            self.warmup.result()            # _warm_up بيمسك الأخطاء - مفيش exception هنا
+        return self._decode(audio)
+
+    def _decode(self, audio: np.ndarray) -> dict:
+        with span("asr"):
+            if self.pool is not None:
+                return self.pool.transcribe(audio)
+            if self.batcher is not None:
+                return self.batcher.transcribe(audio)
+            return self.asr.transcribe(audio)
 
     def _get_confidence(self, result: dict) -> float:
         segs = result.get("segments", [])
@@ -206,30 +304,21 @@ class SpeechHandler:
         return False
 
     # ── TTS ─────────────────────────────────────
-    def speak(self, text: str):
-        def _thread():
-            tmp_path = None
-            try:
-                tts = gTTS(text=text, lang=TTSConfig.LANGUAGE, slow=TTSConfig.SLOW)
-                with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as tmp:
-                    tmp_path = tmp.name
-                tts.save(tmp_path)
-                self.player.play(tmp_path)
-            except Exception as e:
-                logger.error(f"TTS Error: {e}")
-            finally:
-                if tmp_path and os.path.exists(tmp_path):
-                    try:
-                        os.remove(tmp_path)
-                    except Exception:
-                        pass
-        threading.Thread(target=_thread, daemon=True).start()
+    def speak(self, text: str, priority: Priority = Priority.NORMAL) -> PlaybackHandle:
+        return self.speak_parts([text], priority)
 
-    # ── الدالة الرئيسية ─────────────────────────
-    def listen_and_process(self) -> Optional[SpeechResult]:
-        start = time.time()
+    def speak_parts(self, parts: List[str], priority: Priority = Priority.NORMAL) -> PlaybackHandle:
+        """
+        الأجزاء بتتشغل ورا بعض في worker التشغيل - من غير ما توقف اللي نادى
+        Priority.EMERGENCY بتقطع اللي شغال وبتلغي الأقل منها في الطابور
+        """
+        if self.player is None:
+            raise RuntimeError("SpeechHandler(headless=True) مفيهوش تشغيل صوت")
+        return self.player.play(parts, priority)
 
-        # 1. سجّل بـ SR الطبيعي للجهاز (مش 16000 مباشرة!)
+    # ── التسجيل ─────────────────────────────────
+    def _record_fixed(self) -> np.ndarray:
+        """تسجيل بمدة ثابتة (AudioConfig.RECORDING_DURATION)"""
         logger.info(f"تسجيل {AudioConfig.RECORDING_DURATION}s على {self.native_sr}Hz...")
         raw = sd.rec(
             int(AudioConfig.RECORDING_DURATION * self.native_sr),
@@ -238,6 +327,73 @@ class SpeechHandler:
             dtype='float32'
         )
         sd.wait()
+        return raw
+
+    @contextmanager
+    def _capture(self, blocksize: int) -> Iterator[queue.Queue]:
+        """
+        blocks الميكروفون بـ SR الجهاز: من الـ duplex stream لو شغال
+        (بعد كبت صدى الـ TTS)، غير كده InputStream خاص بالتسجيل ده
+        """
+        if self.duplex is not None:
+            with self.duplex.listen() as blocks:
+                yield blocks
+            return
+
+        blocks = queue.Queue()
+
+        def _callback(indata, frames, time_info, status):
+            if status:
+                logger.warning(f"Stream: {status}")
+            blocks.put(indata[:, 0].copy())
+
+        with sd.InputStream(samplerate=self.native_sr,
+                            channels=1,
+                            dtype='float32',
+                            blocksize=blocksize,
+                            callback=_callback):
+            yield blocks
+
+    def _record_until_silence(self) -> Optional[np.ndarray]:
+        """
+        تسجيل متدفق: كل block بيروح للـ Endpointer
+        والتسجيل بيقف أول ما المريض يسكت - مش بعد 7 ثواني ثابتة
+        """
+        endpointer = Endpointer(self.native_sr)
+        audio      = None
+
+        logger.info(f"تسجيل متدفق على {self.native_sr}Hz (VAD)...")
+        with self._capture(endpointer.frame_len) as blocks:
+            while audio is None:
+                try:
+                    block = blocks.get(timeout=1.0)
+                except queue.Empty:
+                    logger.warning("الميكروفون مش بيبعت صوت")
+                    return None
+                audio = endpointer.push(block)
+                if audio is None and not endpointer.in_speech \
+                        and endpointer.elapsed > AudioConfig.START_TIMEOUT:
+                    break
+
+        if audio is None:
+            logger.warning("مفيش كلام اتسجل")
+            return None
+        logger.info(f"نهاية الكلام بعد {len(audio) / self.native_sr:.2f}s")
+        return audio
+
+    # ── الدالة الرئيسية ─────────────────────────
+    def listen_and_process(self) -> Optional[SpeechResult]:
+        with tracing.trace():
+            return self._listen_and_process()
+
+    def _listen_and_process(self) -> Optional[SpeechResult]:
+        start = time.time()
+
+        # 1. سجّل بـ SR الطبيعي للجهاز (مش 16000 مباشرة!)
+        with span("capture"):
+            raw = self._record_until_silence() if AudioConfig.CAPTURE_MODE == "vad" else self._record_fixed()
+        if raw is None:
+            return None
 
         # 2. فحص الصوت
         if not self._check_level(raw):
@@ -246,79 +402,292 @@ class SpeechHandler:
         # 3. معالجة (resample + pre-emphasis + normalize)
         audio = self._process_audio(raw)
 
-        # 4. حفظ مؤقت بـ 16kHz وتحويل
-        tmp_path = None
-        try:
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-                tmp_path = tmp.name
-            wav.write(tmp_path, self.WHISPER_SR, (audio * 32767).astype(np.int16))
-            result = self._transcribe_path(tmp_path)
-        finally:
-            if tmp_path and os.path.exists(tmp_path):
-                os.remove(tmp_path)
-
-        # 5. فلتر الهلوسة
-        if self._is_hallucination(result):
-            return None
+        # 4. التحويل الكامل في الخلفية + كشف الطوارئ السريع بالتوازي
+        # (copy_context: spans الـ thread التاني بتتسجل في نفس الـ trace)
+        pending = self._background.submit(contextvars.copy_context().run, self._analyze, audio, start)
+        alerted = self.spot_emergency(audio)
 
-        original = result['text'].strip()
-        if not original:
+        data = pending.result()
+        if data is None:
             return None
+        # بعد ما الـ KWS كمان خلص - ومع الخدمة: مراحل الجهاز + مراحل الخدمة
+        data.stages = (*tracing.breakdown(), *data.stages) if self.service is not None \
+                      else tracing.breakdown()
 
-        # 6. معالجة ذكية
-        norm, intent, symptoms, urgency = self.processor.process(original)
-        confidence = self._get_confidence(result)
-        logger.info(f"النتيجة: '{original}' | ثقة: {confidence:.0%}")
+        if not (alerted and data.detected_intent == IntentType.EMERGENCY):
+            self.generate_smart_response(data.detected_intent, data.detected_symptoms)
+        return data
 
-        self.generate_smart_response(intent, symptoms)
+    def spot_emergency(self, audio: np.ndarray) -> bool:
+        """
+        كشف كلمات الطوارئ على buffer الـ 16kHz قبل ما Whisper الكامل يخلص
+        لو فيه hit: الرد الصوتي + on_emergency فوراً
+        """
+        if self.spotter is None:
+            return False
+        with span("kws"):
+            word = self.spotter.spot(audio)
+        if word is None:
+            return False
+        self.speak(EMERGENCY_RESPONSE, Priority.EMERGENCY)
+        if self.on_emergency:
+            self.on_emergency(word)
+        return True
 
-        return SpeechResult(
-            original_text=original,
-            normalized_text=norm,
-            detected_intent=intent,
-            detected_symptoms=symptoms,
-            confidence=confidence,
-            urgency_level=urgency,
-            processing_time=round(time.time() - start, 2)
-        )
+    def transcribe_array(self, audio: np.ndarray, cache: bool = False) -> Optional[SpeechResult]:
+        """
+        تحليل buffer صوتي float32 mono بـ 16kHz مباشرة
+        cache=True بس لـ buffer ممكن يتبعت تاني بالظبط - جمل الميكروفون عمرها ما بتتكرر
+        وكانت بتملا الكاش وتطرد الملفات اللي بتتعاد فعلاً
+        """
+        if self.service is not None:
+            return self.service.transcribe_array(audio)
+        start = time.time()
+        with tracing.trace():
+            result = self._transcribe_cached(audio) if cache else self._transcribe_audio(audio)
+            return self._build_result(result, start)
 
-    def transcribe_file(self, file_path: str) -> Optional[SpeechResult]:
+    def transcribe_file(self, file_path: Union[str, BinaryIO]) -> Optional[SpeechResult]:
         """تحليل ملف مباشرة - للاستخدام في Streamlit"""
-        start  = time.time()
-        result = self._transcribe_path(file_path)
+        if self.service is not None:
+            return self.service.transcribe_file(file_path)
+        with tracing.trace():
+            return self._transcribe_file(file_path)
 
-        if self._is_hallucination(result):
+    def _transcribe_file(self, file_path: Union[str, BinaryIO]) -> Optional[SpeechResult]:
+        start = time.time()
+        if self.cache is None:
+            return self._analyze(self._load_file(file_path), start)
+
+        # نفس الملف بالظبط → النتيجة من غير ما نفك الصوت أصلاً
+        with span("cache"):
+            file_key = self.cache.file_key(file_path)
+            result   = self.cache.get(file_key)
+        if result is None:
+            result = self._transcribe_cached(self._load_file(file_path))
+            with span("cache"):
+                self.cache.put(file_key, result)
+        return self._build_result(result, start)
+
+    def transcribe_timeline(self, file_path: Union[str, BinaryIO],
+                            workers: int = LongAudioConfig.WORKERS) -> Iterator[TimelineSegment]:
+        """
+        تسجيل طويل → جملة جملة بالتوقيت، كل جملة ليها نيتها وأعراضها وخطورتها
+        الملف بيتقري على أجزاء (long_audio) - الذاكرة ثابتة مهما كان طوله
+        workers > 0: الأجزاء بتتحول على thread pool (workers + 1 جزء في الذاكرة بالكتير)
+        والنتايج بتطلع بالترتيب أول بأول. مع openai الـ decode نفسه واحد في المرة (lock المحرك) -
+        التوازي الحقيقي مع faster-whisper أو ASRWorkerPool
+        """
+        if self.service is not None:
+            yield from self.service.transcribe_timeline(file_path)
+            return
+        windows = iter_windows(read_blocks(file_path, self.WHISPER_SR))
+        if workers <= 0:
+            for offset, chunk in windows:
+                yield from self._timeline_segments(offset, chunk)
+            return
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="long-audio") as pool:
+            pending = deque()
+            for offset, chunk in windows:
+                pending.append(pool.submit(self._timeline_segments, offset, chunk))
+                if len(pending) > workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+    def _timeline_segments(self, offset: int, chunk: np.ndarray) -> List[TimelineSegment]:
+        """جزء واحد → segments بتاعة Whisper، كل segment بيتحلل ويتفلتر لوحده"""
+        start = time.time()
+        base  = offset / self.WHISPER_SR
+        out   = []
+        with tracing.trace():
+            result = self._transcribe_cached(chunk)
+            for seg in result.get("segments", []):
+                data = self._build_result({"text": seg.get("text", ""), "segments": [seg]}, start)
+                if data is not None:
+                    out.append(TimelineSegment(round(base + seg["start"], 2),
+                                               round(base + seg["end"], 2), data))
+        return out
+
+    def _transcribe_cached(self, audio: np.ndarray) -> dict:
+        """_transcribe_audio مع الكاش (نفس الصوت بعد الفك = نفس المفتاح حتى لو الملف مختلف)"""
+        if self.cache is None:
+            return self._transcribe_audio(audio)
+        with span("cache"):
+            key    = self.cache.audio_key(audio)
+            result = self.cache.get(key)
+        if result is None:
+            result = self._transcribe_audio(audio)
+            with span("cache"):
+                self.cache.put(key, result)
+        return result
+
+    def _analyze(self, audio: np.ndarray, start: float) -> Optional[SpeechResult]:
+        """Whisper → فلتر الهلوسة → المعالجة الذكية (أو الخدمة لو التحويل هناك)"""
+        if self.service is not None:
+            return self.service.transcribe_array(audio)
+        return self._build_result(self._transcribe_audio(audio), start)
+
+    def _build_result(self, result: dict, start: float,
+                      is_partial: bool = False) -> Optional[SpeechResult]:
+        with span("hallucination_filter"):
+            rejected = self._is_hallucination(result)
+        if rejected:
             return None
 
         original = result['text'].strip()
         if not original:
             return None
 
-        norm, intent, symptoms, urgency = self.processor.process(original)
+        with span("nlp"):
+            norm, intent, symptoms, urgency, scores = self.processor.process_scored(original)
         confidence = self._get_confidence(result)
+        if not is_partial:
+            logger.info(f"النتيجة: '{original}' | ثقة: {confidence:.0%}")
 
-        return SpeechResult(
+        return SpeechResult.from_analysis(
             original_text=original,
             normalized_text=norm,
-            detected_intent=intent,
-            detected_symptoms=symptoms,
+            intent=intent,
+            symptoms=symptoms,
             confidence=confidence,
-            urgency_level=urgency,
-            processing_time=round(time.time() - start, 2)
+            urgency=urgency,
+            processing_time=round(time.time() - start, 2),
+            is_partial=is_partial,
+            symptom_scores=scores,
+            stages=tracing.breakdown(),
         )
 
-    def generate_smart_response(self, intent: IntentType, symptoms: List[str]):
+    # ── تحويل جزئي أثناء الكلام ─────────────────
+    def open_stream(self) -> "StreamSession":
+        """جلسة تحويل جزئي لجملة واحدة - الصوت بيدخل chunks بـ 16kHz"""
+        return StreamSession(self)
+
+    def stream_transcribe(self, chunks: Iterable[np.ndarray]) -> Iterator[SpeechResult]:
+        """
+        chunks: float32 بـ 16kHz بالترتيب
+        بيطلع SpeechResult جزئي (is_partial=True) كل StreamingConfig.STEP
+        وفي الآخر النتيجة النهائية
+        مع الخدمة: النتيجة النهائية بس (الجملة كلها طلب واحد)
+        """
+        if self.service is not None:
+            audio = np.concatenate([np.zeros(0, np.float32), *chunks])
+            final = self.service.transcribe_array(audio) if len(audio) else None
+            if final is not None:
+                yield final
+            return
+
+        session = self.open_stream()
+        for chunk in chunks:
+            partial = session.feed(chunk)
+            if partial is not None:
+                yield partial
+
+        final = session.finish()
+        if final is not None:
+            yield final
+
+    def _stream_microphone(self) -> Iterator[np.ndarray]:
+        """
+        chunks بـ 16kHz من الميكروفون من أول الكلام (مع الـ pre-roll)
+        لحد ما الـ Endpointer يقول إن المريض سكت
+        """
+        endpointer = Endpointer(self.native_sr)
+        resampler  = StreamResampler(self.native_sr, self.WHISPER_SR)
+        prev       = 0.0
+
+        def _emphasize(chunk: np.ndarray) -> np.ndarray:
+            """الـ chunk طالع جديد من الـ resampler - بيتعدل في مكانه"""
+            nonlocal prev
+            prev = self.preprocessor.pre_emphasis(chunk, prev)
+            return chunk
+
+        logger.info(f"تسجيل متدفق على {self.native_sr}Hz (تحويل جزئي)...")
+        with self._capture(endpointer.frame_len) as blocks:
+            while True:
+                try:
+                    block = blocks.get(timeout=1.0)
+                except queue.Empty:
+                    logger.warning("الميكروفون مش بيبعت صوت")
+                    return
+                speech, ended = endpointer.stream(block)
+                if len(speech):
+                    yield _emphasize(resampler.process(speech))
+                if ended:
+                    yield _emphasize(resampler.flush())
+                    return
+                if not endpointer.in_speech and endpointer.elapsed > AudioConfig.START_TIMEOUT:
+                    logger.warning("مفيش كلام اتسجل")
+                    return
+
+    def listen_streaming(self, on_emergency: Optional[Callable[[SpeechResult], None]] = None
+                         ) -> Iterator[SpeechResult]:
+        """
+        زي listen_and_process بس بيطلع نتايج جزئية أثناء الكلام
+        on_emergency: بتتنادى مرة واحدة أول ما نتيجة (حتى لو جزئية) تبقى طوارئ
+        """
+        fired = False
+        for data in self.stream_transcribe(self._stream_microphone()):
+            if not fired and data.detected_intent == IntentType.EMERGENCY:
+                fired = True
+                logger.warning(f"طوارئ {'(جزئي) ' if data.is_partial else ''}: '{data.original_text}'")
+                if on_emergency:
+                    on_emergency(data)
+            yield data
+
+    def generate_smart_response(self, intent: IntentType, symptoms: List[str]) -> PlaybackHandle:
+        priority = Priority.NORMAL
         if intent == IntentType.EMERGENCY:
-            r = "لا تقلق، أنا أستدعي الطبيب الآن. حاول التنفس ببطء."
+            priority = Priority.EMERGENCY
+            parts = [RESPONSES["emergency"]]
         elif symptoms:
-            r = f"سلامتك. سجلت أنك تشعر بـ {' و '.join(symptoms)}."
+            # "سلامتك. سجلت أنك تشعر بـ" + صداع + و + حمى - كل جزء متولد مسبقًا
+            parts = [RESPONSES["symptoms"]]
+            for i, s in enumerate(symptoms):
+                parts += [SYMPTOM_JOINER, s] if i else [s]
         elif intent == IntentType.NEED_MEDICATION:
-            r = "فهمت. سأخبر الممرضة المسؤولة."
+            parts = [RESPONSES["medication"]]
         elif intent == IntentType.MEASURE_VITALS:
-            r = "سأقوم بقياس مؤشراتك الحيوية الآن."
+            parts = [RESPONSES["vitals"]]
         else:
-            r = "فهمت ما تقوله. كيف يمكنني مساعدتك؟"
-        self.speak(r)
+            parts = [RESPONSES["general"]]
+        return self.speak_parts(parts, priority)
+
+
+# ─────────────────────────────────────────────
+# جلسة تحويل جزئي
+# ─────────────────────────────────────────────
+class StreamSession:
+    """
+    جملة واحدة: feed() بيرجع SpeechResult جزئي كل StreamingConfig.STEP (أو None)
+    و finish() بيرجع النتيجة النهائية
+    الجملة كلها trace واحد (feed ممكن ييجي من threads مختلفة في الـ WS)
+    وبيتسجل في الـ histograms مرة واحدة في finish - مش مع كل جزئي
+    """
+
+    def __init__(self, handler: SpeechHandler):
+        self.handler = handler
+        self.decoder = StreamingTranscriber(handler._transcribe_audio)
+        self.start   = time.time()
+        self.trace   = tracing.Trace()
+
+    def feed(self, chunk: np.ndarray) -> Optional[SpeechResult]:
+        with tracing.activate(self.trace):
+            hypothesis = self.decoder.feed(chunk)
+            if hypothesis is None:
+                return None
+            return self.handler._build_result(hypothesis, self.start, is_partial=True)
+
+    def finish(self) -> Optional[SpeechResult]:
+        try:
+            with tracing.activate(self.trace):
+                hypothesis = self.decoder.finish()
+                if hypothesis is None:
+                    return None
+                return self.handler._build_result(hypothesis, self.start)
+        finally:
+            tracing.commit(self.trace)
 
 
 # ─────────────────────────────────────────────
@@ -0,0 +1,134 @@
+"""
+speech_result.py - نتيجة التحليل (SpeechResult) وجمل التسجيل الطويل (TimelineSegment)
+=====================================================================================
+من غير أي import للصوت (sounddevice / Whisper / torch): الـ API والواجهات وعميل الخدمة
+والاختبارات بيستخدموها من غير ما يحملوا المحرك. speech_handler بيعمل لها re-export
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from arabic_processor import (IntentType, IntentCode, Urgency, INTENT_CODES, SYMPTOMS_DB,
+                              symptom_bit, symptoms_to_mask, mask_to_symptoms)
+
+
+# ─────────────────────────────────────────────
+# نتيجة المعالجة
+# ─────────────────────────────────────────────
+@dataclass(slots=True)
+class SpeechResult:
+    """
+    نتيجة مضغوطة (__slots__): النية والخطورة أكواد IntEnum والأعراض bitmask على SYMPTOMS_DB
+    النصوص المعروضة (detected_intent / detected_symptoms / urgency_level) بتتحسب منها من غير فقد
+    """
+    original_text:   str
+    normalized_text: str
+    intent_code:     IntentCode
+    symptom_mask:    int
+    confidence:      float
+    urgency_code:    Urgency
+    processing_time: float
+    is_partial:      bool = False    # نتيجة مؤقتة أثناء الكلام (Streaming)
+    fuzzy_scores:    Tuple[Tuple[int, float], ...] = ()   # (بت العرض، الدرجة) للتطابق التقريبي بس
+    stages:          Tuple[Tuple[str, float], ...] = ()   # (المرحلة، ms) من tracing - فين راح الوقت
+
+    @classmethod
+    def from_analysis(cls, original_text: str, normalized_text: str, intent: IntentType,
+                      symptoms: List[str], confidence: float, urgency: str, processing_time: float,
+                      is_partial: bool = False,
+                      symptom_scores: Optional[Dict[str, float]] = None,
+                      stages: Tuple[Tuple[str, float], ...] = ()) -> "SpeechResult":
+        """من ناتج ArabicMedicalProcessor.process_scored"""
+        return cls(
+            original_text=original_text,
+            normalized_text=normalized_text,
+            intent_code=INTENT_CODES[intent],
+            symptom_mask=symptoms_to_mask(symptoms),
+            confidence=confidence,
+            urgency_code=Urgency.from_label(urgency),
+            processing_time=processing_time,
+            is_partial=is_partial,
+            fuzzy_scores=tuple((symptom_bit(s), score)
+                               for s, score in (symptom_scores or {}).items() if score < 1.0),
+            stages=stages,
+        )
+
+    # ── العرض ──────────────────────────────────
+    @property
+    def detected_intent(self) -> IntentType:
+        return self.intent_code.intent
+
+    @property
+    def detected_symptoms(self) -> List[str]:
+        return mask_to_symptoms(self.symptom_mask)
+
+    @property
+    def urgency_level(self) -> str:
+        return self.urgency_code.label
+
+    @property
+    def symptom_scores(self) -> Dict[str, float]:
+        """درجة كل عرض (1.0 = حرفي)"""
+        fuzzy = dict(self.fuzzy_scores)
+        return {s: fuzzy.get(j, 1.0) for j, s in enumerate(SYMPTOMS_DB) if self.symptom_mask >> j & 1}
+
+    # ── التسلسل ────────────────────────────────
+    def to_dict(self) -> dict:
+        """JSON-friendly - للـ API"""
+        return {
+            "original_text":     self.original_text,
+            "normalized_text":   self.normalized_text,
+            "intent":            self.detected_intent.name,
+            "intent_label":      self.detected_intent.value,
+            "intent_code":       int(self.intent_code),
+            "symptoms":          self.detected_symptoms,
+            "symptom_mask":      self.symptom_mask,
+            "symptom_scores":    self.symptom_scores,
+            "confidence":        self.confidence,
+            "urgency_level":     self.urgency_level,
+            "urgency_code":      int(self.urgency_code),
+            "processing_time":   self.processing_time,
+            "is_partial":        self.is_partial,
+            "stages_ms":         dict(self.stages),
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "SpeechResult":
+        """عكس to_dict - نتيجة راجعة من الخدمة (service_client)"""
+        return cls(
+            original_text=d["original_text"],
+            normalized_text=d["normalized_text"],
+            intent_code=IntentCode(d["intent_code"]),
+            symptom_mask=d["symptom_mask"],
+            confidence=d["confidence"],
+            urgency_code=Urgency(d["urgency_code"]),
+            processing_time=d["processing_time"],
+            is_partial=d.get("is_partial", False),
+            fuzzy_scores=tuple((symptom_bit(s), score)
+                               for s, score in d.get("symptom_scores", {}).items() if score < 1.0),
+            stages=tuple(d.get("stages_ms", {}).items()),
+        )
+
+    def to_tuple(self) -> tuple:
+        """أرخص شكل للتخزين/الـ logs/الطوابير - أرقام ونصوص بس"""
+        return (self.original_text, self.normalized_text, int(self.intent_code), self.symptom_mask,
+                self.confidence, int(self.urgency_code), self.processing_time, self.is_partial,
+                self.fuzzy_scores, self.stages)
+
+    @classmethod
+    def from_tuple(cls, t: tuple) -> "SpeechResult":
+        (original, normalized, intent, mask, confidence, urgency, elapsed, partial, fuzzy, *rest) = t
+        stages = rest[0] if rest else ()        # tuples قديمة من غير stages
+        return cls(original, normalized, IntentCode(intent), mask, confidence, Urgency(urgency),
+                   elapsed, partial, tuple(map(tuple, fuzzy)), tuple(map(tuple, stages)))
+
+
+@dataclass(slots=True)
+class TimelineSegment:
+    """جملة من تسجيل طويل: مكانها في الملف (ثواني) + تحليلها لوحدها"""
+    start:  float
+    end:    float
+    result: SpeechResult
+
+    def to_dict(self) -> dict:
+        return {"start": self.start, "end": self.end, **self.result.to_dict()}
@@ -0,0 +1,44 @@
+"""
+startup.py - زمن التشغيل مرحلة بمرحلة
+======================================
+    report = StartupReport("SpeechHandler")
+    with report.stage("asr"):
+        ...
+    logger.info(report.format())
+المراحل اللي بتخلص في الخلفية (زي warm-up) بتتسجل بـ record() لما تخلص
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+
+class StartupReport:
+
+    def __init__(self, name: str):
+        self.name   = name
+        self.stages: Dict[str, float] = {}       # المرحلة → ثواني (بترتيب التنفيذ)
+        self._t0    = time.perf_counter()
+        self.ready: float = 0.0                  # من البداية لحد ما الـ constructor رجع
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - t0)
+
+    def record(self, name: str, seconds: float):
+        self.stages[name] = seconds
+
+    def done(self):
+        self.ready = time.perf_counter() - self._t0
+
+    def as_dict(self) -> dict:
+        return {"stages_ms": {k: round(v * 1000, 1) for k, v in self.stages.items()},
+                "ready_ms":  round(self.ready * 1000, 1)}
+
+    def format(self) -> str:
+        stages = " | ".join(f"{k} {v * 1000:.0f}ms" for k, v in self.stages.items())
+        return f"تشغيل {self.name}: {stages} | جاهز بعد {self.ready:.2f}s"
@@ -0,0 +1,122 @@
+"""
+streaming_decoder.py - تحويل جزئي أثناء كلام المريض
+=====================================================
+  - كل STEP ثانية بيعيد تحويل النافذة المتنامية بالكامل
+  - الجزء اللي اتفق عليه تحويلين ورا بعض بيتثبت (LocalAgreement)
+  - لما النافذة تعدي WINDOW بنقص الصوت عند نهاية آخر segment متثبت
+    فالتكلفة لكل خطوة ثابتة مهما طال الكلام
+"""
+
+import numpy as np
+from typing import Callable, List, Optional
+
+from config import AudioConfig, StreamingConfig
+
+
+def _common_prefix(a: List[str], b: List[str]) -> int:
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+class StreamingTranscriber:
+    """
+    transcribe: دالة بتاخد float32 بـ 16kHz وترجع dict بنفس شكل Whisper
+    (text + segments فيها start/end)
+    """
+
+    def __init__(self, transcribe: Callable[[np.ndarray], dict],
+                 sample_rate: int = AudioConfig.SAMPLE_RATE,
+                 step: float = StreamingConfig.STEP,
+                 window: float = StreamingConfig.WINDOW):
+        self.transcribe   = transcribe
+        self.sample_rate  = sample_rate
+        self.step_samples = int(step * sample_rate)
+        self.max_samples  = int(window * sample_rate)
+        self.reset()
+
+    def reset(self):
+        self._audio     = np.zeros(0, dtype=np.float32)
+        self._since     = 0
+        self._frozen    = []    # كلمات صوتها اتشال من النافذة
+        self._committed = []    # كلمات متثبتة لسه صوتها في النافذة
+        self._prev      = []    # التحويل اللي فات (للمقارنة)
+        self._last      = None
+
+    @property
+    def stable_text(self) -> str:
+        return " ".join(self._frozen + self._committed)
+
+    def feed(self, chunk: np.ndarray) -> Optional[dict]:
+        """يرجع تحويل جزئي كل STEP ثانية - غير كده None"""
+        chunk = np.asarray(chunk, dtype=np.float32).reshape(-1)
+        self._audio  = np.concatenate((self._audio, chunk))
+        self._since += len(chunk)
+        if self._since < self.step_samples:
+            return None
+        self._since = 0
+        return self._decode(final=False)
+
+    def finish(self) -> Optional[dict]:
+        """التحويل النهائي بعد نهاية الكلام - كل الكلمات بتتثبت"""
+        if self._since or self._last is None:
+            if len(self._audio):
+                return self._decode(final=True)
+            return None
+        self._committed = self._prev
+        return self._hypothesis(self._last, [])
+
+    # ── داخلي ──────────────────────────────────
+    def _decode(self, final: bool) -> dict:
+        result = self.transcribe(self._audio)
+        words  = result.get("text", "").split()
+
+        if final:
+            self._committed = words
+        else:
+            agreed = _common_prefix(self._prev, words)
+            if agreed > len(self._committed):
+                self._committed = words[:agreed]
+        self._prev = words
+        self._last = result
+
+        hypothesis = self._hypothesis(result, words[len(self._committed):])
+
+        if not final and len(self._audio) > self.max_samples:
+            self._trim(result)
+        return hypothesis
+
+    def _hypothesis(self, result: dict, unstable: List[str]) -> dict:
+        stable = self.stable_text
+        text   = " ".join(w for w in (stable, " ".join(unstable)) if w)
+        return {
+            "text":        text,
+            "stable_text": stable,
+            "segments":    result.get("segments", []),
+            "language":    result.get("language"),
+        }
+
+    def _trim(self, result: dict):
+        """يشيل صوت الـ segments اللي كل كلماتها متثبتة"""
+        cut_time, cut_words, count = 0.0, 0, 0
+        for seg in result.get("segments", []):
+            count += len(seg.get("text", "").split())
+            if count > len(self._committed):
+                break
+            cut_time, cut_words = float(seg.get("end", 0.0)), count
+
+        if cut_words == 0:
+            if len(self._audio) <= 2 * self.max_samples:
+                return
+            # مفيش segment متثبت والنافذة طولت: نثبت آخر تحويل كله ونبدأ نافذة جديدة
+            self._committed = self._prev
+            cut_time, cut_words = len(self._audio) / self.sample_rate, len(self._committed)
+
+        cut = min(len(self._audio), int(cut_time * self.sample_rate))
+        self._audio     = self._audio[cut:]
+        self._frozen   += self._committed[:cut_words]
+        self._committed = self._committed[cut_words:]
+        self._prev      = self._prev[cut_words:]
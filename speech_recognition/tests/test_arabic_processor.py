@@ -0,0 +1,223 @@
+import unittest
+import sys
+import os
+import random
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from text_matcher import AhoCorasick, FuzzyIndex, PhraseNormalizer, bounded_edit_distance
+from arabic_processor import (ArabicMedicalProcessor, INTENT_KEYWORDS, SYMPTOMS_DB, URGENCY_LEVELS,
+                              IntentType, IntentCode, Urgency, symptoms_to_mask, mask_to_symptoms)
+
+
+class TestAhoCorasick(unittest.TestCase):
+    """اختبار الـ automaton"""
+
+    def test_overlapping_matches(self):
+        ac = AhoCorasick(["he", "she", "his", "hers"])
+        found = sorted((start, ac.patterns[pid]) for start, pid in ac.iter_matches("ushers"))
+        self.assertEqual(found, [(1, "she"), (2, "he"), (2, "hers")])
+
+    def test_no_patterns(self):
+        ac = AhoCorasick([])
+        self.assertEqual(ac.hits("نص"), set())
+
+
+class TestPhraseNormalizer(unittest.TestCase):
+    """اختبار الاستبدال على مستوى الكلمات"""
+
+    def setUp(self):
+        self.norm = ArabicMedicalProcessor().normalize
+
+    def test_orthographic_variants(self):
+        self.assertEqual(self.norm("مش قادر اتنفس"), "ضيق تنفس")
+        self.assertEqual(self.norm("تَعْبَـان"), "مريض")
+        self.assertEqual(self.norm("الحقوني"), "إلحقوني")
+
+    def test_whole_words_only(self):
+        self.assertEqual(self.norm("أخدت العلاج"), "أخدت العلاج")
+        self.assertEqual(self.norm("خد العلاج"), "أخذ العلاج")
+
+    def test_no_double_apply(self):
+        self.assertEqual(self.norm("ضغط الدم عالي"), "ضغط الدم عالي")
+        self.assertEqual(self.norm("عندي ضغط"), "لدي ضغط الدم")
+
+    def test_clitics_and_punctuation(self):
+        self.assertEqual(self.norm("وبموت"), "وحالة حرجة")
+        self.assertEqual(self.norm("وجع، تقيل"), "ألم، تقيل")
+
+    def test_first_definition_wins(self):
+        norm = PhraseNormalizer({"سكر": "مرض السكري", "سُكر": "سكر"})
+        self.assertEqual(norm.normalize("سكر"), "مرض السكري")
+        self.assertEqual(len(norm), 1)
+
+
+class TestFuzzyMatching(unittest.TestCase):
+    """اختبار التطابق التقريبي"""
+
+    def test_bounded_edit_distance(self):
+        self.assertEqual(bounded_edit_distance("غثيان", "غسيان", 1), 1)
+        self.assertEqual(bounded_edit_distance("abc", "abc", 0), 0)
+        self.assertIsNone(bounded_edit_distance("صداع", "صدري", 1))
+        self.assertIsNone(bounded_edit_distance("ab", "abcd", 1))
+
+    def test_lookup_matches_brute_force(self):
+        """فلتر الـ trigrams ما يضيعش أي عبارة قريبة فعلاً"""
+        index = FuzzyIndex(SYMPTOMS_DB)
+        rng   = random.Random(1)
+        for _ in range(200):
+            word = list(rng.choice(SYMPTOMS_DB))
+            pos  = rng.randrange(len(word))
+            word[pos] = rng.choice("ابتثجحخدسشعغ")
+            query = "".join(word)
+            found = {index.terms[tid] for tid, _ in index.lookup(query)}
+            for tid, term in enumerate(index.terms):
+                k = index._budget[tid] if len(query) >= index.min_length else 0
+                d = bounded_edit_distance(index._keys[tid], query, k)
+                if d is not None and 1 - d / max(len(query), len(index._keys[tid])) >= index.min_score:
+                    self.assertIn(term, found, query)
+
+    def test_misspelled_symptoms(self):
+        processor = ArabicMedicalProcessor()
+        _, intent, symptoms, urgency, scores = processor.process_scored("عندى ضيك تنفس ومرض السكرى")
+        self.assertEqual(intent, IntentType.EMERGENCY)        # ضيق تنفس = خطيرة جداً = طوارئ
+        self.assertEqual(symptoms, ["ضيق تنفس", "مرض السكري"])
+        self.assertLess(scores["ضيق تنفس"], 1.0)
+        self.assertEqual(urgency, "🚨 خطيرة جداً")
+
+    def test_everyday_words_not_emergency(self):
+        """"أسماء" على بعد حرف من "إغماء" - كلمة عادية ما تندهش دكتور"""
+        processor = ArabicMedicalProcessor()
+        for text in ("ما هي أسماء الأدوية", "الأسماء", "إيه الأسماء", "أسماء"):
+            _, intent, symptoms, urgency = processor.process(text)
+            self.assertNotEqual(intent, IntentType.EMERGENCY, text)
+            self.assertNotEqual(urgency, "🚨 خطيرة جداً", text)
+
+    def test_single_word_misspellings(self):
+        """كلمة من 4 حروف أو أكتر بتستحمل تعديل واحد - الأقصر والكلمات المستثناة حرفي بس"""
+        processor = ArabicMedicalProcessor()
+        self.assertEqual(processor.process_scored("عندي صداغ")[2:], (["صداع"], "⚠️ تحتاج متابعة",
+                                                                    {"صداع": 0.75}))
+        self.assertEqual(processor.process("عندى سخونيه")[2], ["حمى"])
+        self.assertEqual(processor.process("محتاج دوا")[2], [])                # 3 حروف مش "دوار"
+        self.assertEqual(processor.process("في صراع")[2], [])
+        self.assertEqual(FuzzyIndex(["إغماء"]).search("الأسماء وأسماء"), {})
+        self.assertEqual(FuzzyIndex(["إغماء"], exclude=()).search("أسماء"), {0: 0.8})
+
+    def test_critical_is_emergency(self):
+        processor = ArabicMedicalProcessor()
+        _, intent, symptoms, urgency = processor.process("عندي ضيق تنفث")
+        self.assertEqual((intent, symptoms, urgency),
+                         (IntentType.EMERGENCY, ["ضيق تنفس"], "🚨 خطيرة جداً"))
+        self.assertEqual(processor.detect_intent("ضيق تنفث"), IntentType.EMERGENCY)
+        batch = processor.process_batch(["عندي ضيق تنفث"])
+        self.assertEqual(batch.intents[0], IntentCode.EMERGENCY)
+
+    def test_exact_score_and_short_words(self):
+        processor = ArabicMedicalProcessor()
+        self.assertEqual(processor.process_scored("عندي صداع")[4], {"صداع": 1.0})
+        self.assertEqual(processor.process_scored("اسمي مريم")[1], IntentType.GENERAL_CHAT)
+        self.assertEqual(processor.process_scored("غسيان")[2], ["غثيان"])
+        self.assertEqual(ArabicMedicalProcessor(fuzzy=False).process_scored("ضيك تنفس")[2], [])
+
+
+class TestProcessorMatching(unittest.TestCase):
+    """النية والأعراض لازم تطابق البحث القديم بـ in لكل كلمة"""
+
+    def setUp(self):
+        self.processor = ArabicMedicalProcessor(fuzzy=False)
+
+    def _legacy(self, text):
+        intent = next((i for i, words in INTENT_KEYWORDS.items() if any(w in text for w in words)),
+                      IntentType.GENERAL_CHAT)
+        return intent, [s for s in SYMPTOMS_DB if s in text]
+
+    def test_matches_legacy_scan(self):
+        rng   = random.Random(0)
+        words = [w for ws in INTENT_KEYWORDS.values() for w in ws] + SYMPTOMS_DB + ["في", "و", "أنا"]
+        for _ in range(300):
+            text = " ".join(rng.choice(words) for _ in range(rng.randint(1, 6)))
+            self.assertEqual((self.processor.detect_intent(text),
+                              self.processor.extract_symptoms(text)), self._legacy(text), text)
+
+    def test_normalize(self):
+        self.assertEqual(self.processor.normalize("أنا عندي وجع في صدري من امبارح"),
+                         "أنا لدي ألم في صدري منذ أمس")
+        self.assertEqual(self.processor.normalize("تعبان ومش قادر أتنفس"),
+                         "مريض وضيق تنفس")
+
+    def test_process_emergency(self):
+        _, intent, symptoms, urgency = self.processor.process("تعبان ومش قادر أتنفس")
+        self.assertEqual(intent, IntentType.EMERGENCY)
+        self.assertIn("ضيق تنفس", symptoms)
+        self.assertEqual(urgency, "🚨 خطيرة جداً")
+
+
+class TestProcessBatch(unittest.TestCase):
+    """process_batch لازم يطابق process صف بصف"""
+
+    TEXTS = [
+        "أنا عندي وجع في صدري من امبارح",
+        "تعبان ومش قادر أتنفس",
+        "عندي حرارة وصداع",
+        "بموت إلحقوني",
+        "محتاج دواء السكر",
+        "عندي حرارة وصداع",
+        "السلام عليكم",
+    ]
+
+    def setUp(self):
+        self.processor = ArabicMedicalProcessor()
+
+    def test_rows_match_process(self):
+        batch = self.processor.process_batch(self.TEXTS)
+        self.assertEqual(len(batch), len(self.TEXTS))
+        for i, text in enumerate(self.TEXTS):
+            self.assertEqual(batch.row(i), self.processor.process(text))
+        matrix = batch.symptom_matrix()
+        self.assertEqual(matrix.shape, (len(self.TEXTS), len(SYMPTOMS_DB)))
+        self.assertTrue(matrix[2, SYMPTOMS_DB.index("صداع")])
+
+    def test_sharded_matches_single(self):
+        texts   = self.TEXTS * 5
+        single  = self.processor.process_batch(texts)
+        sharded = self.processor.process_batch(texts, workers=2, chunk_size=2)
+        self.assertEqual(sharded.normalized, single.normalized)
+        for col in ("intents", "symptoms", "urgency"):
+            self.assertTrue((getattr(sharded, col) == getattr(single, col)).all(), col)
+
+    def test_sharded_rebuilds_custom_processor(self):
+        """العمليات (spawn) بتبني الـ processor من نفس القواميس مش الافتراضية"""
+        custom  = ArabicMedicalProcessor(symptoms_db=["صداع", "كحة"])
+        texts   = self.TEXTS * 5
+        sharded = custom.process_batch(texts, workers=2, chunk_size=2)
+        self.assertEqual(sharded.symptom_names, ["صداع", "كحة"])
+        self.assertTrue((sharded.symptoms == custom.process_batch(texts).symptoms).all())
+
+    def test_empty(self):
+        batch = self.processor.process_batch([])
+        self.assertEqual(len(batch), 0)
+        self.assertEqual(batch.symptom_matrix().shape, (0, len(SYMPTOMS_DB)))
+
+
+class TestCodes(unittest.TestCase):
+    """الأكواد الرقمية لازم تتحول للنصوص من غير فقد"""
+
+    def test_intent_codes(self):
+        for code, intent in enumerate(IntentType):
+            self.assertEqual(IntentCode(code).intent, intent)
+
+    def test_urgency_codes(self):
+        for label in URGENCY_LEVELS:
+            self.assertEqual(Urgency.from_label(label).label, label)
+        self.assertGreater(Urgency.CRITICAL, Urgency.MODERATE)
+
+    def test_symptom_mask(self):
+        symptoms = ["صداع", "ضيق تنفس", "مرض السكري"]
+        mask = symptoms_to_mask(symptoms)
+        self.assertEqual(mask_to_symptoms(mask), symptoms)
+        self.assertEqual(mask_to_symptoms(symptoms_to_mask(SYMPTOMS_DB)), SYMPTOMS_DB)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,98 @@
+import unittest
+import sys
+import os
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from asr_backends import WHISPER_AVAILABLE, OpenAIWhisperBackend
+
+
+@unittest.skipUnless(WHISPER_AVAILABLE, "openai-whisper مش متسطب")
+class TestOpenAIBatch(unittest.TestCase):
+    """transcribe_batch لازم يرجع نفس اللي transcribe كان هيرجعه - segments وفحوص وfallback"""
+
+    def setUp(self):
+        import torch
+        import whisper
+        from whisper.decoding import DecodingResult
+        self.whisper, self.result = whisper, DecodingResult
+        self.tok = whisper.tokenizer.get_tokenizer(True, num_languages=99, language="ar",
+                                                   task="transcribe")
+        self.backend = OpenAIWhisperBackend.__new__(OpenAIWhisperBackend)
+        self.backend.model = SimpleNamespace(dims=SimpleNamespace(n_mels=80),
+                                             device=torch.device("cpu"),
+                                             is_multilingual=True, num_languages=99)
+        self.backend._lock = threading.Lock()
+        self.backend.transcribe = mock.Mock(return_value={"text": "fallback", "segments": []})
+
+    def _decoded(self, tokens, **kw):
+        values = dict(avg_logprob=-0.3, no_speech_prob=0.1, compression_ratio=1.2)
+        values.update(kw)
+        return self.result(audio_features=None, language="ar", tokens=tokens, text="", **values)
+
+    def _ts(self, seconds):
+        return self.tok.timestamp_begin + int(round(seconds / 0.02))
+
+    def _batch(self, *decoded):
+        audios = [np.zeros(16000 * 6, dtype=np.float32) for _ in decoded]
+        with mock.patch.object(self.whisper, "decode", return_value=list(decoded)):
+            return self.backend.transcribe_batch(audios)
+
+    def test_segments_from_timestamps(self):
+        one, two = self.tok.encode(" عندي صداع"), self.tok.encode(" وعندي دوخة")
+        tokens = [self._ts(0.0), *one, self._ts(2.4), self._ts(2.4), *two, self._ts(5.0)]
+        (result,) = self._batch(self._decoded(tokens))
+        segs = result["segments"]
+        self.assertEqual([(s["start"], s["end"]) for s in segs], [(0.0, 2.4), (2.4, 5.0)])
+        self.assertEqual(segs[1]["text"], self.tok.decode(two))
+        self.backend.transcribe.assert_not_called()
+
+    def test_failed_checks_fall_back(self):
+        good   = [self._ts(0.0), *self.tok.encode(" صداع"), self._ts(1.0)]
+        loop   = self._decoded(good, compression_ratio=3.1)         # هلوسة بتكرر نفسها
+        unsure = self._decoded(good, avg_logprob=-1.4)
+        no_ts  = self._decoded(self.tok.encode(" صداع"))
+        silent = self._decoded(good, no_speech_prob=0.9, avg_logprob=-1.4)
+        results = self._batch(loop, unsure, no_ts, silent)
+        self.assertEqual([r["text"] for r in results[:3]], ["fallback"] * 3)
+        self.assertEqual(results[3]["segments"], [])                # صمت: بيتشال من غير إعادة
+        self.assertEqual(self.backend.transcribe.call_count, 3)
+
+
+class _OverlapModel:
+    """بيعد كام thread جوه transcribe في نفس الوقت (الـ kv-cache hooks بتاعة whisper مش thread-safe)"""
+
+    def __init__(self):
+        self.active, self.peak = 0, 0
+
+    def transcribe(self, audio, **options):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        time.sleep(0.05)
+        self.active -= 1
+        return {"text": "", "segments": []}
+
+
+class TestOpenAIThreads(unittest.TestCase):
+    """timeline بـ workers، الـ warm-up وجلسات Streamlit بيشاركوا نفس الموديل"""
+
+    def test_one_decode_at_a_time(self):
+        backend = OpenAIWhisperBackend.__new__(OpenAIWhisperBackend)
+        backend.model, backend._lock = _OverlapModel(), threading.Lock()
+        audio   = np.zeros(1600, dtype=np.float32)
+        threads = [threading.Thread(target=backend.transcribe, args=(audio,)) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(backend.model.peak, 1)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
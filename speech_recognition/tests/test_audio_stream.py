@@ -0,0 +1,168 @@
+import unittest
+import sys
+import os
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from scipy.signal import resample_poly
+
+from audio_stream import RingBuffer, Endpointer, StreamResampler, FrameRecorder
+
+
+def _tone(seconds, sr, amp=0.3):
+    t = np.arange(int(seconds * sr)) / sr
+    return (amp * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def _silence(seconds, sr):
+    return np.zeros(int(seconds * sr), dtype=np.float32)
+
+
+class TestRingBuffer(unittest.TestCase):
+    """اختبار الـ buffer الدائري"""
+
+    def test_wraparound_keeps_latest(self):
+        rb = RingBuffer(5)
+        rb.write(np.arange(3, dtype=np.float32))
+        rb.write(np.arange(3, 7, dtype=np.float32))
+        self.assertEqual(len(rb), 5)
+        np.testing.assert_array_equal(rb.read(), [2, 3, 4, 5, 6])
+        np.testing.assert_array_equal(rb.read(2), [5, 6])
+
+    def test_chunk_larger_than_capacity(self):
+        rb = RingBuffer(4)
+        rb.write(np.arange(10, dtype=np.float32))
+        np.testing.assert_array_equal(rb.read(), [6, 7, 8, 9])
+
+
+class TestEndpointer(unittest.TestCase):
+    """اختبار تحديد بداية ونهاية الكلام"""
+
+    SR = 16000
+
+    def _feed(self, ep, audio, block=512):
+        for i in range(0, len(audio), block):
+            out = ep.push(audio[i:i + block])
+            if out is not None:
+                return out, i + block
+        return None, len(audio)
+
+    def test_ends_after_silence(self):
+        """الجملة تخلص بعد الصمت مش بعد نهاية التسجيل كله"""
+        ep = Endpointer(self.SR, end_silence=0.5, pre_roll=0.2)
+        audio = np.concatenate([_silence(0.5, self.SR), _tone(1.0, self.SR), _silence(3.0, self.SR)])
+        utterance, consumed = self._feed(ep, audio)
+        self.assertIsNotNone(utterance)
+        self.assertLess(consumed / self.SR, 2.5)
+        self.assertGreaterEqual(len(utterance) / self.SR, 1.0)
+
+    def test_no_speech(self):
+        ep = Endpointer(self.SR)
+        utterance, _ = self._feed(ep, _silence(2.0, self.SR))
+        self.assertIsNone(utterance)
+        self.assertFalse(ep.in_speech)
+
+    def test_stream_matches_push(self):
+        """الصوت اللي بيطلع أول بأول = الجملة اللي push بيرجعها"""
+        audio = np.concatenate([_silence(0.5, self.SR), _tone(1.0, self.SR), _silence(1.5, self.SR)])
+        whole, _ = self._feed(Endpointer(self.SR), audio)
+        ep, parts, ended = Endpointer(self.SR), [], False
+        for i in range(0, len(audio), 512):
+            speech, ended = ep.stream(audio[i:i + 512])
+            parts.append(speech)
+            if ended:
+                break
+        self.assertTrue(ended)
+        np.testing.assert_array_equal(np.concatenate(parts), whole)
+
+    def test_chunk_spans_two_utterances(self):
+        """chunk واحد فيه آخر جملة وأول اللي بعدها: restart() بيرجع الباقي ما يضيعش"""
+        audio = np.concatenate([_silence(0.3, self.SR), _tone(1.0, self.SR), _silence(1.0, self.SR),
+                                _tone(0.8, self.SR), _silence(1.0, self.SR)])
+        ep, got, chunk = Endpointer(self.SR), [], audio
+        while len(chunk):
+            utterance = ep.push(chunk)
+            if utterance is None:
+                break
+            got.append(utterance)
+            chunk = ep.restart()
+        self.assertEqual(len(got), 2)
+        self.assertGreaterEqual(len(got[1]) / self.SR, 0.8)
+        self.assertEqual(len(ep.restart()), 0)
+
+    def test_max_duration(self):
+        ep = Endpointer(self.SR, max_duration=1.0)
+        utterance, _ = self._feed(ep, _tone(3.0, self.SR))
+        self.assertIsNotNone(utterance)
+        self.assertEqual(len(utterance), self.SR)
+
+
+class TestStreamResampler(unittest.TestCase):
+    """الـ resample على chunks لازم يطابق resample الملف كله"""
+
+    def test_matches_one_shot(self):
+        rng = np.random.default_rng(0)
+        for sr, up, down in [(44100, 160, 441), (48000, 1, 3)]:
+            x = rng.standard_normal(sr + 777).astype(np.float32)
+            rs = StreamResampler(sr, 16000)
+            out = [rs.process(x[i:i + 1000]) for i in range(0, len(x), 1000)]
+            out.append(rs.flush())
+            np.testing.assert_allclose(np.concatenate(out),
+                                       resample_poly(x, up, down), atol=1e-5)
+
+
+class TestFrameRecorder(unittest.TestCase):
+    """frames WebRTC بأي شكل → mono 16kHz في buffer ثابت"""
+
+    def _frames(self, stereo, planar, size=960):
+        # زي av.AudioFrame.to_ndarray(): s16 packed = (1, n×2)، fltp planar = (2, n)
+        for i in range(0, stereo.shape[1], size):
+            block = stereo[:, i:i + size]
+            if planar:
+                yield block
+            else:
+                yield (block.T.reshape(1, -1) * 32767).astype(np.int16)
+
+    def test_packed_and_planar_match(self):
+        tone   = _tone(1.0, 48000)
+        stereo = np.stack((tone, tone))
+        expect = resample_poly(tone, 1, 3)
+        for planar in (False, True):
+            rec = FrameRecorder(max_seconds=5)
+            for f in self._frames(stereo, planar):
+                rec.push(f, 48000, channels=2, planar=planar)
+            got = rec.audio()
+            self.assertLessEqual(abs(len(got) - len(expect)), 32)
+            np.testing.assert_allclose(got[:2000], expect[:2000], atol=1e-3)
+
+    def test_bounded(self):
+        rec = FrameRecorder(max_seconds=1.0)
+        for _ in range(50):
+            rec.push(np.zeros((1, 4410), dtype=np.int16), 44100)
+        self.assertEqual(len(rec), 16000)
+        self.assertAlmostEqual(rec.duration, 1.0)
+        rec.clear()
+        self.assertEqual(len(rec.audio()), 0)
+
+    def test_utterances(self):
+        """كل جملة بتطلع أول ما المريض يسكت - من غير ما التسجيل يقف"""
+        got = []
+        rec = FrameRecorder(max_seconds=10, on_utterance=got.append)
+        audio = np.concatenate([_silence(0.5, 48000), _tone(1.0, 48000), _silence(1.0, 48000),
+                                _tone(0.8, 48000), _silence(1.0, 48000)])
+        for i in range(0, len(audio), 960):
+            rec.push(audio[i:i + 960].reshape(1, -1), 48000)
+        self.assertEqual(len(got), 2)
+        self.assertGreater(len(got[0]), 16000)
+        self.assertLess(len(got[1]), len(got[0]))
+        self.assertAlmostEqual(len(rec), len(audio) // 3, delta=32)
+
+        got.clear()
+        rec = FrameRecorder(max_seconds=10, on_utterance=got.append)
+        rec.push(audio.reshape(1, -1), 48000)                      # الجملتين في frame واحد
+        self.assertEqual(len(got), 2)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,70 @@
+import unittest
+import sys
+import os
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from batching import BatchScheduler
+import tracing
+
+
+class FakeBackend:
+    """بيسجل حجم كل batch ويرجع طول التسجيل كنص"""
+
+    def __init__(self):
+        self.batches = []
+
+    def transcribe_batch(self, audios):
+        self.batches.append(len(audios))
+        return [{"text": str(len(a)), "segments": []} for a in audios]
+
+
+class TestBatchScheduler(unittest.TestCase):
+    """اختبار تجميع الطلبات المتزامنة"""
+
+    def test_concurrent_requests_share_a_batch(self):
+        backend   = FakeBackend()
+        scheduler = BatchScheduler(backend, max_batch=4, max_wait_ms=200)
+        futures   = [scheduler.submit(np.zeros(n, dtype=np.float32)) for n in (10, 20, 30)]
+        results   = [f.result(timeout=5) for f in futures]
+        scheduler.close()
+
+        self.assertEqual([r["text"] for r in results], ["10", "20", "30"])
+        self.assertEqual(backend.batches, [3])
+
+    def test_max_batch(self):
+        backend   = FakeBackend()
+        scheduler = BatchScheduler(backend, max_batch=2, max_wait_ms=200)
+        futures   = [scheduler.submit(np.zeros(5, dtype=np.float32)) for _ in range(5)]
+        for f in futures:
+            f.result(timeout=5)
+        scheduler.close()
+        self.assertTrue(all(b <= 2 for b in backend.batches))
+        self.assertEqual(sum(backend.batches), 5)
+
+    def test_stages_reach_submitter_trace(self):
+        """الـ batch بيتحول في thread الـ scheduler - مراحله لازم تبان في trace كل طالب"""
+        class Traced(FakeBackend):
+            def transcribe_batch(self, audios):
+                with tracing.span("whisper.decode"):
+                    return super().transcribe_batch(audios)
+
+        scheduler = BatchScheduler(Traced(), max_wait_ms=1)
+        with tracing.trace() as t:
+            scheduler.transcribe(np.zeros(5, dtype=np.float32))
+        scheduler.close()
+        self.assertIn("whisper.decode", t.stages)
+
+    def test_error_propagates(self):
+        class Broken:
+            def transcribe_batch(self, audios):
+                raise RuntimeError("boom")
+        scheduler = BatchScheduler(Broken(), max_wait_ms=1)
+        with self.assertRaises(RuntimeError):
+            scheduler.transcribe(np.zeros(5, dtype=np.float32))
+        scheduler.close()
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
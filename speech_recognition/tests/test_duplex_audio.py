@@ -0,0 +1,143 @@
+import unittest
+import sys
+import os
+import threading
+from unittest import mock
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from duplex_audio import DuplexAudio, EchoSuppressor
+import speech_handler
+
+SR = 16000
+
+
+def _tone(seconds, freq=300.0, amp=0.3):
+    t = np.arange(int(seconds * SR)) / SR
+    return (amp * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+class TestDuplexAudio(unittest.TestCase):
+    """اختبار كبت الصدى والمقاطعة من غير جهاز صوت - الفريمات بتتبعت لـ _process مباشرة"""
+
+    def setUp(self):
+        self.hits   = []
+        self.engine = DuplexAudio(SR, on_barge_in=lambda: self.hits.append(True))
+        self.delay  = 3 * self.engine.frame_len          # الصدى بيرجع بعد 3 فريمات
+
+    def _run(self, mic_extra=None, seconds=1.0):
+        """يشغل tone ويرجع الميكروفون بعد الكبت - الميكروفون = صدى متأخر (+ كلام)"""
+        n, out_log, clean = self.engine.frame_len, [], []
+        self.engine.begin(_tone(seconds))
+        frames = int(seconds * SR) // n
+        played = np.zeros(frames * n + self.delay, dtype=np.float32)
+        with self.engine.listen() as blocks:
+            for k in range(frames):
+                out = np.zeros(n, dtype=np.float32)
+                mic = 0.4 * played[k * n:(k + 1) * n]
+                if mic_extra is not None:
+                    mic = mic + mic_extra[k * n:(k + 1) * n]
+                self.engine._process(mic, out)
+                self.engine._pump(block=False)              # الـ worker بتاع duplex-audio
+                played[self.delay + k * n:self.delay + (k + 1) * n] = out
+                clean.append(blocks.get_nowait())
+        return np.concatenate(clean)
+
+    def test_echo_is_suppressed(self):
+        clean = self._run()
+        self.assertFalse(self.hits)
+        self.assertFalse(self.engine.interrupted)
+        self.assertLess(float(np.abs(clean).max()), 1e-6)
+
+    def test_barge_in_stops_playback(self):
+        speech = np.zeros(SR, dtype=np.float32)
+        speech[SR // 2:] = _tone(0.5, freq=1200.0, amp=0.5)
+        clean = self._run(mic_extra=speech)
+        self.assertEqual(self.hits, [True])
+        self.assertTrue(self.engine.interrupted)
+        self.assertFalse(self.engine.playing)
+        self.assertGreater(float(np.abs(clean[int(0.7 * SR):]).max()), 0.3)
+
+    def test_callback_defers_barge_in(self):
+        """thread الصوت (_process) ما بينادي الـ callback - الـ worker (_pump) هو اللي بينادي"""
+        speech = np.zeros(SR, dtype=np.float32)
+        speech[SR // 2:] = _tone(0.5, freq=1200.0, amp=0.5)
+        n = self.engine.frame_len
+        self.engine.begin(_tone(1.0))
+        for k in range(SR // n):
+            self.engine._process(speech[k * n:(k + 1) * n], np.zeros(n, dtype=np.float32))
+        self.assertTrue(self.engine.interrupted)
+        self.assertFalse(self.hits)
+        for _ in range(SR // n):
+            self.engine._pump(block=False)
+        self.assertEqual(self.hits, [True])
+
+    def test_history_seeds_listener(self):
+        n = self.engine.frame_len
+        for _ in range(5):
+            self.engine._process(np.full(n, 0.1, dtype=np.float32), np.zeros(n, dtype=np.float32))
+            self.engine._pump(block=False)
+        with self.engine.listen() as blocks:
+            self.assertEqual(len(blocks.get_nowait()), 5 * n)
+        with self.engine.listen() as blocks:
+            self.assertTrue(blocks.empty())
+
+    def test_no_reference_passes_through(self):
+        mic = np.full(160, 0.2, dtype=np.float32)
+        out, near_end = EchoSuppressor(4).process(mic, np.zeros(160, dtype=np.float32))
+        self.assertIs(out, mic)
+        self.assertTrue(near_end)
+
+
+class _FakeASR:
+    def __init__(self):
+        self.lengths = []
+
+    def transcribe(self, audio):
+        self.lengths.append(len(audio))
+        return {"text": "عندي صداع", "segments": [{"no_speech_prob": 0.1}]}
+
+
+class TestBargeInTranscription(unittest.TestCase):
+    """المريض قاطع الرد → كلامه بيتسجل ويتحول من غير ما حد ينادي listen_and_process"""
+
+    def setUp(self):
+        self.asr = _FakeASR()
+        patches = [
+            mock.patch.multiple(speech_handler, load_backend=mock.Mock(return_value=self.asr),
+                                SpeechSynthesizer=mock.Mock(), PlaybackWorker=mock.Mock()),
+            mock.patch.object(speech_handler.CacheConfig, "ENABLED", False),
+            mock.patch.object(speech_handler.KWSConfig, "ENABLED", False),
+            mock.patch.object(speech_handler.WhisperConfig, "WARMUP", False),
+            mock.patch.object(speech_handler.SpeechHandler, "_get_native_sr", return_value=SR),
+            # من غير start(): مفيش جهاز صوت - الفريمات بتتبعت لـ _process مباشرة
+            mock.patch.object(speech_handler.SpeechHandler, "_open_duplex",
+                              lambda handler: DuplexAudio(SR, on_barge_in=handler._on_barge_in)),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.handler = speech_handler.SpeechHandler()
+
+    def test_barge_in_is_transcribed(self):
+        done, results = threading.Event(), []
+        self.handler.on_interrupt = lambda data: (results.append(data), done.set())
+        engine, n = self.handler.duplex, self.handler.duplex.frame_len
+
+        speech = np.zeros(int(1.9 * SR), dtype=np.float32)
+        speech[int(0.3 * SR):int(0.9 * SR)] = _tone(0.6, freq=1200.0, amp=0.5)
+        engine.begin(_tone(2.0))
+        for k in range(len(speech) // n):
+            engine._process(speech[k * n:(k + 1) * n], np.zeros(n, dtype=np.float32))
+            engine._pump(block=False)
+
+        self.assertTrue(done.wait(10), "المقاطعة ما اتحولتش")
+        self.handler.player.stop_all.assert_called()
+        self.assertEqual(results[0].original_text, "عندي صداع")
+        self.assertGreaterEqual(self.asr.lengths[0], int(0.6 * SR))     # الكلام كله من أول كلمة
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
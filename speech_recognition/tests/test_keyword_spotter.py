@@ -0,0 +1,118 @@
+import unittest
+import sys
+import os
+import threading
+from unittest import mock
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config import KWSConfig
+from arabic_processor import IntentType
+from playback import Priority
+import keyword_spotter
+import speech_handler
+
+SR = 16000
+
+
+class _FakeKWS:
+    """decode_short بيرجع النص اللي الاختبار حدده - وبيعلن إنه اتنده"""
+
+    def __init__(self, text, no_speech_prob=0.1):
+        self.text, self.no_speech_prob = text, no_speech_prob
+        self.called = threading.Event()
+        self.calls  = []
+
+    def decode_short(self, audio, prompt, max_tokens):
+        self.calls.append((len(audio), prompt, max_tokens))
+        self.called.set()
+        return {"text": self.text, "no_speech_prob": self.no_speech_prob}
+
+
+class TestKeywordSpotter(unittest.TestCase):
+    """كلمة طوارئ في نص الـ KWS (بعد التطبيع) → الكلمة، غير كده None"""
+
+    def _spotter(self, backend):
+        with mock.patch.object(keyword_spotter, "load_backend", return_value=backend):
+            return keyword_spotter.KeywordSpotter()
+
+    def test_hit(self):
+        audio = np.zeros(SR, dtype=np.float32)
+        for text, word in (("إلحقوني بسرعة", "إلحقوني"), (" الحقونى", "إلحقوني"),
+                           ("مش قادر أتنفس", "ضيق تنفس")):          # العامية بتتطبع الأول
+            backend = _FakeKWS(text)
+            self.assertEqual(self._spotter(backend).spot(audio), word, text)
+            self.assertEqual(backend.calls, [(SR, KWSConfig.PROMPT, KWSConfig.MAX_TOKENS)])
+
+    def test_miss(self):
+        audio = np.zeros(SR, dtype=np.float32)
+        self.assertIsNone(self._spotter(_FakeKWS("عندي صداع من امبارح")).spot(audio))
+        self.assertIsNone(self._spotter(_FakeKWS("")).spot(audio))
+        # الـ prompt مليان كلمات طوارئ - صمت بيطلعها تاني، فالـ no_speech_prob هو الحكم
+        self.assertIsNone(self._spotter(_FakeKWS("إلحقوني، بموت", no_speech_prob=0.9)).spot(audio))
+
+
+class _SlowASR:
+    """التحويل الكامل بيخلص بعد ما الـ KWS يتنده بس - يثبت إنهم شغالين بالتوازي"""
+
+    def __init__(self, kws, text):
+        self.kws, self.text = kws, text
+        self.overlapped = None
+
+    def transcribe(self, audio):
+        self.overlapped = self.kws.called.wait(5)
+        return {"text": self.text, "segments": [{"no_speech_prob": 0.1}]}
+
+
+class TestEmergencyPath(unittest.TestCase):
+    """listen_and_process: الـ KWS بيقطع الكلام بالرد الطارئ قبل ما Whisper الكامل يخلص"""
+
+    def _handler(self, kws_text, asr_text):
+        self.kws = _FakeKWS(kws_text)
+        self.asr = _SlowASR(self.kws, asr_text)
+        speech = np.sin(2 * np.pi * 300 * np.arange(SR) / SR).astype(np.float32) * 0.3
+        patches = [
+            mock.patch.multiple(speech_handler, load_backend=mock.Mock(return_value=self.asr),
+                                SpeechSynthesizer=mock.Mock(), PlaybackWorker=mock.Mock()),
+            mock.patch.object(keyword_spotter, "load_backend", return_value=self.kws),
+            mock.patch.object(speech_handler.CacheConfig, "ENABLED", False),
+            mock.patch.object(speech_handler.DuplexConfig, "ENABLED", False),
+            mock.patch.object(speech_handler.KWSConfig, "ENABLED", True),
+            mock.patch.object(speech_handler.WhisperConfig, "WARMUP", False),
+            mock.patch.object(speech_handler.AudioConfig, "CAPTURE_MODE", "vad"),
+            mock.patch.object(speech_handler.SpeechHandler, "_get_native_sr", return_value=SR),
+            mock.patch.object(speech_handler.SpeechHandler, "_record_until_silence",
+                              return_value=speech),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        handler = speech_handler.SpeechHandler()
+        handler.generate_smart_response = mock.Mock()
+        handler.on_emergency = mock.Mock()
+        return handler
+
+    def test_emergency_preempts(self):
+        handler = self._handler("إلحقوني", "إلحقوني أنا بموت")
+        data = handler.listen_and_process()
+        self.assertTrue(self.asr.overlapped, "الـ KWS استنى التحويل الكامل")
+        self.assertEqual(data.detected_intent, IntentType.EMERGENCY)
+        handler.player.play.assert_called_once_with([speech_handler.EMERGENCY_RESPONSE],
+                                                    Priority.EMERGENCY)
+        handler.on_emergency.assert_called_once_with("إلحقوني")
+        handler.generate_smart_response.assert_not_called()   # الرد الطارئ اتقال خلاص
+
+    def test_no_keyword_normal_response(self):
+        handler = self._handler("عندي صداع", "عندي صداع")
+        data = handler.listen_and_process()
+        self.assertTrue(self.asr.overlapped)
+        handler.player.play.assert_not_called()
+        handler.on_emergency.assert_not_called()
+        handler.generate_smart_response.assert_called_once_with(data.detected_intent,
+                                                                data.detected_symptoms)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
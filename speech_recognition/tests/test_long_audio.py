@@ -0,0 +1,79 @@
+import unittest
+import sys
+import os
+import tempfile
+import numpy as np
+import soundfile as sf
+from scipy.signal import resample_poly
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from long_audio import duration, iter_windows, read_blocks
+
+SR = 16000
+
+
+def _speech_with_gaps(seconds, gap_every, rng):
+    """ضوضاء بصوت عالي مع ثانية صمت كل gap_every ثانية"""
+    audio = (rng.standard_normal(int(seconds * SR)) * 0.3).astype(np.float32)
+    for t in range(gap_every, int(seconds), gap_every):
+        audio[t * SR:(t + 1) * SR] = 0.0
+    return audio
+
+
+class TestIterWindows(unittest.TestCase):
+    """الأجزاء ≤ النافذة، متصلة، والقطع بيقع في الصمت"""
+
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+
+    def _blocks(self, audio, size=SR // 3):
+        return (audio[i:i + size] for i in range(0, len(audio), size))
+
+    def test_contiguous_and_bounded(self):
+        audio   = _speech_with_gaps(95, 27, self.rng)
+        windows = list(iter_windows(self._blocks(audio), SR, window=30.0, search=5.0))
+        offset  = 0
+        for start, chunk in windows:
+            self.assertEqual(start, offset)
+            self.assertLessEqual(len(chunk), 30 * SR)
+            offset += len(chunk)
+        np.testing.assert_array_equal(np.concatenate([c for _, c in windows]), audio)
+
+    def test_cut_in_silence(self):
+        audio   = _speech_with_gaps(70, 27, self.rng)
+        windows = list(iter_windows(self._blocks(audio), SR, window=30.0, search=5.0))
+        for start, chunk in windows[:-1]:
+            cut = start + len(chunk)
+            self.assertEqual(cut // SR % 27, 0, f"القطع عند {cut / SR:.2f}s مش في الصمت")
+
+    def test_short_input(self):
+        audio   = np.ones(SR, dtype=np.float32)
+        windows = list(iter_windows(self._blocks(audio), SR, window=30.0))
+        self.assertEqual(len(windows), 1)
+        self.assertEqual(len(windows[0][1]), SR)
+
+
+class TestReadBlocks(unittest.TestCase):
+    """القراءة على blocks لازم تطلع نفس resample الملف كله"""
+
+    def test_matches_whole_file(self):
+        rng   = np.random.default_rng(1)
+        audio = (rng.standard_normal((44100 * 4, 2)) * 0.1).astype(np.float32)
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "long.wav")
+            sf.write(path, audio, 44100, subtype="FLOAT")
+            self.assertAlmostEqual(duration(path), 4.0, places=3)
+            blocks = list(read_blocks(path, SR, block_seconds=0.5))
+            with open(path, "rb") as f:
+                from_file = np.concatenate(list(read_blocks(f, SR)))
+
+        got    = np.concatenate(blocks)
+        expect = resample_poly(audio.mean(axis=1), 160, 441).astype(np.float32)
+        self.assertTrue(all(len(b) <= SR for b in blocks))
+        np.testing.assert_allclose(got, expect, atol=1e-5)
+        np.testing.assert_allclose(from_file, expect, atol=1e-5)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,46 @@
+import unittest
+import sys
+import os
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from asr_backends import WHISPER_AVAILABLE
+import model_store
+
+
+@unittest.skipUnless(WHISPER_AVAILABLE, "openai-whisper مش متسطب")
+class TestMmapWeights(unittest.TestCase):
+    """الموديل المحمّل mmap لازم يطلع نفس الناتج بالظبط - على موديل صغير بأوزان عشوائية"""
+
+    def test_round_trip(self):
+        import torch
+        import whisper
+        from whisper.model import ModelDimensions, Whisper
+
+        torch.manual_seed(0)
+        dims  = ModelDimensions(n_mels=80, n_audio_ctx=1500, n_audio_state=96, n_audio_head=6,
+                                n_audio_layer=4, n_vocab=51865, n_text_ctx=448, n_text_state=96,
+                                n_text_head=6, n_text_layer=4)     # شكل tiny بعرض أصغر
+        model = Whisper(dims)
+        with torch.no_grad():                                       # torch.empty في whisper - ممكن يبقى NaN
+            model.decoder.positional_embedding.normal_(std=0.02)
+        model = model.half()
+        model.set_alignment_heads(whisper._ALIGNMENT_HEADS["tiny"])
+
+        with tempfile.TemporaryDirectory() as d:
+            path   = model_store.convert(model, os.path.join(d, "w.pt"))
+            loaded = model_store.load_mmap(path)
+            model  = model.float()
+            mel    = torch.randn(1, 80, 3000)
+            tokens = torch.tensor([[50258, 50272, 50359]])
+            with torch.no_grad():
+                self.assertTrue(torch.equal(model(mel, tokens), loaded(mel, tokens)))
+            self.assertTrue(torch.equal(model.alignment_heads.to_dense(),
+                                        loaded.alignment_heads.to_dense()))
+            self.assertFalse(any(p.is_meta for p in loaded.parameters()))
+            self.assertFalse(any(b.is_meta for b in loaded.buffers()))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,82 @@
+import unittest
+import sys
+import os
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tts_engines import SpeechSynthesizer
+from playback import PlaybackWorker, Priority
+from test_tts_engines import FakeEngine
+
+
+class FakeOutput:
+    """مخرج وهمي: كل جزء "بيتشغل" لحد ما يتلغى أو يعدي duration"""
+
+    def __init__(self, duration=0.05):
+        self.duration = duration
+        self.played   = []
+        self.started  = threading.Event()
+
+    def play(self, data, suffix, path, should_stop):
+        text = data.decode("utf-8")
+        self.played.append(text[:len(text) // 10])          # FakeEngine بيكرر النص 10 مرات
+        self.started.set()
+        end = time.monotonic() + self.duration
+        while time.monotonic() < end:
+            if should_stop():
+                return False
+            time.sleep(0.005)
+        return True
+
+
+class TestPlaybackWorker(unittest.TestCase):
+    """اختبار طابور التشغيل والأولويات والإلغاء"""
+
+    def setUp(self):
+        self.dir    = tempfile.TemporaryDirectory()
+        self.synth  = SpeechSynthesizer([FakeEngine()], cache_dir=self.dir.name)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_plays_in_order(self):
+        out    = FakeOutput(duration=0)
+        player = PlaybackWorker(self.synth, out)
+        first  = player.play(["سلامتك", "صداع"])
+        second = player.play(["مرحبا"])
+        self.assertTrue(second.wait(2))
+        self.assertEqual(out.played, ["سلامتك", "صداع", "مرحبا"])
+        self.assertEqual((first.status, second.status), ("done", "done"))
+        self.assertIsNotNone(first.latency)
+        self.assertEqual(player.stats()["played"], 2)
+
+    def test_emergency_preempts(self):
+        out    = FakeOutput(duration=5)
+        player = PlaybackWorker(self.synth, out)
+        long   = player.play(["رد طويل"])
+        queued = player.play(["رد تاني"])
+        self.assertTrue(out.started.wait(2))
+        out.duration = 0
+        urgent = player.play(["طوارئ"], Priority.EMERGENCY)
+        self.assertTrue(urgent.wait(2))
+        self.assertEqual((long.status, queued.status, urgent.status), ("cancelled", "cancelled", "done"))
+        self.assertEqual(out.played, ["رد طويل", "طوارئ"])
+        self.assertTrue(queued.wait(2))
+        stats = player.stats()
+        self.assertEqual((stats["preempted"], stats["cancelled"], stats["played"]), (2, 0, 1))
+
+    def test_cancel_handle(self):
+        out    = FakeOutput(duration=5)
+        player = PlaybackWorker(self.synth, out)
+        handle = player.play(["جملة"])
+        self.assertTrue(out.started.wait(2))
+        handle.cancel()
+        self.assertTrue(handle.wait(2))
+        self.assertEqual(handle.status, "cancelled")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
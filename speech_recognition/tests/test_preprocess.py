@@ -0,0 +1,64 @@
+import unittest
+import sys
+import os
+import numpy as np
+from scipy.signal import resample_poly
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from preprocess import AudioPreprocessor, polyphase_window, resample, rms
+
+
+def _legacy(raw, sr):
+    """الـ pipeline القديم بتاع SpeechHandler._process_audio"""
+    audio = raw.flatten().astype(np.float32)
+    if sr != 16000:
+        audio = resample_poly(audio, 16000 // np.gcd(sr, 16000), sr // np.gcd(sr, 16000)).astype(np.float32)
+    audio = np.append(audio[0], audio[1:] - 0.97 * audio[:-1])
+    return (audio / np.max(np.abs(audio)) * 0.95).astype(np.float32)
+
+
+class TestAudioPreprocessor(unittest.TestCase):
+    """الـ pipeline الجديد لازم يطلع نفس الصوت - في المكان ومن غير نسخ"""
+
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+
+    def _raw(self, sr, seconds=3.0):
+        return (self.rng.standard_normal((int(sr * seconds), 1)) * 0.1).astype(np.float32)
+
+    def test_matches_legacy(self):
+        for sr in (16000, 44100, 48000):
+            raw = self._raw(sr)
+            np.testing.assert_allclose(AudioPreprocessor(sr).process(raw), _legacy(raw, sr),
+                                       atol=1e-6, err_msg=str(sr))
+
+    def test_inplace_without_resample(self):
+        raw = self._raw(16000)
+        out = AudioPreprocessor(16000).process(raw, inplace=True)
+        self.assertTrue(np.shares_memory(out, raw))
+        keep = self._raw(16000)
+        copy = keep.copy()
+        AudioPreprocessor(16000).process(keep)
+        np.testing.assert_array_equal(keep, copy)
+
+    def test_streaming_pre_emphasis(self):
+        x     = self._raw(16000).reshape(-1)
+        whole = np.append(x[0], x[1:] - 0.97 * x[:-1])
+        proc  = AudioPreprocessor(16000)
+        proc.BLOCK = 1000                              # أكتر من block في الـ chunk الواحد
+        parts, prev = [], 0.0
+        for chunk in np.array_split(x.copy(), 7):
+            prev = proc.pre_emphasis(chunk, prev)
+            parts.append(chunk)
+        np.testing.assert_allclose(np.concatenate(parts), whole, atol=1e-6)
+
+    def test_cached_window_is_exact(self):
+        x = self._raw(44100).reshape(-1)
+        np.testing.assert_array_equal(resample(x, 44100), resample_poly(x, 160, 441))
+        self.assertIs(polyphase_window(160, 441), polyphase_window(160, 441))
+        self.assertAlmostEqual(rms(x), float(np.sqrt(np.mean(x ** 2))), places=5)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,54 @@
+import unittest
+import sys
+import os
+import subprocess
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from arabic_processor import ArabicMedicalProcessor
+from speech_result import SpeechResult, TimelineSegment
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+class TestSpeechResult(unittest.TestCase):
+    """النتيجة المضغوطة لازم ترجع نفس النصوص المعروضة"""
+
+    def setUp(self):
+        self.processor = ArabicMedicalProcessor()
+
+    def _result(self, text):
+        norm, intent, symptoms, urgency, scores = self.processor.process_scored(text)
+        r = SpeechResult.from_analysis(text, norm, intent, symptoms, 0.9, urgency, 0.1,
+                                       symptom_scores=scores, stages=(("asr", 12.5),))
+        return r, (intent, symptoms, urgency, scores)
+
+    def test_lossless_round_trip(self):
+        for text in ["عندى ضيك تنفس وغسيان", "عندي صداع وحمى ودوار", "السلام عليكم"]:
+            r, (intent, symptoms, urgency, scores) = self._result(text)
+            self.assertEqual(r.detected_intent, intent)
+            self.assertEqual(r.detected_symptoms, symptoms)
+            self.assertEqual(r.urgency_level, urgency)
+            self.assertEqual(r.symptom_scores, scores)
+            self.assertEqual(SpeechResult.from_tuple(r.to_tuple()), r)
+            self.assertEqual(SpeechResult.from_dict(r.to_dict()), r)
+            self.assertFalse(hasattr(r, "__dict__"))
+
+    def test_timeline_segment(self):
+        r, _ = self._result("عندي صداع")
+        d = TimelineSegment(1.5, 3.0, r).to_dict()
+        self.assertEqual((d["start"], d["end"]), (1.5, 3.0))
+        self.assertEqual(d["symptoms"], ["صداع"])
+
+    def test_no_audio_imports(self):
+        """الـ API والواجهات بيستوردوها من غير sounddevice ولا Whisper ولا torch"""
+        code = ("import sys, speech_result; "
+                "print(','.join(m for m in ('sounddevice', 'whisper', 'torch', 'speech_handler') "
+                "if m in sys.modules))")
+        out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True,
+                             text=True, check=True)
+        self.assertEqual(out.stdout.strip(), "")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,281 @@
+import unittest
+import sys
+import os
+import asyncio
+import tempfile
+import threading
+import time
+from unittest import mock
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend")))
+
+from aiohttp import web
+
+from speech_api import FairQueue, Job, create_app
+from service_client import SpeechServiceClient
+import speech_handler
+
+
+def _job(session, n):
+    return Job(f"{session}{n}", "array", None, session=session)
+
+
+class TestFairQueue(unittest.TestCase):
+    """جلسة بعتت طلبات كتير ما تقفلش على جلسة بعتت طلب واحد"""
+
+    def test_round_robin(self):
+        async def run():
+            q    = FairQueue(maxsize=10)
+            jobs = [_job("a", i) for i in range(4)] + [_job("b", i) for i in range(2)]
+            for j in jobs:
+                q.put_nowait(j)
+            positions = {j.id: q.position(j) for j in jobs}
+            order     = [(await q.get()).id for _ in jobs]
+            return positions, order
+
+        positions, order = asyncio.run(run())
+        self.assertEqual(order, ["a0", "b0", "a1", "b1", "a2", "a3"])
+        self.assertEqual(positions, {jid: i for i, jid in enumerate(order)})
+
+    def test_bounded(self):
+        q = FairQueue(maxsize=2)
+        q.put_nowait(_job("a", 0))
+        q.put_nowait(_job("b", 0))
+        with self.assertRaises(asyncio.QueueFull):
+            q.put_nowait(_job("c", 0))
+
+
+class _SlowHandler:
+    def transcribe_array(self, audio):
+        time.sleep(0.2)
+        return None
+
+
+class _FakeASR:
+    def transcribe(self, audio):
+        return {"text": "", "segments": []}
+
+
+class TestHeadlessHandler(unittest.TestCase):
+    """الخدمة ما بتلمسش الميكروفون ولا السماعة ولا TTS ولا KWS"""
+
+    def test_no_audio_devices(self):
+        forbidden = mock.Mock(side_effect=AssertionError("مش المفروض يتنادى في headless"))
+        with mock.patch.object(speech_handler, "load_backend", return_value=_FakeASR()), \
+             mock.patch.object(speech_handler.CacheConfig, "ENABLED", False), \
+             mock.patch.multiple(speech_handler, SpeechSynthesizer=forbidden, DuplexAudio=forbidden,
+                                 KeywordSpotter=forbidden, PlaybackWorker=forbidden):
+            handler = speech_handler.SpeechHandler(headless=True)
+            if handler.warmup is not None:
+                handler.warmup.result(5)
+        self.assertIsNone(handler.player)
+        self.assertIsNone(handler.spotter)
+        self.assertEqual(handler.native_sr, handler.WHISPER_SR)
+        self.assertIsNone(handler.transcribe_array(np.zeros(1600, dtype=np.float32)))
+
+
+class _GatedASR:
+    """الـ warm-up (أول تحويل) بيفضل شغال لحد gate.set()"""
+
+    def __init__(self):
+        self.gate, self.calls = threading.Event(), 0
+
+    def transcribe(self, audio):
+        self.calls += 1
+        if self.calls == 1:
+            self.gate.wait(5)
+        return {"text": "", "segments": []}
+
+
+class TestWarmup(unittest.TestCase):
+    """أول طلب حقيقي ما بيفكش تشفير على الموديل والـ warm-up لسه شغال"""
+
+    def test_first_request_waits(self):
+        asr = _GatedASR()
+        with mock.patch.object(speech_handler, "load_backend", return_value=asr), \
+             mock.patch.object(speech_handler.CacheConfig, "ENABLED", False), \
+             mock.patch.object(speech_handler.WhisperConfig, "WARMUP", True):
+            handler = speech_handler.SpeechHandler(headless=True)
+        request = threading.Thread(target=handler.transcribe_array,
+                                   args=(np.zeros(1600, dtype=np.float32),))
+        request.start()
+        time.sleep(0.2)
+        self.assertEqual(asr.calls, 1)
+        asr.gate.set()
+        request.join(5)
+        self.assertEqual(asr.calls, 2)
+
+
+class _FakeService:
+    def __init__(self):
+        self.calls = []
+
+    def transcribe_array(self, audio):
+        self.calls.append(len(audio))
+        return "result"
+
+
+class TestRemoteHandler(unittest.TestCase):
+    """SpeechHandler(service=...) ما بيحملش Whisper - التحويل كله بيروح للخدمة"""
+
+    def test_delegates_to_service(self):
+        forbidden = mock.Mock(side_effect=AssertionError("الموديل مش المفروض يتحمل"))
+        service   = _FakeService()
+        with mock.patch.multiple(speech_handler, load_backend=forbidden, KeywordSpotter=forbidden,
+                                 SpeechSynthesizer=mock.Mock(), PlaybackWorker=mock.Mock()), \
+             mock.patch.object(speech_handler.DuplexConfig, "ENABLED", False), \
+             mock.patch.object(speech_handler.SpeechHandler, "_get_native_sr", return_value=48000):
+            handler = speech_handler.SpeechHandler(service=service)
+        self.assertIsNone(handler.asr)
+        self.assertIsNone(handler.warmup)
+        self.assertEqual(handler.transcribe_array(np.zeros(1600, dtype=np.float32)), "result")
+        chunks = [np.zeros(800, dtype=np.float32)] * 3
+        self.assertEqual(list(handler.stream_transcribe(chunks)), ["result"])   # مفيش جزئي
+        self.assertEqual(service.calls, [1600, 2400])
+
+
+class _StreamHandler:
+    """open_stream بس - كل جملة بترجع عدد العينات اللي وصلتها"""
+
+    def open_stream(self):
+        class _Session:
+            samples = 0
+
+            def feed(self, audio):
+                self.samples += len(audio)
+
+            def finish(self):
+                return mock.Mock(to_dict=lambda: {"samples": self.samples})
+
+        return _Session()
+
+
+class TestStreamSocket(unittest.TestCase):
+    """WS /v1/stream: chunk واحد فيه جملتين → نتيجتين نهائيتين"""
+
+    def test_chunk_spans_two_utterances(self):
+        from aiohttp.test_utils import TestClient, TestServer
+
+        t = np.arange(16000) / 16000
+        tone, silence = 0.3 * np.sin(2 * np.pi * 300 * t), np.zeros(16000)
+        audio = np.concatenate([silence[:4800], tone, silence, tone[:12800], silence])
+        pcm   = (audio * 32767).astype("<i2").tobytes()
+
+        async def _run():
+            async with TestClient(TestServer(create_app(_StreamHandler()))) as client:
+                ws = await client.ws_connect("/v1/stream")
+                await ws.send_bytes(pcm)
+                await ws.send_str('{"type": "end"}')
+                return [m.json() async for m in ws if m.type == web.WSMsgType.TEXT]
+
+        finals = [m["result"]["samples"] for m in asyncio.run(_run()) if m["type"] == "final"]
+        self.assertEqual(len(finals), 2)
+        self.assertGreaterEqual(finals[1], 12800)
+
+    def test_odd_frame_closes_with_error(self):
+        from aiohttp.test_utils import TestClient, TestServer
+
+        async def _run():
+            async with TestClient(TestServer(create_app(_StreamHandler()))) as client:
+                ws = await client.ws_connect("/v1/stream")
+                await ws.send_bytes(b"\0" * 3201)
+                msgs = [m.json() async for m in ws if m.type == web.WSMsgType.TEXT]
+                return msgs, ws.close_code
+
+        msgs, code = asyncio.run(_run())
+        self.assertEqual([m["type"] for m in msgs], ["error"])
+        self.assertEqual(code, 1003)
+
+
+class TestBadInput(unittest.TestCase):
+    """PCM مش سليم → 400 مش 500 بـ traceback"""
+
+    def test_rejected(self):
+        from aiohttp.test_utils import TestClient, TestServer
+
+        async def _run():
+            async with TestClient(TestServer(create_app(_SlowHandler()))) as client:
+                cases = [("", b"\0" * 3201), ("?format=float32", b"\0" * 6),
+                         ("?sample_rate=0", b"\0" * 3200), ("?sample_rate=-5", b"\0" * 3200)]
+                return [(await client.post("/v1/transcribe" + query, data=body)).status
+                        for query, body in cases]
+
+        self.assertEqual(asyncio.run(_run()), [400] * 4)
+
+
+class TestLoadFailure(unittest.TestCase):
+    """الموديل فشل يتحمل: الطلبات بترجع 503 و /v1/health بيقول ليه - مش 202 وتستنى للأبد"""
+
+    def test_submit_after_failed_load(self):
+        from aiohttp.test_utils import TestClient, TestServer
+
+        async def _run():
+            with mock.patch.object(speech_handler, "SpeechHandler",
+                                   side_effect=RuntimeError("weights missing")):
+                async with TestClient(TestServer(create_app())) as client:
+                    for _ in range(50):
+                        health = await (await client.get("/v1/health")).json()
+                        if health["error"]:
+                            break
+                        await asyncio.sleep(0.05)
+                    resp = await client.post("/v1/transcribe?mode=wait", data=b"\0\0" * 1600)
+                    return health, resp.status
+
+        health, status = asyncio.run(_run())
+        self.assertFalse(health["ready"])
+        self.assertIn("weights missing", health["error"])
+        self.assertEqual(status, 503)
+
+
+class TestServiceClient(unittest.TestCase):
+    """العميل على Unix socket: job_id على طول، والحالة فيها الترتيب والـ ETA"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sock  = os.path.join(tempfile.mkdtemp(), "speech.sock")
+        cls.loop  = asyncio.new_event_loop()
+        cls.ready = threading.Event()
+        threading.Thread(target=cls._serve, daemon=True).start()
+        cls.ready.wait(5)
+
+    @classmethod
+    def _serve(cls):
+        asyncio.set_event_loop(cls.loop)
+        cls.runner = web.AppRunner(create_app(_SlowHandler()))
+        cls.loop.run_until_complete(cls.runner.setup())
+        cls.loop.run_until_complete(web.UnixSite(cls.runner, cls.sock).start())
+        cls.ready.set()
+        cls.loop.run_forever()
+
+    @classmethod
+    def tearDownClass(cls):
+        asyncio.run_coroutine_threadsafe(cls.runner.cleanup(), cls.loop).result(5)
+        cls.loop.call_soon_threadsafe(cls.loop.stop)
+
+    def test_queue_status(self):
+        a, b  = SpeechServiceClient(self.sock, "a"), SpeechServiceClient(self.sock, "b")
+        audio = np.zeros(1600, dtype=np.float32)
+        self.assertTrue(a.available())
+
+        ids_a = [a.submit_array(audio) for _ in range(3)]
+        id_b  = b.submit_array(audio)
+        status = b.status(id_b)
+        self.assertEqual(status["status"], "queued")
+        self.assertLessEqual(status["position"], 1)       # بعد أول طلب من a بالكتير
+        self.assertGreater(status["eta"], 0)
+
+        self.assertIsNone(b.wait(id_b))                   # مفيش كلام → None
+        self.assertIn(a.status(ids_a[-1])["status"], ("queued", "running"))
+
+    def test_unavailable(self):
+        self.assertFalse(SpeechServiceClient(self.sock + ".missing").available())
+        client = SpeechServiceClient(self.sock)
+        for health in ({"ready": False, "error": None}, {"ready": False, "error": "weights missing"}):
+            with mock.patch.object(client, "health", return_value=health):
+                self.assertFalse(client.available())
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,51 @@
+import unittest
+import sys
+import os
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from streaming_decoder import StreamingTranscriber
+
+SR = 16000
+SCRIPT = "عندي ألم في صدري ومش قادر أتنفس".split()
+
+
+def fake_transcribe(audio):
+    """كلمة لكل نص ثانية - والكلمة الأخيرة بتتغير (زي Whisper قبل ما الكلمة تكمل)"""
+    n = min(len(SCRIPT), int(len(audio) / SR * 2))
+    words = SCRIPT[:n]
+    if words:
+        words = words[:-1] + [words[-1] + "؟"]
+    return {"text": " ".join(words),
+            "segments": [{"text": " ".join(words), "start": 0.0, "end": len(audio) / SR}]}
+
+
+class TestStreamingTranscriber(unittest.TestCase):
+    """اختبار التحويل الجزئي وتثبيت الكلمات"""
+
+    def test_partials_then_final(self):
+        dec = StreamingTranscriber(fake_transcribe, step=1.0, window=30.0)
+        partials = []
+        for _ in range(4):
+            out = dec.feed(np.zeros(SR, dtype=np.float32))
+            if out:
+                partials.append(out)
+        self.assertEqual(len(partials), 4)
+        # الجزء المتثبت بيكبر ومبيتغيرش
+        stable = [p["stable_text"] for p in partials]
+        for a, b in zip(stable, stable[1:]):
+            self.assertTrue(b.startswith(a))
+        self.assertNotIn("؟", partials[-1]["stable_text"])
+
+        final = dec.finish()
+        self.assertEqual(final["text"], final["stable_text"])
+        self.assertTrue(final["text"].startswith(partials[-1]["stable_text"]))
+
+    def test_no_audio(self):
+        dec = StreamingTranscriber(fake_transcribe)
+        self.assertIsNone(dec.finish())
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
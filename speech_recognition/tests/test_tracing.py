@@ -0,0 +1,118 @@
+import unittest
+import sys
+import os
+import contextvars
+import threading
+import time
+from importlib.util import find_spec
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tracing import (Histogram, Registry, Trace, activate, breakdown, commit, muted, span,
+                     time_module, trace)
+import tracing
+
+
+class TestHistogram(unittest.TestCase):
+    """الـ buckets ثابتة والـ quantile تقدير جوه الـ bucket الصح"""
+
+    def test_quantiles(self):
+        h = Histogram()
+        for ms in range(1, 101):                    # 1..100 ms
+            h.observe(ms * 1_000_000)
+        d = h.as_dict()
+        self.assertEqual(d["count"], 100)
+        self.assertAlmostEqual(d["mean_ms"], 50.5)
+        self.assertTrue(25 <= d["p50_ms"] <= 50, d)
+        self.assertTrue(50 <= d["p95_ms"] <= 100, d)
+        self.assertEqual(d["max_ms"], 100.0)
+
+    def test_prometheus(self):
+        reg = Registry()
+        reg.observe("nlp", 3_000_000)
+        reg.observe("nlp", 40_000_000)
+        text = reg.prometheus()
+        self.assertIn('smar_med_stage_seconds_bucket{stage="nlp",le="0.005"} 1', text)
+        self.assertIn('smar_med_stage_seconds_bucket{stage="nlp",le="+Inf"} 2', text)
+        self.assertIn('smar_med_stage_seconds_count{stage="nlp"} 2', text)
+
+
+class TestTrace(unittest.TestCase):
+    """الـ spans جوه الطلب بتتجمع بالاسم وبتتسجل مرة واحدة في الـ histogram"""
+
+    def setUp(self):
+        tracing.REGISTRY.reset()
+
+    def test_breakdown_and_registry(self):
+        with trace() as t:
+            for _ in range(3):
+                with span("whisper.decode"):
+                    time.sleep(0.002)
+            with span("nlp"):
+                pass
+            stages = dict(breakdown())
+        self.assertEqual(list(stages), ["whisper.decode", "nlp"])
+        self.assertGreaterEqual(stages["whisper.decode"], 6.0)
+        metrics = tracing.REGISTRY.as_dict()
+        self.assertEqual(metrics["whisper.decode"]["count"], 1)     # مرة للطلب مش لكل span
+        self.assertEqual(metrics["total"]["count"], 1)
+        self.assertEqual(breakdown(), ())
+
+    def test_threads(self):
+        """copy_context بيوصل الـ trace لـ thread تاني، و thread من غير context بيتسجل في الـ histogram على طول"""
+        with trace() as t:
+            ctx = contextvars.copy_context()
+            worker = threading.Thread(target=ctx.run, args=(self._work,))
+            worker.start()
+            worker.join()
+            other = threading.Thread(target=self._work)
+            other.start()
+            other.join()
+        self.assertIn("kws", t.stages)
+        self.assertEqual(tracing.REGISTRY.as_dict()["kws"]["count"], 2)
+
+    def test_muted(self):
+        """الـ warm-up: ولا span ولا hook بيتسجل"""
+        with muted():
+            with span("asr"):
+                pass
+        self.assertEqual(tracing.REGISTRY.as_dict(), {})
+
+    def test_activate_across_calls(self):
+        """جلسة streaming: كذا استدعاء (ومن threads مختلفة) = طلب واحد في الـ histogram"""
+        t = Trace()
+
+        def _call():
+            with activate(t):
+                self._work()
+
+        for _ in range(3):
+            worker = threading.Thread(target=_call)
+            worker.start()
+            worker.join()
+        self.assertEqual(tracing.REGISTRY.as_dict(), {})
+        commit(t)
+        metrics = tracing.REGISTRY.as_dict()
+        self.assertEqual(metrics["kws"]["count"], 1)
+        self.assertEqual(metrics["total"]["count"], 1)
+
+    @staticmethod
+    def _work():
+        with span("kws"):
+            pass
+
+    @unittest.skipUnless(find_spec("torch"), "torch مش متسطب")
+    def test_module_hooks(self):
+        import torch
+        layer = torch.nn.Linear(4, 4)
+        time_module(layer, "whisper.encode")
+        layer(torch.zeros(1, 4))                        # برا trace → مش بيتسجل
+        with trace() as t:
+            layer(torch.zeros(1, 4))
+            layer(torch.zeros(1, 4))
+        self.assertIn("whisper.encode", t.stages)
+        self.assertEqual(tracing.REGISTRY.as_dict()["whisper.encode"]["count"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,116 @@
+import unittest
+import sys
+import os
+import io
+import tempfile
+from functools import partial
+from unittest import mock
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import config
+from config import WhisperConfig
+from transcript_cache import TranscriptCache
+import speech_handler
+
+
+class TestTranscriptCache(unittest.TestCase):
+    """اختبار كاش نتايج التحويل"""
+
+    def setUp(self):
+        self.dir   = tempfile.TemporaryDirectory()
+        self.cache = TranscriptCache(os.path.join(self.dir.name, "cache.sqlite3"))
+        self.audio = np.random.default_rng(0).standard_normal(16000).astype(np.float32)
+
+    def tearDown(self):
+        self.cache.close()
+        self.dir.cleanup()
+
+    def test_round_trip(self):
+        key = self.cache.audio_key(self.audio)
+        self.assertIsNone(self.cache.get(key))
+        result = {"text": "عندي صداع", "segments": [{"start": 0.0, "end": np.float32(1.0)}]}
+        self.cache.put(key, result)
+        self.assertEqual(self.cache.get(key)["text"], "عندي صداع")
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_key_depends_on_audio_and_model(self):
+        key = self.cache.audio_key(self.audio)
+        self.assertEqual(key, self.cache.audio_key(self.audio.astype(np.float64)))
+        self.assertNotEqual(key, self.cache.audio_key(self.audio[:-1]))
+        old = WhisperConfig.MODEL_SIZE
+        try:
+            WhisperConfig.MODEL_SIZE = "tiny" if old != "tiny" else "base"
+            self.assertNotEqual(key, self.cache.audio_key(self.audio))
+        finally:
+            WhisperConfig.MODEL_SIZE = old
+
+    def test_file_key_keeps_position(self):
+        buf = io.BytesIO(b"RIFF" + bytes(100))
+        key = self.cache.file_key(buf)
+        self.assertEqual(buf.tell(), 0)
+        self.assertEqual(key, self.cache.file_key(io.BytesIO(b"RIFF" + bytes(100))))
+
+    def test_lru_eviction(self):
+        cache = TranscriptCache(os.path.join(self.dir.name, "small.sqlite3"), max_mb=0.001)      # ~1KB = نتيجتين بس
+        blob  = {"text": "x" * 500}
+        cache.put("a", blob)
+        cache.put("b", blob)
+        cache.get("a")                       # a بقى أحدث من b
+        cache.put("c", blob)
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertLessEqual(cache.stats()["bytes"], cache.max_bytes)
+        cache.put("c", {"text": "y"})        # الاستبدال بيحدث الحجم
+        self.assertEqual(cache.stats()["entries"], 2)
+        cache.close()
+
+
+class _CountingASR:
+    def __init__(self):
+        self.calls = 0
+
+    def transcribe(self, audio):
+        self.calls += 1
+        return {"text": "", "segments": []}
+
+
+class TestHandlerCache(unittest.TestCase):
+    """جمل الميكروفون مش بتتكاش - الملفات والـ buffers اللي بتتعاد بس"""
+
+    def test_live_arrays_bypass_cache(self):
+        asr = _CountingASR()
+        with tempfile.TemporaryDirectory() as d, \
+             mock.patch.object(speech_handler, "load_backend", return_value=asr), \
+             mock.patch.object(speech_handler, "TranscriptCache",
+                               partial(TranscriptCache, os.path.join(d, "cache.sqlite3"))), \
+             mock.patch.object(speech_handler.WhisperConfig, "WARMUP", False):
+            handler = speech_handler.SpeechHandler(headless=True)
+            audio   = np.random.default_rng(1).standard_normal(16000).astype(np.float32)
+            for _ in range(2):
+                handler.transcribe_array(audio)
+            self.assertEqual(handler.cache.stats()["entries"], 0)
+            for _ in range(2):
+                handler.transcribe_array(audio, cache=True)
+            self.assertEqual(handler.cache.stats()["entries"], 1)
+            self.assertEqual(asr.calls, 3)
+            handler.cache.close()
+
+    def test_paths_do_not_depend_on_cwd(self):
+        for path in (config.CacheConfig.PATH, config.TTSConfig.CACHE_DIR, WhisperConfig.WEIGHTS_DIR):
+            self.assertTrue(os.path.isabs(path), path)
+            self.assertTrue(path.startswith(config.DATA_DIR), path)
+        if "SMAR_MED_DATA_DIR" not in os.environ:        # الأوزان والكاش برة شجرة الكود
+            source = os.path.dirname(os.path.abspath(config.__file__))
+            self.assertFalse(config.DATA_DIR.startswith(source), config.DATA_DIR)
+
+    def test_creates_data_dir(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = TranscriptCache(os.path.join(tmp, "smar_med", "cache.sqlite3"))
+            self.assertEqual(cache.stats()["entries"], 0)
+            cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,76 @@
+import unittest
+import sys
+import os
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tts_engines import TTSEngine, SpeechSynthesizer
+
+
+class FakeEngine(TTSEngine):
+    """محرك وهمي بيكتب النص نفسه في الملف ويعد المرات"""
+
+    def __init__(self, name="fake", suffix=".wav", fail=False):
+        self.name, self.suffix, self.fail = name, suffix, fail
+        self.calls = []
+
+    def synthesize(self, text, language, slow, out_path):
+        self.calls.append(text)
+        if self.fail:
+            raise ConnectionError("مفيش نت")
+        with open(out_path, "wb") as f:
+            f.write(text.encode("utf-8") * 10)
+
+
+class TestSpeechSynthesizer(unittest.TestCase):
+    """اختبار كاش الجمل والتبديل بين المحركات"""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_cache_hit_skips_engine(self):
+        engine = FakeEngine()
+        synth  = SpeechSynthesizer([engine], cache_dir=self.dir.name)
+        first  = synth.render("سلامتك")
+        self.assertEqual(synth.render("سلامتك"), first)
+        self.assertEqual(engine.calls, ["سلامتك"])
+        # كاش جديد على نفس الفولدر (بعد restart) بيلاقي الملف من غير شبكة
+        offline = SpeechSynthesizer([], cache_dir=self.dir.name)
+        self.assertEqual(offline.render("سلامتك"), first)
+
+    def test_key_includes_language_and_slow(self):
+        engine = FakeEngine()
+        SpeechSynthesizer([engine], cache_dir=self.dir.name).render("سلامتك")
+        SpeechSynthesizer([engine], cache_dir=self.dir.name, slow=True).render("سلامتك")
+        self.assertEqual(len(engine.calls), 2)
+
+    def test_fallback_to_offline_engine(self):
+        online, offline = FakeEngine("online", ".mp3", fail=True), FakeEngine("offline")
+        synth = SpeechSynthesizer([online, offline], cache_dir=self.dir.name)
+        path  = synth.render("فهمت")
+        self.assertTrue(path.endswith(".wav"))
+        self.assertEqual(offline.calls, ["فهمت"])
+        self.assertEqual([n for n in os.listdir(self.dir.name) if n.startswith(".")], [])
+
+    def test_parts_and_prerender(self):
+        engine = FakeEngine()
+        synth  = SpeechSynthesizer([engine], cache_dir=self.dir.name)
+        synth.prerender(["سلامتك", "صداع", "و", "صداع"]).join()
+        self.assertEqual(len(synth.render_parts(["سلامتك", "صداع", "و", "حمى"])), 4)
+        self.assertEqual(engine.calls, ["سلامتك", "صداع", "و", "حمى"])
+
+    def test_eviction(self):
+        synth = SpeechSynthesizer([FakeEngine()], cache_dir=self.dir.name, max_mb=200 / 1024 / 1024)
+        for i in range(10):
+            synth.render(f"جملة رقم {i}")
+        total = sum(os.path.getsize(os.path.join(self.dir.name, n)) for n in os.listdir(self.dir.name))
+        self.assertLessEqual(total, 200)
+        self.assertIsNotNone(synth.cached("جملة رقم 9"))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,112 @@
+import unittest
+import sys
+import os
+import signal
+import threading
+import time
+import numpy as np
+from importlib.util import find_spec
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import config
+from worker_pool import ASRWorkerPool
+
+
+class FakeBackend:
+    """بيرجع pid العملية - وبيقع لو أول عينة = -1"""
+
+    def transcribe(self, audio):
+        if len(audio) and audio[0] == -1 and not os.path.exists(CRASH_MARK):
+            open(CRASH_MARK, "w").close()
+            os._exit(1)
+        return {"text": str(os.getpid()), "segments": [], "n": len(audio)}
+
+
+CRASH_MARK = os.path.join(os.path.dirname(__file__), ".pool_crash_mark")
+
+
+class TorchBackend:
+    """عملية torch حقيقية في الـ worker (matmul بيشغل الـ intra-op pool)"""
+
+    def __init__(self):
+        import torch
+        self.torch = torch
+
+    def transcribe(self, audio):
+        x = self.torch.from_numpy(audio).reshape(-1, 64)
+        return {"text": str(os.getpid()), "segments": [], "n": float((x @ x.T).sum())}
+
+
+class TestASRWorkerPool(unittest.TestCase):
+    """اختبار الـ workers والـ restart بعد الوقوع"""
+
+    def setUp(self):
+        self._interval = config.PoolConfig.HEALTH_INTERVAL
+        config.PoolConfig.HEALTH_INTERVAL = 0.1
+        if os.path.exists(CRASH_MARK):
+            os.remove(CRASH_MARK)
+        self.pool = ASRWorkerPool(FakeBackend, num_workers=2, threads_per_worker=1)
+
+    def tearDown(self):
+        self.pool.close()
+        config.PoolConfig.HEALTH_INTERVAL = self._interval
+        if os.path.exists(CRASH_MARK):
+            os.remove(CRASH_MARK)
+
+    def test_runs_in_worker_processes(self):
+        futures = [self.pool.submit(np.zeros(n, dtype=np.float32)) for n in range(1, 7)]
+        results = [f.result(timeout=10) for f in futures]
+        self.assertEqual([r["n"] for r in results], list(range(1, 7)))
+        self.assertNotIn(str(os.getpid()), {r["text"] for r in results})
+
+    def test_restart_and_retry_after_crash(self):
+        res = self.pool.submit(np.full(4, -1, dtype=np.float32)).result(timeout=10)
+        self.assertEqual(res["n"], 4)
+        self.assertEqual(self.pool.restarts, 1)
+        self.assertEqual(self.pool.health()["alive"], 2)
+
+
+@unittest.skipUnless(find_spec("torch"), "torch مش متسطب")
+class TestPoolAfterTorch(unittest.TestCase):
+    """الأم شغلت torch وفيها threads شغالة - الـ workers (والـ restart) ما يعلقوش"""
+
+    def test_workers_after_torch_op(self):
+        import torch
+        torch.set_num_threads(4)
+        a = torch.randn(512, 512)
+        (a @ a).sum().item()                            # الـ intra-op pool اشتغل في الأم
+
+        stop = threading.Event()
+
+        def _busy():
+            while not stop.is_set():
+                (a @ a).sum().item()
+
+        busy = threading.Thread(target=_busy, daemon=True)
+        busy.start()
+        interval = config.PoolConfig.HEALTH_INTERVAL
+        config.PoolConfig.HEALTH_INTERVAL = 0.1
+        pool = ASRWorkerPool(TorchBackend, num_workers=2, threads_per_worker=2)
+        try:
+            audio = np.ones(64 * 4, dtype=np.float32)
+            first = pool.submit(audio).result(timeout=60)
+            self.assertEqual(first["n"], 64.0 * 16)
+
+            os.kill(pool._procs[0].pid, signal.SIGKILL)      # الـ monitor يعمل worker جديد من thread
+            deadline = time.monotonic() + 30
+            while pool.restarts < 1 and time.monotonic() < deadline:
+                time.sleep(0.05)
+            self.assertEqual(pool.restarts, 1)
+            futures = [pool.submit(audio) for _ in range(4)]
+            self.assertTrue(all(f.result(timeout=60)["n"] == 64.0 * 16 for f in futures))
+            self.assertEqual(pool.health()["alive"], 2)
+        finally:
+            stop.set()
+            busy.join()
+            pool.close()
+            config.PoolConfig.HEALTH_INTERVAL = interval
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
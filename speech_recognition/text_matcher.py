@@ -0,0 +1,297 @@
+"""
+text_matcher.py - مطابقة كلمات كتير في مرور واحد
+=================================================
+بدل str.replace / "in" لكل كلمة في القاموس (التكلفة = حجم القاموس × طول النص):
+  - AhoCorasick:      automaton بيطلع كل التطابقات (حتى المتداخلة) في مرور واحد
+  - PhraseNormalizer: استبدال على مستوى الكلمات (tokens) مش الحروف
+                      مع توحيد الإملاء (أ/إ/آ، ة/ه، ى/ي، التشكيل، التطويل)
+  - FuzzyIndex:       تطابق تقريبي (edit distance محدود) عن طريق فهرس trigrams
+"""
+
+import re
+from collections import Counter, deque
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from config import MatchConfig
+
+
+# ─────────────────────────────────────────────
+# توحيد الإملاء
+# ─────────────────────────────────────────────
+_TASHKEEL = "\u064B-\u0652\u0670"
+
+FOLD_TABLE = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ة": "ه",
+    "ى": "ي",
+    "ـ": None,                                          # تطويل
+    **{chr(c): None for c in range(0x064B, 0x0653)},    # تشكيل
+    "\u0670": None,                                     # ألف خنجرية
+})
+
+_TOKEN = re.compile(rf"[\w{_TASHKEEL}]+")
+
+# سوابق بتلزق في أول الكلمة (و، ف، ب، ل، ال) - الأطول الأول
+CLITICS = ("وال", "فال", "بال", "لل", "ال", "و", "ف", "ب", "ل")
+
+
+def _peel(key: str) -> Iterator[Tuple[str, str]]:
+    """(السابقة، باقي الكلمة) لكل سابقة ممكنة - الباقي لازم حرفين على الأقل"""
+    for clitic in CLITICS:
+        if key.startswith(clitic) and len(key) - len(clitic) >= 2:
+            yield clitic, key[len(clitic):]
+
+
+def fold(text: str) -> str:
+    """الشكل الموحد للمقارنة فقط - النص الخارج بيفضل بإملائه الأصلي"""
+    return text.translate(FOLD_TABLE)
+
+
+# ─────────────────────────────────────────────
+# Aho–Corasick
+# ─────────────────────────────────────────────
+class AhoCorasick:
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: List[str] = []
+        self._goto:    List[Dict[str, int]] = [{}]
+        self._fail:    List[int] = [0]
+        self._out:     List[Tuple[int, ...]] = [()]
+
+        for pid, pattern in enumerate(patterns):
+            self.patterns.append(pattern)
+            if pattern:
+                self._insert(pattern, pid)
+        self._build()
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    # ── البناء ─────────────────────────────────
+    def _insert(self, pattern: str, pid: int):
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            node = nxt
+        self._out[node] += (pid,)
+
+    def _build(self):
+        """روابط الفشل بالـ BFS - وكل node بتورث تطابقات الـ suffix بتاعها"""
+        todo = deque(self._goto[0].values())
+        while todo:
+            node = todo.popleft()
+            for ch, nxt in self._goto[node].items():
+                todo.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] += self._out[self._fail[nxt]]
+
+    # ── البحث ──────────────────────────────────
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        """(بداية التطابق، رقم العبارة) لكل تطابق - بترتيب نهايته في النص"""
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self.patterns
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for pid in out[node]:
+                yield i + 1 - len(patterns[pid]), pid
+
+    def hits(self, text: str) -> set:
+        """أرقام العبارات اللي ظهرت في النص (زي pattern in text لكل عبارة)"""
+        return {pid for _, pid in self.iter_matches(text)}
+
+
+# ─────────────────────────────────────────────
+# استبدال العبارات على مستوى الكلمات
+# ─────────────────────────────────────────────
+class PhraseNormalizer:
+    """
+    القاموس بيتخزن كـ dict مفتاحه tuple من الكلمات الموحدة (n-gram)
+    + مجموعة البادئات علشان البحث يقف أول ما العبارة تبطل تكمل (trie بالـ hash)
+      - مرور واحد على كلمات النص، العبارة الأطول بتكسب
+      - ما فيش استبدال جوه كلمة ("خد" مش هتلمس "أخدت")
+      - الناتج مش بيتعالج تاني ("ضغط" → "ضغط الدم" مرة واحدة بس)
+      - السوابق (و، ف، ب، ل، ال) بتتشال لو الكلمة من غيرها في القاموس
+    """
+
+    def __init__(self, phrases: Dict[str, str]):
+        self._table:    Dict[Tuple[str, ...], str] = {}
+        self._prefixes: set = set()
+        for phrase, replacement in phrases.items():
+            key = tuple(fold(t) for t in _TOKEN.findall(phrase))
+            if not key or key in self._table:
+                continue                    # أول تعريف في القاموس هو اللي بيكسب
+            self._table[key] = replacement
+            for n in range(1, len(key)):
+                self._prefixes.add(key[:n])
+        self.max_len = max(map(len, self._table), default=0)
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def _match(self, keys: List[str], glued: List[bool], i: int,
+               first: Optional[str] = None) -> Optional[Tuple[int, str]]:
+        """أطول عبارة بتبدأ عند الكلمة i → (عدد الكلمات، البديل)"""
+        best, key = None, ()
+        for n in range(min(self.max_len, len(keys) - i)):
+            if n and not glued[i + n]:
+                break                       # علامة ترقيم بين الكلمتين
+            key += (first if n == 0 and first is not None else keys[i + n],)
+            replacement = self._table.get(key)
+            if replacement is not None:
+                best = (n + 1, replacement)
+            if key not in self._prefixes:
+                break
+        return best
+
+    def normalize(self, text: str) -> str:
+        spans = [m.span() for m in _TOKEN.finditer(text)]
+        if not spans:
+            return text
+        keys  = [text[s:e].translate(FOLD_TABLE) for s, e in spans]
+        glued = [True] + [text[spans[k - 1][1]:spans[k][0]].isspace() for k in range(1, len(spans))]
+
+        out, pos, i = [], 0, 0
+        while i < len(spans):
+            prefix, hit = "", self._match(keys, glued, i)
+            if hit is None:
+                for clitic, rest in _peel(keys[i]):
+                    hit = self._match(keys, glued, i, rest)
+                    if hit is not None:
+                        prefix = text[spans[i][0]:spans[i][0] + len(clitic)]
+                        break
+            if hit is None:
+                i += 1
+                continue
+            n, replacement = hit
+            out.append(text[pos:spans[i][0]])
+            out.append(prefix + replacement)
+            pos = spans[i + n - 1][1]
+            i  += n
+        out.append(text[pos:])
+        return "".join(out)
+
+
+# ─────────────────────────────────────────────
+# تطابق تقريبي
+# ─────────────────────────────────────────────
+def _trigrams(key: str) -> set:
+    padded = f"#{key}#"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def bounded_edit_distance(a: str, b: str, k: int) -> Optional[int]:
+    """Levenshtein - بيرجع None أول ما المسافة تعدي k (من غير ما يكمل الجدول)"""
+    if abs(len(a) - len(b)) > k:
+        return None
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if min(cur) > k:
+            return None
+        prev = cur
+    return prev[-1] if prev[-1] <= k else None
+
+
+class FuzzyIndex:
+    """
+    فهرس مقلوب: trigram → أرقام العبارات اللي فيها (بيتبني مرة واحدة)
+      - المرشحين = العبارات اللي بتشارك الكلمة trigrams كفاية
+        (كل تعديل بيبوظ 3 trigrams بالكتير، فاللي أقل من كده مستحيل يطابق)
+      - edit distance بيتحسب للمرشحين بس، ومحدود بـ k
+        (k = طول العبارة / chars_per_edit، وتعديل واحد على الأقل من min_length حرف)
+      - الكلمات اللي في exclude (كلمات عادية قريبة من عبارة) ما بتدخلش التقريبي خالص
+    الدرجة = 1 - المسافة / طول الأطول
+    """
+
+    def __init__(self, terms: Iterable[str],
+                 max_distance:   int   = MatchConfig.MAX_EDIT_DISTANCE,
+                 chars_per_edit: int   = MatchConfig.CHARS_PER_EDIT,
+                 min_score:      float = MatchConfig.MIN_SCORE,
+                 min_length:     int   = MatchConfig.MIN_LENGTH,
+                 exclude:        Iterable[str] = MatchConfig.EXCLUDE):
+        self.terms      = list(terms)
+        self.min_score  = min_score
+        self.min_length = min_length
+        self._exclude   = {fold(w) for w in exclude}
+        self._keys      = [" ".join(fold(t) for t in _TOKEN.findall(term)) for term in self.terms]
+        self._grams     = [_trigrams(key) for key in self._keys]
+        self._budget    = [max(1, min(max_distance, len(key) // chars_per_edit))
+                           if len(key) >= min_length else 0 for key in self._keys]
+        self._index: Dict[str, List[int]] = {}
+        for tid, grams in enumerate(self._grams):
+            for g in grams:
+                self._index.setdefault(g, []).append(tid)
+        self.max_words = max((key.count(" ") + 1 for key in self._keys if key), default=0)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def _lookup(self, key: str) -> Iterator[Tuple[int, float]]:
+        short  = len(key) < self.min_length        # "دوا" حرفي بس حتى قدام "دوار"
+        shared = Counter()
+        for g in _trigrams(key):
+            shared.update(self._index.get(g, ()))
+        for tid, n in shared.items():
+            k = 0 if short else self._budget[tid]
+            if n < len(self._grams[tid]) - 3 * k:
+                continue
+            dist = bounded_edit_distance(key, self._keys[tid], k)
+            if dist is None:
+                continue
+            score = 1.0 - dist / max(len(key), len(self._keys[tid]))
+            if score >= self.min_score:
+                yield tid, score
+
+    def lookup(self, query: str) -> List[Tuple[int, float]]:
+        """(رقم العبارة، الدرجة) لكل عبارة قريبة من query - الأعلى الأول"""
+        key = " ".join(fold(t) for t in _TOKEN.findall(query))
+        if self._excluded(key):
+            return []
+        return sorted(self._lookup(key), key=lambda m: -m[1])
+
+    def _excluded(self, token: str) -> bool:
+        return token in self._exclude or any(rest in self._exclude for _, rest in _peel(token))
+
+    def search(self, text: str, skip: Sequence[Tuple[int, int]] = ()) -> Dict[int, float]:
+        """
+        أعلى درجة لكل عبارة ظهرت تقريبيًا في النص (نوافذ من 1 لـ max_words كلمة)
+        skip: مديات حروف (بداية، نهاية) متطابقة بالفعل - الكلمات اللي فيها مش بتدخل
+        """
+        covered = bytearray(len(text))
+        for start, end in skip:
+            covered[start:end] = b"\x01" * (end - start)
+        runs, run = [], []
+        for m in _TOKEN.finditer(text):
+            if any(covered[m.start():m.end()]) or self._excluded(fold(m.group())):
+                if run:
+                    runs.append(run)
+                run = []
+            else:
+                run.append(fold(m.group()))
+        if run:
+            runs.append(run)
+
+        best: Dict[int, float] = {}
+        for tokens in runs:
+            for i in range(len(tokens)):
+                firsts = [tokens[i]] + [rest for _, rest in _peel(tokens[i])]
+                for n in range(1, min(self.max_words, len(tokens) - i) + 1):
+                    tail = tokens[i + 1:i + n]
+                    for first in firsts:
+                        for tid, score in self._lookup(" ".join([first, *tail])):
+                            if score > best.get(tid, 0.0):
+                                best[tid] = score
+        return best
@@ -0,0 +1,243 @@
+"""
+tracing.py - زمن كل مرحلة في الـ pipeline (spans + histograms)
+================================================================
+processing_time لوحده ما بيقولش الـ p95 راح فين - هنا كل مرحلة ليها span:
+  - span("resample"): perf_counter_ns حوالين المرحلة (context manager أو decorator)
+  - trace(): طلب واحد (contextvars - كل طلب/thread ليه trace بتاعه)
+      الـ spans جوه الـ trace بتتجمع بالاسم (الـ decoder بيتنادى مرة لكل token)
+      وفي الآخر كل مرحلة بتتسجل مرة واحدة في الـ histogram بتاعها + "total"
+      → SpeechResult.stages = تفصيل الطلب ده
+  - span برا أي trace (TTS، التشغيل) بيتسجل في الـ histogram على طول
+  - activate(t) / commit(t): trace واحد على كذا استدعاء أو thread (جلسة streaming، batch)
+  - muted(): ولا حاجة بتتسجل (الـ warm-up)
+  - REGISTRY.as_dict() / REGISTRY.prometheus(): للـ /v1/metrics في speech_api
+
+أسماء المراحل: capture, level_check, resample, preprocess, wav_io, decode (غير wav), cache,
+asr (المحرك كله) ⊃ whisper.encode, whisper.decode (أو whisper.features مع faster-whisper),
+hallucination_filter, nlp, kws ⊃ kws.encode, kws.decode, tts.synthesize, playback,
+service.queue (الانتظار في طابور speech_api)
+"""
+
+import bisect
+import contextvars
+import threading
+from contextlib import contextmanager
+from time import perf_counter_ns
+from typing import Dict, Iterator, Optional, Tuple
+
+# حدود الـ buckets (ms) - من أجزاء الـ ms (resample) لحد عشرات الثواني (Whisper على CPU)
+BUCKETS_MS = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+# ─────────────────────────────────────────────
+# Histogram
+# ─────────────────────────────────────────────
+class Histogram:
+    """buckets ثابتة (زي Prometheus) - الذاكرة ثابتة مهما كان عدد الطلبات"""
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS_MS):
+        self.bounds  = tuple(b * 1_000_000 for b in buckets)     # ns
+        self.counts  = [0] * (len(self.bounds) + 1)              # الأخير = +Inf
+        self.count   = 0
+        self.sum_ns  = 0
+        self.max_ns  = 0
+        self._lock   = threading.Lock()
+
+    def observe(self, ns: int):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, ns)] += 1
+            self.count  += 1
+            self.sum_ns += ns
+            self.max_ns  = max(self.max_ns, ns)
+
+    def quantile(self, q: float) -> float:
+        """تقدير بالـ interpolation جوه الـ bucket (زي histogram_quantile) - بالـ ms"""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = q * self.count
+            seen = 0
+            for i, c in enumerate(self.counts):
+                if seen + c >= rank and c:
+                    lo = self.bounds[i - 1] if i else 0.0
+                    hi = self.bounds[i] if i < len(self.bounds) else self.max_ns
+                    return min(lo + (hi - lo) * (rank - seen) / c, self.max_ns) / 1e6
+                seen += c
+            return self.max_ns / 1e6
+
+    def as_dict(self) -> dict:
+        return {
+            "count":   self.count,
+            "mean_ms": round(self.sum_ns / self.count / 1e6, 2) if self.count else 0.0,
+            "p50_ms":  round(self.quantile(0.50), 2),
+            "p95_ms":  round(self.quantile(0.95), 2),
+            "max_ms":  round(self.max_ns / 1e6, 2),
+        }
+
+
+class Registry:
+    """histogram لكل مرحلة - واحد للعملية كلها (REGISTRY)"""
+
+    def __init__(self):
+        self._hists: Dict[str, Histogram] = {}
+        self._lock  = threading.Lock()
+
+    def histogram(self, name: str) -> Histogram:
+        hist = self._hists.get(name)
+        if hist is None:
+            with self._lock:
+                hist = self._hists.setdefault(name, Histogram())
+        return hist
+
+    def observe(self, name: str, ns: int):
+        self.histogram(name).observe(ns)
+
+    def reset(self):
+        with self._lock:
+            self._hists.clear()
+
+    def as_dict(self) -> dict:
+        return {name: h.as_dict() for name, h in sorted(self._hists.items())}
+
+    def prometheus(self, metric: str = "smar_med_stage_seconds") -> str:
+        """Prometheus text format (histogram بالثواني، label اسمه stage)"""
+        lines = [f"# HELP {metric} Latency of each speech pipeline stage.",
+                 f"# TYPE {metric} histogram"]
+        for name, h in sorted(self._hists.items()):
+            with h._lock:
+                counts, total, count = list(h.counts), h.sum_ns, h.count
+            cumulative = 0
+            for bound, c in zip((*h.bounds, None), counts):
+                cumulative += c
+                le = "+Inf" if bound is None else f"{bound / 1e9:g}"
+                lines.append(f'{metric}_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{stage="{name}"}} {total / 1e9:.6f}')
+            lines.append(f'{metric}_count{{stage="{name}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# ─────────────────────────────────────────────
+# Trace (طلب واحد)
+# ─────────────────────────────────────────────
+class Trace:
+    """مجموع كل مرحلة في الطلب ده (ns) بترتيب أول ظهور"""
+
+    def __init__(self):
+        self.start  = perf_counter_ns()
+        self.stages: Dict[str, int] = {}
+        self._lock  = threading.Lock()      # KWS والتحويل الكامل بيشتغلوا بالتوازي
+
+    def add(self, name: str, ns: int):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0) + ns
+
+    def merge(self, other: "Trace"):
+        """مراحل trace تاني (batch اتحول في thread تاني) بتتضاف للطلب ده"""
+        with other._lock:
+            stages = list(other.stages.items())
+        for name, ns in stages:
+            self.add(name, ns)
+
+    def breakdown(self) -> Tuple[Tuple[str, float], ...]:
+        """((المرحلة، ms), ...) - الشكل اللي بيتخزن في SpeechResult.stages"""
+        with self._lock:
+            return tuple((name, round(ns / 1e6, 2)) for name, ns in self.stages.items())
+
+
+_current: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("trace", default=None)
+
+
+def current() -> Optional[Trace]:
+    return _current.get()
+
+
+def breakdown() -> Tuple[Tuple[str, float], ...]:
+    """تفصيل الـ trace الحالي لحد دلوقتي - () لو مفيش"""
+    t = _current.get()
+    return t.breakdown() if t is not None else ()
+
+
+@contextmanager
+def trace(registry: Registry = REGISTRY) -> Iterator[Trace]:
+    """
+    طلب جديد: الـ spans جواه بتتجمع، وعند الخروج كل مرحلة بتتسجل مرة في الـ histogram
+    trace جوه trace بيستخدم نفس الخارجي (مثلاً transcribe_array جوه listen_and_process)
+    """
+    outer = _current.get()
+    if outer is not None:
+        yield outer
+        return
+    t = Trace()
+    try:
+        with activate(t):
+            yield t
+    finally:
+        commit(t, registry)
+
+
+@contextmanager
+def activate(t: Trace) -> Iterator[Trace]:
+    """trace موجود بيبقى الحالي هنا - من غير ما يتسجل في الآخر (commit بيسجله)"""
+    token = _current.set(t)
+    try:
+        yield t
+    finally:
+        _current.reset(token)
+
+
+def commit(t: Trace, registry: Registry = REGISTRY):
+    """كل مرحلة في الـ trace مرة واحدة في الـ histogram بتاعها + الـ total"""
+    with t._lock:
+        stages = list(t.stages.items())
+    for name, ns in stages:
+        registry.observe(name, ns)
+    registry.observe("total", perf_counter_ns() - t.start)
+
+
+@contextmanager
+def muted() -> Iterator[None]:
+    """الـ spans جواها بتروح لـ trace بيترمي (الـ warm-up مش طلب - ما يبوظش الـ p95)"""
+    with activate(Trace()):
+        yield
+
+
+def record(name: str, ns: int, registry: Registry = REGISTRY):
+    t = _current.get()
+    if t is not None:
+        t.add(name, ns)
+    else:
+        registry.observe(name, ns)
+
+
+@contextmanager
+def span(name: str):
+    """زمن المرحلة (ينفع decorator كمان: @span("level_check"))"""
+    start = perf_counter_ns()
+    try:
+        yield
+    finally:
+        record(name, perf_counter_ns() - start)
+
+
+def time_module(module, name: str):
+    """
+    forward hooks على torch module (encoder / decoder بتوع Whisper):
+    transcribe بتنادي الاتنين جواها فمفيش مكان نحط فيه span من برا
+    بيتسجل جوه trace بس - الـ decoder بيتنادى مرة لكل token، ولوحده كان هيملا
+    الـ histogram بزمن الـ token مش زمن الطلب
+    """
+    local = threading.local()
+
+    def _pre(mod, args):
+        local.start = perf_counter_ns()
+
+    def _post(mod, args, output):
+        t = _current.get()
+        if t is not None:
+            t.add(name, perf_counter_ns() - local.start)
+
+    module.register_forward_pre_hook(_pre)
+    module.register_forward_hook(_post)
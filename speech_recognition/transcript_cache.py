@@ -0,0 +1,140 @@
+"""
+transcript_cache.py - كاش نتايج التحويل على الديسك (SQLite)
+============================================================
+نفس الملف أو نفس التسجيل من الأرشيف ما يعديش على Whisper تاني:
+  - المفتاح = sha256 للصوت بعد فكه (float32 بـ 16kHz) + إعدادات WhisperConfig
+    اللي بتأثر على النتيجة (المحرك، الموديل، اللغة، الـ prompt، ...)
+    فتغيير الموديل أو الإعدادات = مفاتيح جديدة من غير ما نمسح حاجة
+  - اختصار للملفات: hash بايتات الملف نفسه → من غير فك m4a/mp3 خالص
+  - الحجم محدود بـ CacheConfig.MAX_MB - الأقدم استخدامًا بيتمسح الأول (LRU)
+  - ملف SQLite واحد (WAL) متشارك بين الواجهة والـ API وأي job مراجعة
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import BinaryIO, Optional, Union
+
+import numpy as np
+
+from config import CacheConfig, WhisperConfig
+
+logger = logging.getLogger("SMAR_MED_VOICE")
+
+# الإعدادات اللي بتغير ناتج التحويل - أي تغيير فيها بيبطل الكاش القديم تلقائيًا
+_DECODE_PARAMS = ("BACKEND", "MODEL_SIZE", "COMPUTE_TYPE", "BEAM_SIZE", "LANGUAGE", "TEMPERATURE",
+                  "NO_SPEECH_THRESHOLD", "CONDITION_ON_PREV", "INITIAL_PROMPT")
+
+
+def _fingerprint() -> bytes:
+    params = {name: getattr(WhisperConfig, name) for name in _DECODE_PARAMS}
+    return json.dumps(params, sort_keys=True, ensure_ascii=False).encode()
+
+
+class TranscriptCache:
+
+    def __init__(self, path: str = CacheConfig.PATH, max_mb: float = CacheConfig.MAX_MB):
+        self.path      = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock     = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)   # DATA_DIR أول مرة
+        self._db       = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA recursive_triggers=ON")     # REPLACE يشغل trigger المسح
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS transcripts (
+                key       TEXT PRIMARY KEY,
+                result    BLOB NOT NULL,
+                size      INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_last_used ON transcripts(last_used);
+
+            -- الحجم الكلي بيتحدث مع كل إضافة/مسح (من غير SUM على الجدول كله)
+            CREATE TABLE IF NOT EXISTS usage (id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER NOT NULL);
+            INSERT OR IGNORE INTO usage VALUES (0, 0);
+            CREATE TRIGGER IF NOT EXISTS usage_add AFTER INSERT ON transcripts
+                BEGIN UPDATE usage SET total = total + NEW.size; END;
+            CREATE TRIGGER IF NOT EXISTS usage_sub AFTER DELETE ON transcripts
+                BEGIN UPDATE usage SET total = total - OLD.size; END;
+        """)
+        self.hits = self.misses = 0
+
+    # ── المفاتيح ───────────────────────────────
+    @staticmethod
+    def audio_key(audio: np.ndarray) -> str:
+        """hash الصوت المفكوك (float32 بـ 16kHz) + إعدادات الموديل"""
+        h = hashlib.sha256(_fingerprint())
+        h.update(b"pcm")
+        h.update(np.ascontiguousarray(audio, dtype=np.float32).data)
+        return h.hexdigest()
+
+    @staticmethod
+    def file_key(file: Union[str, BinaryIO]) -> str:
+        """hash بايتات الملف + إعدادات الموديل - file-like بيرجع لمكانه بعد القراية"""
+        h = hashlib.sha256(_fingerprint())
+        h.update(b"file")
+        if isinstance(file, str):
+            with open(file, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    h.update(block)
+        else:
+            pos = file.tell()
+            for block in iter(lambda: file.read(1 << 20), b""):
+                h.update(block)
+            file.seek(pos)
+        return h.hexdigest()
+
+    # ── القراية والكتابة ───────────────────────
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute("SELECT result FROM transcripts WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE transcripts SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, result: dict):
+        blob = json.dumps(result, ensure_ascii=False, default=float).encode()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO transcripts (key, result, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, blob, len(blob), time.time()))
+            self._evict()
+
+    def _evict(self):
+        """مسح الأقدم استخدامًا لحد ما الحجم يرجع تحت الحد"""
+        total = self._db.execute("SELECT total FROM usage").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        freed, doomed = 0, []
+        for key, size in self._db.execute("SELECT key, size FROM transcripts ORDER BY last_used"):
+            if total - freed <= self.max_bytes:
+                break
+            doomed.append((key,))
+            freed += size
+        self._db.executemany("DELETE FROM transcripts WHERE key = ?", doomed)
+        logger.info(f"Transcript cache: مسح {len(doomed)} نتيجة ({freed / 1024:.0f} KB)")
+
+    # ── معلومات ────────────────────────────────
+    def stats(self) -> dict:
+        with self._lock:
+            count = self._db.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+            size  = self._db.execute("SELECT total FROM usage").fetchone()[0]
+        return {"entries": count, "bytes": size, "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM transcripts")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,225 @@
+"""
+tts_engines.py - تحويل النص لكلام مع كاش للجمل على الديسك
+==========================================================
+بدل gTTS + ملف mp3 جديد ويتمسح مع كل رد:
+  - محركات قابلة للتبديل (TTSConfig.ENGINES بالترتيب):
+      "gtts":    جوجل (أونلاين - أحسن جودة)
+      "pyttsx3": espeak / SAPI / NSSpeech (أوفلاين - شغال من غير نت)
+  - كل جملة بتتولد مرة واحدة وتتحفظ في TTSConfig.CACHE_DIR
+    المفتاح = (النص، اللغة، slow) → الرد التاني بيشتغل في ملي ثواني
+  - الجمل الثابتة بتتولد في الخلفية أول ما النظام يقوم (prerender)
+  - الجمل المتغيرة (الأعراض، الأرقام) بتتركب من أجزاء متخزنة (render_parts)
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from typing import Iterable, List, Optional, Sequence
+
+from config import TTSConfig
+
+try:
+    from gtts import gTTS
+    GTTS_AVAILABLE = True
+except ImportError:
+    GTTS_AVAILABLE = False
+
+try:
+    import pyttsx3
+    PYTTSX3_AVAILABLE = True
+except ImportError:
+    PYTTSX3_AVAILABLE = False
+
+logger = logging.getLogger("SMAR_MED_VOICE")
+
+
+# ─────────────────────────────────────────────
+# المحركات
+# ─────────────────────────────────────────────
+class TTSEngine:
+    """كل محرك بيكتب الجملة في ملف بامتداد suffix"""
+
+    name   = "base"
+    suffix = ".wav"
+
+    def synthesize(self, text: str, language: str, slow: bool, out_path: str):
+        raise NotImplementedError
+
+
+class GTTSEngine(TTSEngine):
+
+    name   = "gtts"
+    suffix = ".mp3"
+
+    def __init__(self):
+        if not GTTS_AVAILABLE:
+            raise ImportError("gTTS مش متسطب: pip install gtts")
+
+    def synthesize(self, text: str, language: str, slow: bool, out_path: str):
+        gTTS(text=text, lang=language, slow=slow).save(out_path)
+
+
+class Pyttsx3Engine(TTSEngine):
+
+    name   = "pyttsx3"
+    suffix = ".wav"
+
+    def __init__(self):
+        if not PYTTSX3_AVAILABLE:
+            raise ImportError("pyttsx3 مش متسطب: pip install pyttsx3")
+        self._engine = pyttsx3.init()
+        self._lock   = threading.Lock()      # الـ driver مش thread-safe
+        self._voices = self._engine.getProperty("voices") or []
+
+    def _voice_for(self, language: str) -> Optional[str]:
+        for v in self._voices:
+            langs = [l.decode(errors="ignore") if isinstance(l, bytes) else str(l)
+                     for l in (getattr(v, "languages", None) or [])]
+            if any(language in l for l in langs) or language in (v.id or "").lower():
+                return v.id
+        return None
+
+    def synthesize(self, text: str, language: str, slow: bool, out_path: str):
+        with self._lock:
+            voice = self._voice_for(language)
+            if voice:
+                self._engine.setProperty("voice", voice)
+            rate = TTSConfig.OFFLINE_RATE * (0.7 if slow else 1.0)
+            self._engine.setProperty("rate", int(rate))
+            self._engine.save_to_file(text, out_path)
+            self._engine.runAndWait()
+        if not os.path.exists(out_path) or os.path.getsize(out_path) == 0:
+            raise RuntimeError("pyttsx3 ما طلعش صوت")
+
+
+ENGINES = {
+    GTTSEngine.name:    GTTSEngine,
+    Pyttsx3Engine.name: Pyttsx3Engine,
+}
+
+
+def load_engines(names: Sequence[str] = TTSConfig.ENGINES) -> List[TTSEngine]:
+    """المحركات المتاحة بالترتيب - اللي مش متسطب بيتخطى"""
+    engines = []
+    for name in names:
+        if name not in ENGINES:
+            raise ValueError(f"محرك TTS غير معروف: '{name}' - المتاح: {list(ENGINES)}")
+        try:
+            engines.append(ENGINES[name]())
+        except Exception as e:
+            logger.warning(f"TTS [{name}] مش متاح: {e}")
+    return engines
+
+
+# ─────────────────────────────────────────────
+# الكاش والتجميع
+# ─────────────────────────────────────────────
+class SpeechSynthesizer:
+
+    def __init__(self, engines: Optional[List[TTSEngine]] = None,
+                 cache_dir: str = TTSConfig.CACHE_DIR,
+                 language: str = TTSConfig.LANGUAGE,
+                 slow: bool = TTSConfig.SLOW,
+                 max_mb: float = TTSConfig.CACHE_MAX_MB):
+        self.engines   = load_engines() if engines is None else engines
+        self.cache_dir = cache_dir
+        self.language  = language
+        self.slow      = slow
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._suffixes = sorted({e.suffix for e in self.engines} | {".mp3", ".wav"})
+        self._locks    = {}
+        self._guard    = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        if not self.engines:
+            logger.warning("مفيش محرك TTS متاح - الرد الصوتي من الكاش بس")
+
+    # ── الكاش ──────────────────────────────────
+    def _key(self, text: str) -> str:
+        raw = f"{self.language}|{int(self.slow)}|{text}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def cached(self, text: str) -> Optional[str]:
+        """مسار الجملة لو اتولدت قبل كده (بأي محرك)"""
+        key = self._key(text.strip())
+        for suffix in self._suffixes:
+            path = os.path.join(self.cache_dir, key + suffix)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _lock_for(self, key: str) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    # ── التوليد ────────────────────────────────
+    def render(self, text: str) -> Optional[str]:
+        """مسار ملف الجملة - من الكاش أو بيتولد ويتحفظ (None لو كل المحركات فشلت)"""
+        text = text.strip()
+        if not text:
+            return None
+        path = self.cached(text)
+        if path is not None:
+            os.utime(path)                     # آخر استخدام - للـ LRU
+            return path
+
+        key = self._key(text)
+        with self._lock_for(key):              # نفس الجملة من threadين = توليد واحد
+            path = self.cached(text)
+            if path is not None:
+                return path
+            for engine in self.engines:
+                path = os.path.join(self.cache_dir, key + engine.suffix)
+                fd, tmp = tempfile.mkstemp(prefix=".tmp-", suffix=engine.suffix, dir=self.cache_dir)
+                os.close(fd)
+                try:
+                    engine.synthesize(text, self.language, self.slow, tmp)
+                    os.replace(tmp, path)      # الملف بيظهر كامل أو ما يظهرش
+                    self._evict()
+                    return path
+                except Exception as e:
+                    logger.warning(f"TTS [{engine.name}] فشل: {e}")
+                finally:
+                    if os.path.exists(tmp):
+                        os.remove(tmp)
+        logger.error(f"TTS: مفيش محرك قدر يولد '{text[:40]}'")
+        return None
+
+    def render_parts(self, parts: Iterable[str]) -> List[str]:
+        """جملة متغيرة من أجزاء - كل جزء بيتخزن لوحده فبيتعاد مع أي تركيبة"""
+        paths = [self.render(p) for p in parts]
+        return [p for p in paths if p is not None]
+
+    def prerender(self, phrases: Iterable[str]) -> threading.Thread:
+        """توليد الجمل الثابتة في الخلفية (أول تشغيل بس - بعد كده كلها في الكاش)"""
+        missing = [p for p in dict.fromkeys(phrases) if p.strip() and self.cached(p) is None]
+
+        def _run():
+            for phrase in missing:
+                self.render(phrase)
+            if missing:
+                logger.info(f"TTS: اتولد {len(missing)} جملة في الكاش")
+
+        thread = threading.Thread(target=_run, name="tts-prerender", daemon=True)
+        thread.start()
+        return thread
+
+    def _evict(self):
+        """مسح الأقدم استخدامًا لحد ما الكاش يرجع تحت CACHE_MAX_MB"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith(".") or os.path.splitext(name)[1] not in self._suffixes:
+                continue                       # ملفات لسه بتتكتب
+            st = os.stat(path)
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
@@ -1,69 +1,64 @@
-from gtts import gTTS
-from playsound import playsound
-import os
-import tempfile
 import time
 
+from tts_engines import SpeechSynthesizer
+from playback import PlaybackWorker, PlaybackHandle, Priority
+
+GREETING = "مرحباً! أنا روبوت سمار ميد. كيف يمكنني مساعدتك اليوم؟"
+
+ALERTS = {
+    "high_temp": "تحذير! درجة الحرارة مرتفعة. سأخبر الطبيب فوراً.",
+    "low_spo2": "تحذير! نسبة الأكسجين منخفضة. هذا مهم جداً.",
+    "high_heartrate": "نبضك سريع جداً. سأستدعي الطبيب.",
+}
+DEFAULT_ALERT = "تنبيه طبي مهم!"
+
+# أجزاء جملة المؤشرات - الأرقام بس اللي بتتغير
+VITALS_PARTS = ("نبضك", "نبضة في الدقيقة،", "درجة حرارتك", "درجة،", "نسبة الأكسجين", "بالمئة.")
+
+
 class TextToSpeechHandler:
     """
     نظام تحويل النص لكلام
+    الجمل الثابتة (الترحيب والتنبيهات) بتتولد مرة واحدة وتتشغل من الكاش
+    speak بترجع على طول بـ PlaybackHandle - handle.wait() لو محتاج تستنى الصوت يخلص
     """
     
     def __init__(self, language="ar", slow=False):
         self.language = language
         self.slow = slow
-        self.temp_dir = tempfile.gettempdir()
+        self.synth = SpeechSynthesizer(language=language, slow=slow)
+        self.synth.prerender([GREETING, *ALERTS.values(), DEFAULT_ALERT, *VITALS_PARTS])
+        self.player = PlaybackWorker(self.synth)
     
-    def speak(self, text: str) -> bool:
+    def speak(self, text: str, priority: Priority = Priority.NORMAL) -> PlaybackHandle:
         """
         تحويل النص لصوت وتشغيله
         """
-        try:
-            # إنشاء ملف صوتي مؤقت
-            temp_file = os.path.join(
-                self.temp_dir, 
-                f"speech_{int(time.time())}.mp3"
-            )
-            
-            # تحويل النص لصوت
-            tts = gTTS(text=text, lang=self.language, slow=self.slow)
-            tts.save(temp_file)
-            
-            # تشغيل الصوت
-            playsound(temp_file)
-            
-            # حذف الملف المؤقت
-            os.remove(temp_file)
-            
-            return True
-            
-        except Exception as e:
-            print(f"❌ خطأ في TTS: {e}")
-            return False
+        return self.speak_parts([text], priority)
+
+    def speak_parts(self, parts, priority: Priority = Priority.NORMAL) -> PlaybackHandle:
+        """تشغيل جملة متركبة من أجزاء متخزنة"""
+        return self.player.play(parts, priority)
     
     def speak_greeting(self):
         """ترحيب بالمريض"""
-        self.speak("مرحباً! أنا روبوت سمار ميد. كيف يمكنني مساعدتك اليوم؟")
+        return self.speak(GREETING)
     
     def speak_vitals_result(self, heart_rate, temp, spo2):
         """قراءة نتائج المؤشرات"""
-        message = f"نبضك {heart_rate} نبضة في الدقيقة، "
-        message += f"درجة حرارتك {temp} درجة، "
-        message += f"نسبة الأكسجين {spo2} بالمئة."
-        self.speak(message)
-    
+        hr_label, hr_unit, t_label, t_unit, o2_label, o2_unit = VITALS_PARTS
+        return self.speak_parts([hr_label, str(heart_rate), hr_unit,
+                                 t_label, str(temp), t_unit,
+                                 o2_label, str(spo2), o2_unit])
+
     def speak_alert(self, alert_type):
         """تنبيهات طارئة"""
-        alerts = {
-            "high_temp": "تحذير! درجة الحرارة مرتفعة. سأخبر الطبيب فوراً.",
-            "low_spo2": "تحذير! نسبة الأكسجين منخفضة. هذا مهم جداً.",
-            "high_heartrate": "نبضك سريع جداً. سأستدعي الطبيب.",
-        }
-        self.speak(alerts.get(alert_type, "تنبيه طبي مهم!"))
+        return self.speak(ALERTS.get(alert_type, DEFAULT_ALERT), Priority.ALERT)
 
 # اختبار
 if __name__ == "__main__":
     tts = TextToSpeechHandler()
     tts.speak_greeting()
     time.sleep(2)
-    tts.speak("أنا هنا لمساعدتك")
\ No newline at end of file
+    tts.speak("أنا هنا لمساعدتك").wait()
+    print(tts.player.stats())
\ No newline at end of file
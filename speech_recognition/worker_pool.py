@@ -0,0 +1,238 @@
+"""
+worker_pool.py - مجموعة عمليات (processes) للتحويل
+===================================================
+علشان الـ GIL ومجموعة threads واحدة في PyTorch ما يبقوش سقف لعدد الأسرّة:
+  - الـ workers بيتعملوا spawn (PoolConfig.START_METHOD) مش fork: الأم فيها threads
+    (الـ monitor، TTS، duplex، الـ intra-op pool بتاع torch) وfork بعدها ممكن يورّث
+    lock ماسوك (OpenMP / allocator) والابن يعلق للأبد
+  - كل worker بيحمل الموديل لنفسه من factory - مع model_store الأوزان mmap من نفس
+    الملف فالصفحات متشاركة من الـ page cache (الذاكرة مش بتتضرب في N)
+  - كل worker ليه عدد threads ثابت ومربوط بأنوية محددة (sched_setaffinity)
+  - فحص دوري: worker مات أو علق أكتر من TASK_TIMEOUT → بيتقتل ويتعمل تاني
+    والطلب اللي كان معاه بيتعاد (لحد MAX_RETRIES)
+  - كل worker بيرجع نتايجه على pipe لوحده: Queue واحدة متشاركة ليها lock بين العمليات،
+    وworker يموت وهو ماسكه كان بيقفل الباقيين كلهم
+"""
+
+import logging
+import multiprocessing as mp
+import os
+import sys
+import queue
+import threading
+import time
+import itertools
+import numpy as np
+from concurrent.futures import Future
+from multiprocessing.connection import wait
+
+from config import PoolConfig
+
+logger = logging.getLogger("SMAR_MED_VOICE")
+
+
+def _worker_main(wid: int, factory, tasks, results, threads: int, cpus):
+    # results: طرف الكتابة من Pipe خاص بالـ worker ده
+    """حلقة الـ worker - عملية جديدة (spawn): بتحمل الموديل وتبلغ إنها جاهزة"""
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    try:
+        backend = factory()
+    except Exception as e:
+        results.send((wid, None, False, f"{type(e).__name__}: {e}"))
+        return
+    torch = sys.modules.get("torch")     # اتحمل مع الموديل (لو المحرك PyTorch)
+    if torch is not None:
+        torch.set_num_threads(threads)
+    results.send((wid, None, True, None))
+
+    while True:
+        item = tasks.get()
+        if item is None:
+            return
+        task_id, audio = item
+        try:
+            results.send((wid, task_id, True, backend.transcribe(audio)))
+        except Exception as e:
+            results.send((wid, task_id, False, f"{type(e).__name__}: {e}"))
+
+
+class ASRWorkerPool:
+    """
+    factory: callable بيترجع ASRBackend وبيتبعت للـ worker بالـ pickle
+             (مثلاً functools.partial(load_backend, "openai", "small"))
+    """
+
+    def __init__(self, factory,
+                 num_workers: int = PoolConfig.WORKERS,
+                 threads_per_worker: int = PoolConfig.THREADS_PER_WORKER,
+                 start_method: str = PoolConfig.START_METHOD):
+        self.factory     = factory
+        self.num_workers = max(1, int(num_workers))
+        self.threads     = max(1, int(threads_per_worker))
+        self._ctx        = mp.get_context(start_method)
+        self._conns      = {}                   # wid → طرف القراية من pipe النتايج
+        self._pending    = queue.Queue()        # (task_id, audio, future, attempt)
+        self._idle       = queue.Queue()
+        self._idle_set   = set()
+        self._lock       = threading.Lock()
+        self._inflight   = {}                   # wid → (task_id, audio, future, attempt, started)
+        self._procs      = {}
+        self._tasks      = {}
+        self._ids        = itertools.count()
+        self._closed     = False
+        self.restarts    = 0
+
+        for wid in range(self.num_workers):
+            self._spawn(wid)
+
+        for target, name in ((self._dispatch, "asr-dispatch"),
+                             (self._collect, "asr-collect"),
+                             (self._monitor, "asr-monitor")):
+            threading.Thread(target=target, name=name, daemon=True).start()
+        logger.info(f"ASR pool: {self.num_workers} workers × {self.threads} threads")
+
+    # ── الواجهة ────────────────────────────────
+    def submit(self, audio: np.ndarray) -> Future:
+        if self._closed:
+            raise RuntimeError("ASRWorkerPool مقفول")
+        fut = Future()
+        self._pending.put((next(self._ids), audio, fut, 0))
+        return fut
+
+    def transcribe(self, audio: np.ndarray) -> dict:
+        """نفس واجهة ASRBackend.transcribe"""
+        return self.submit(audio).result()
+
+    def health(self) -> dict:
+        with self._lock:
+            return {
+                "workers":  self.num_workers,
+                "alive":    sum(p.is_alive() for p in self._procs.values()),
+                "busy":     len(self._inflight),
+                "queued":   self._pending.qsize(),
+                "restarts": self.restarts,
+            }
+
+    def close(self):
+        self._closed = True
+        for wid, proc in list(self._procs.items()):
+            self._tasks[wid].put(None)
+        for proc in self._procs.values():
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+
+    # ── داخلي ──────────────────────────────────
+    def _cpus(self, wid: int):
+        n = os.cpu_count() or 1
+        return {(wid * self.threads + i) % n for i in range(self.threads)}
+
+    def _spawn(self, wid: int):
+        tasks          = self._ctx.Queue()
+        reader, writer = self._ctx.Pipe(duplex=False)
+        proc  = self._ctx.Process(
+            target=_worker_main,
+            args=(wid, self.factory, tasks, writer, self.threads, self._cpus(wid)),
+            name=f"asr-worker-{wid}",
+            daemon=True,
+        )
+        with self._lock:
+            self._idle_set.discard(wid)  # أي idle قديم للرقم ده في الطابور بقى ملوش لازمة
+            self._tasks[wid] = tasks
+        proc.start()
+        writer.close()                  # الـ worker لو مات الأم تاخد EOF
+        with self._lock:
+            self._conns[wid] = reader
+        self._procs[wid] = proc         # بيبقى idle لما يبلغ إنه حمّل الموديل (_collect)
+
+    def _mark_idle(self, wid: int):
+        with self._lock:
+            if wid in self._idle_set:
+                return
+            self._idle_set.add(wid)
+        self._idle.put(wid)
+
+    def _dispatch(self):
+        while not self._closed:
+            task_id, audio, fut, attempt = self._pending.get()
+            if attempt == 0 and not fut.set_running_or_notify_cancel():
+                continue
+            while True:
+                wid = self._idle.get()
+                with self._lock:
+                    if wid not in self._idle_set:
+                        continue        # من قبل الـ restart
+                    self._idle_set.discard(wid)
+                    self._inflight[wid] = (task_id, audio, fut, attempt, time.monotonic())
+                    self._tasks[wid].put((task_id, audio))
+                break
+
+    def _collect(self):
+        while not self._closed:
+            with self._lock:
+                conns = list(self._conns.values())
+            # timeout علشان الـ pipes الجديدة بعد الـ restart تدخل في الانتظار
+            for conn in wait(conns, timeout=0.5):
+                try:
+                    msg = conn.recv()
+                except (EOFError, OSError):
+                    self._drop(conn)    # الـ worker مات - الـ monitor بيعيده
+                    continue
+                self._handle(*msg)
+
+    def _drop(self, conn):
+        with self._lock:
+            for wid, c in list(self._conns.items()):
+                if c is conn:
+                    del self._conns[wid]
+        conn.close()
+
+    def _handle(self, wid: int, task_id, ok: bool, payload):
+        if task_id is None:             # الموديل اتحمل (أو فشل - الـ monitor هيعيده)
+            if ok:
+                self._mark_idle(wid)
+            else:
+                logger.error(f"ASR worker {wid} مقدرش يحمل الموديل: {payload}")
+            return
+        with self._lock:
+            job = self._inflight.get(wid)
+            if job is None or job[0] != task_id:
+                return                  # نتيجة متأخرة من worker اتعمله restart
+            del self._inflight[wid]
+        self._mark_idle(wid)
+        fut = job[2]
+        if ok:
+            fut.set_result(payload)
+        else:
+            fut.set_exception(RuntimeError(payload))
+
+    def _monitor(self):
+        while not self._closed:
+            time.sleep(PoolConfig.HEALTH_INTERVAL)
+            now = time.monotonic()
+            for wid in range(self.num_workers):
+                proc = self._procs[wid]
+                with self._lock:
+                    job = self._inflight.get(wid)
+                hung = job is not None and now - job[4] > PoolConfig.TASK_TIMEOUT
+                if proc.is_alive() and not hung:
+                    continue
+                if self._closed:
+                    return
+
+                logger.error(f"ASR worker {wid} {'علق' if hung else 'مات'} - إعادة تشغيل")
+                if proc.is_alive():
+                    proc.kill()
+                proc.join(timeout=5)
+                with self._lock:
+                    job = self._inflight.pop(wid, None)
+                self.restarts += 1
+                self._spawn(wid)
+
+                if job is not None:
+                    task_id, audio, fut, attempt, _ = job
+                    if attempt < PoolConfig.MAX_RETRIES:
+                        self._pending.put((task_id, audio, fut, attempt + 1))
+                    else:
+                        fut.set_exception(RuntimeError(f"ASR worker {wid} وقع أثناء الطلب"))